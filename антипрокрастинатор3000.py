@@ -8,6 +8,22 @@ import time
 import threading
 import subprocess
 import re
+import json
+import gzip
+import queue
+import random
+import uuid
+import math
+import multiprocessing
+import asyncio
+import ctypes
+import ctypes.util
+import select
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime, timedelta
 
 # Проверяем и устанавливаем необходимые библиотеки
@@ -57,7 +73,11 @@ try:
         import pygame
     except:
         import pygame_ce as pygame
-    import winsound
+    try:
+        import winsound
+    except ImportError:
+        # Не Windows - звук будет через pygame
+        winsound = None
     import requests
     
     # Флаг успешной загрузки библиотек
@@ -66,10 +86,1170 @@ except ImportError as e:
     print(f"✗ Ошибка загрузки библиотек: {e}")
     LIBS_LOADED = False
 
+# Каталог данных приложения (история сессий, очередь выгрузки)
+APP_DATA_DIR = os.path.join(os.path.expanduser("~"), ".antiprocrastinator3000")
+SESSIONS_DIR = os.path.join(APP_DATA_DIR, "sessions")
+UPLOAD_QUEUE_DIR = os.path.join(APP_DATA_DIR, "upload_queue")
+DETECTOR_PROFILE_PATH = os.path.join(APP_DATA_DIR, "detector_profile.json")
+ROLLUPS_PATH = os.path.join(APP_DATA_DIR, "focus_rollups.json")
+OWNER_PROFILE_PATH = os.path.join(APP_DATA_DIR, "owner_face.npz")
+
+# Адрес сервера сбора статистики (если не задан - выгрузка выключена)
+COLLECTOR_URL = os.environ.get("ANTIPROCRASTINATOR_COLLECTOR_URL", "")
+
+
+def isolate_app_data(path):
+    """Данные приложения - в отдельном каталоге и без выгрузки (для прогонов)"""
+    global APP_DATA_DIR, SESSIONS_DIR, UPLOAD_QUEUE_DIR, DETECTOR_PROFILE_PATH
+    global ROLLUPS_PATH, OWNER_PROFILE_PATH, COLLECTOR_URL
+    APP_DATA_DIR = path
+    SESSIONS_DIR = os.path.join(APP_DATA_DIR, "sessions")
+    UPLOAD_QUEUE_DIR = os.path.join(APP_DATA_DIR, "upload_queue")
+    DETECTOR_PROFILE_PATH = os.path.join(APP_DATA_DIR, "detector_profile.json")
+    ROLLUPS_PATH = os.path.join(APP_DATA_DIR, "focus_rollups.json")
+    OWNER_PROFILE_PATH = os.path.join(APP_DATA_DIR, "owner_face.npz")
+    COLLECTOR_URL = ""
+
+
+def write_json_atomic(path, data):
+    """Запись JSON через временный файл с fsync: после падения на диске
+    остается либо прежний файл, либо новый целиком"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class PooledCamera:
+    """Открытое устройство в пуле камер"""
+    
+    def __init__(self, key, cap):
+        self.key = key
+        self.cap = cap
+        self.refs = 0
+        # Чтение и смена свойств идут строго по очереди
+        self.lock = threading.RLock()
+        self.props = {}
+        self.close_timer = None
+        self.opened_at = time.time()
+
+
+class CameraHandle:
+    """Общий дескриптор камеры из пула (интерфейс как у cv2.VideoCapture)"""
+    
+    def __init__(self, pool, device):
+        self.pool = pool
+        self.device = device
+        self.released = False
+    
+    def isOpened(self):
+        return not self.released and self.device.cap is not None and self.device.cap.isOpened()
+    
+    def read(self):
+        with self.device.lock:
+            if self.released or self.device.cap is None:
+                return False, None
+            return self.device.cap.read()
+    
+    def grab(self):
+        with self.device.lock:
+            if self.released or self.device.cap is None:
+                return False
+            return self.device.cap.grab()
+    
+    def retrieve(self):
+        with self.device.lock:
+            if self.released or self.device.cap is None:
+                return False, None
+            return self.device.cap.retrieve()
+    
+    def get(self, prop):
+        with self.device.lock:
+            if self.device.cap is None:
+                return 0
+            return self.device.cap.get(prop)
+    
+    def set(self, prop, value):
+        """Смена свойства; одинаковое значение повторно не отправляется драйверу"""
+        with self.device.lock:
+            if self.device.cap is None:
+                return False
+            if self.device.props.get(prop) == value:
+                return True
+            ok = self.device.cap.set(prop, value)
+            self.device.props[prop] = value
+            return ok
+    
+    def release(self):
+        """Вернуть камеру в пул (устройство закроется после периода ожидания)"""
+        if not self.released:
+            self.released = True
+            self.pool._release(self.device)
+
+
+class CameraPool:
+    """Пул открытых камер с подсчетом ссылок
+    
+    Тест камеры, предпросмотр и отслеживание получают дескрипторы одного
+    открытого устройства. После ухода последнего пользователя устройство
+    остается открытым grace_seconds секунд, так что следующий запуск
+    подключается к работающему потоку вместо долгого открытия DirectShow.
+    """
+    
+    def __init__(self, grace_seconds=30, backend=None, opener=None):
+        self.grace_seconds = grace_seconds
+        self.backend = cv2.CAP_DSHOW if backend is None else backend
+        # Функция открытия устройства (для тестов - симулятор камеры)
+        self.opener = opener or (lambda index, backend: cv2.VideoCapture(index, backend))
+        self.devices = {}
+        self.lock = threading.Lock()
+        self.open_locks = {}
+    
+    def acquire(self, index):
+        """Получить дескриптор камеры (None, если устройство не открылось)"""
+        with self.lock:
+            open_lock = self.open_locks.setdefault(index, threading.Lock())
+        
+        # Открытие может занимать секунды - держим только блокировку этого индекса
+        with open_lock:
+            with self.lock:
+                device = self.devices.get(index)
+                if device is not None and device.cap is not None and device.cap.isOpened():
+                    return self._attach(device)
+            
+            started = time.time()
+            cap = self.opener(index, self.backend)
+            if cap is None or not cap.isOpened():
+                if cap is not None:
+                    cap.release()
+                return None
+            print(f"✓ Камера #{index} открыта за {time.time() - started:.1f} с")
+            
+            with self.lock:
+                device = PooledCamera(index, cap)
+                self.devices[index] = device
+                return self._attach(device)
+    
+    def _attach(self, device):
+        """Новый пользователь устройства (вызывается под self.lock)"""
+        if device.close_timer is not None:
+            device.close_timer.cancel()
+            device.close_timer = None
+        device.refs += 1
+        return CameraHandle(self, device)
+    
+    def _release(self, device):
+        with self.lock:
+            device.refs -= 1
+            if device.refs > 0:
+                return
+            if self.grace_seconds <= 0:
+                self._close(device)
+                return
+            device.close_timer = threading.Timer(self.grace_seconds, self._close_if_unused, args=(device,))
+            device.close_timer.daemon = True
+            device.close_timer.start()
+    
+    def _close_if_unused(self, device):
+        with self.lock:
+            if device.refs == 0 and self.devices.get(device.key) is device:
+                self._close(device)
+    
+    def _close(self, device):
+        """Закрытие устройства (вызывается под self.lock)"""
+        if self.devices.get(device.key) is device:
+            del self.devices[device.key]
+        if device.close_timer is not None:
+            device.close_timer.cancel()
+            device.close_timer = None
+        # Дожидаемся текущего чтения кадра
+        with device.lock:
+            if device.cap is not None:
+                device.cap.release()
+                device.cap = None
+    
+    def is_open(self, index):
+        with self.lock:
+            device = self.devices.get(index)
+            return device is not None and device.cap is not None
+    
+    def open_probe(self, index):
+        """Камера для разовой проверки: открытое устройство берется из пула,
+        остальные открываются напрямую и в пуле не задерживаются"""
+        if self.is_open(index):
+            handle = self.acquire(index)
+            if handle is not None:
+                return handle
+        return self.opener(index, self.backend)
+    
+    def close_all(self):
+        """Закрыть все устройства (при выходе из программы)"""
+        with self.lock:
+            for device in list(self.devices.values()):
+                self._close(device)
+
+
+class SessionClock:
+    """Часы сессии: реальное или ускоренное время (для симуляции и прогонов)"""
+    
+    def __init__(self, speed=1.0):
+        self.speed = speed
+        self.origin_real = time.time()
+        self.origin = self.origin_real
+    
+    def time(self):
+        if self.speed == 1.0:
+            return time.time()
+        return self.origin + (time.time() - self.origin_real) * self.speed
+    
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+
+class CancellationToken:
+    """Флаг отмены для фоновых потоков одной сессии"""
+    
+    def __init__(self):
+        self.event = threading.Event()
+    
+    def cancel(self):
+        self.event.set()
+    
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+    
+    def wait(self, timeout):
+        """Подождать timeout секунд; True - если за это время сессию отменили"""
+        return self.event.wait(timeout)
+
+
+class SessionState:
+    """Состояние сессии, общее для GUI, таймера, отслеживания и сигнала
+    
+    Все изменения идут под одной блокировкой. Счетчики меняют только
+    потоки текущей сессии (по ее токену отмены): поток прошлой сессии, не
+    успевший завершиться, новую сессию не испортит.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.token = CancellationToken()
+        self.token.cancel()
+        self.tracking = False
+        self.timer_running = False
+        self.paused = False
+        self.alarm = False
+        self.focus_time = 0.0
+        self.unknown_time = 0.0
+        self.distraction_count = 0
+        # Проанализированные кадры и время с активным вводом
+        self.analyzed_frames = 0
+        self.input_active_time = 0.0
+    
+    def begin(self):
+        """Новая сессия: сброс счетчиков и новый токен отмены"""
+        with self.lock:
+            self.token.cancel()
+            self.token = CancellationToken()
+            self.tracking = True
+            self.timer_running = True
+            self.paused = False
+            self.alarm = False
+            self.focus_time = 0.0
+            self.unknown_time = 0.0
+            self.distraction_count = 0
+            self.analyzed_frames = 0
+            self.input_active_time = 0.0
+            return self.token
+    
+    def end(self):
+        """Остановка: токен отменяется, сигнал выключается"""
+        with self.lock:
+            self.token.cancel()
+            self.tracking = False
+            self.timer_running = False
+            self.paused = False
+            self.alarm = False
+            return self.token
+    
+    def _current(self, token):
+        return token is self.token and not token.cancelled
+    
+    def add_focus(self, token, seconds):
+        with self.lock:
+            if self._current(token):
+                self.focus_time += seconds
+    
+    def add_unknown(self, token, seconds):
+        with self.lock:
+            if self._current(token):
+                self.unknown_time += seconds
+    
+    def count_analysis(self, token, input_seconds):
+        with self.lock:
+            if self._current(token):
+                self.analyzed_frames += 1
+                self.input_active_time += input_seconds
+    
+    def add_distraction(self, token):
+        """Засчитать отвлечение; номер отвлечения или None, если сессия уже другая"""
+        with self.lock:
+            if not self._current(token):
+                return None
+            self.distraction_count += 1
+            return self.distraction_count
+    
+    def set_paused(self, paused):
+        with self.lock:
+            self.paused = paused
+            if paused:
+                self.alarm = False
+    
+    def start_alarm(self):
+        """Включить сигнал; False - если он уже звучит или сессия не идет"""
+        with self.lock:
+            if not self.tracking or self.paused or self.alarm:
+                return False
+            self.alarm = True
+            return True
+    
+    def stop_alarm(self):
+        with self.lock:
+            self.alarm = False
+
+
+class SessionJournal:
+    """Журнал сессии на случай падения: <id>.journal в папке сессий
+    
+    Строки JSON только дописываются: начало сессии, смены состояния,
+    отвлечения, паузы и контрольные точки счетчиков. Поток отслеживания
+    лишь кладет строку в буфер; запись с fsync пачкой раз в FLUSH_INTERVAL
+    и контрольные точки (по snapshot()) делает фоновый поток. После
+    сохранения сводки журнал удаляется, а оставшийся после падения при
+    следующем запуске превращается recover() в сводку с пометкой recovered.
+    Пока журнал открыт, он заблокирован, а в записи start есть PID - журнал
+    другого работающего экземпляра программы recover() не трогает.
+    """
+    
+    SUFFIX = ".journal"
+    FLUSH_INTERVAL = 2.0
+    # Контрольная точка не реже (секунды по часам сессии)
+    CHECKPOINT_INTERVAL = 10.0
+    
+    def __init__(self, path, start, header=None, snapshot=None, clock=None):
+        self.path = path
+        # Начало сессии по часам сессии; в записях время от него
+        self.start = start
+        self.snapshot = snapshot
+        self.clock = clock or SessionClock()
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.closed = False
+        # Затраты на запись
+        self.records = 0
+        self.syncs = 0
+        self.sync_ms = 0.0
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+        # Блокировка снимается системой и при падении процесса
+        self.try_lock(self.file)
+        self.append('start', start, pid=os.getpid(), **(header or {}))
+        self.flush()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="session-journal", daemon=True)
+        self.thread.start()
+    
+    def append(self, kind, timestamp=None, **fields):
+        """Запись в буфер, без ввода-вывода (timestamp - по часам сессии)"""
+        if self.closed:
+            return
+        if timestamp is None:
+            timestamp = self.clock.time()
+        record = {'t': kind, 'at': round(timestamp - self.start, 2)}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.buffer.append(line)
+            self.records += 1
+    
+    def checkpoint(self):
+        if self.snapshot is not None:
+            self.append('checkpoint', **self.snapshot())
+    
+    def flush(self):
+        """Запись буфера одной пачкой и fsync"""
+        with self.lock:
+            lines, self.buffer = self.buffer, []
+        if not lines:
+            return
+        started = time.perf_counter()
+        self.file.write("".join(lines))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.syncs += 1
+        self.sync_ms += (time.perf_counter() - started) * 1000
+    
+    def _run(self):
+        last_checkpoint = self.clock.time()
+        while not self.stop_event.wait(self.FLUSH_INTERVAL):
+            if self.clock.time() - last_checkpoint >= self.CHECKPOINT_INTERVAL:
+                last_checkpoint = self.clock.time()
+                self.checkpoint()
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"✗ Журнал сессии больше не пишется: {e}")
+                self.closed = True
+                return
+    
+    def close(self, timeout=1.0):
+        """Последняя контрольная точка и запись на диск"""
+        if self.closed and self.file.closed:
+            return
+        self.stop_event.set()
+        self.thread.join(timeout)
+        self.checkpoint()
+        self.closed = True
+        try:
+            self.flush()
+        except OSError as e:
+            print(f"✗ Не удалось дописать журнал сессии: {e}")
+        self.file.close()
+    
+    def remove(self):
+        """Удаление журнала (сводка уже сохранена или сессия не сохраняется)"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+    
+    def describe(self):
+        average = self.sync_ms / self.syncs if self.syncs else 0
+        return f"журнал: записей {self.records}, fsync {self.syncs} (в среднем {average:.1f} мс)"
+    
+    @staticmethod
+    def try_lock(f):
+        """Исключительная блокировка открытого файла без ожидания (False - занят)"""
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+    
+    @classmethod
+    def in_use(cls, path):
+        """Журнал еще пишет живой процесс
+        
+        Свободная блокировка - владелец точно завершился. Если блокировку
+        взять нельзя (занята или файловая система ее не поддерживает),
+        решает PID из записи start.
+        """
+        with open(path, encoding="utf-8") as f:
+            if cls.try_lock(f):
+                return False
+            try:
+                pid = json.loads(f.readline()).get('pid')
+            except (OSError, ValueError, AttributeError):
+                return True
+        return pid is None or psutil.pid_exists(pid)
+    
+    @staticmethod
+    def summarize(path, session_id):
+        """Сводка прерванной сессии по журналу (None - журнал пуст)"""
+        start = None
+        checkpoint = {}
+        distractions = 0
+        timeline = []
+        end_at = 0.0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Недописанная при падении строка
+                    continue
+                end_at = max(end_at, record.get('at', 0.0))
+                kind = record.get('t')
+                if kind == 'start':
+                    start = record
+                elif kind == 'checkpoint':
+                    checkpoint = record
+                elif kind == 'state':
+                    timeline.append((record['at'], record['state']))
+                elif kind == 'distraction':
+                    distractions = max(distractions, record.get('count', 0))
+        if start is None:
+            return None
+        
+        # Фокус - по последней контрольной точке: теряется не больше ее интервала
+        focus = checkpoint.get('focus_time', 0.0)
+        return {
+            'session_id': session_id,
+            'start': datetime.fromtimestamp(start['session_start']).isoformat(timespec='seconds'),
+            'duration': round(end_at, 1),
+            'focus_time': round(focus, 1),
+            'focus_percentage': round(focus / end_at * 100, 1) if end_at > 0 else 0,
+            'distraction_count': max(distractions, checkpoint.get('distraction_count', 0)),
+            'unknown_time': round(checkpoint.get('unknown_time', 0.0), 1),
+            'analyzed_frames': checkpoint.get('analyzed_frames', 0),
+            'input_active_time': round(checkpoint.get('input_active_time', 0.0), 1),
+            'owner_only': start.get('owner_only', False),
+            'camera': start.get('camera'),
+            'profile': start.get('profile'),
+            'timeline': timeline,
+            'people': [],
+            'resources': None,
+            'recovered': True,
+        }
+    
+    @staticmethod
+    def summary_saved(path):
+        """Сводка есть и читается (оборванная запись - как если бы ее не было)"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                return isinstance(json.load(f), dict)
+        except (OSError, ValueError):
+            return False
+    
+    @classmethod
+    def recover(cls, sessions_dir=None):
+        """Закрытие прерванных сессий по оставшимся журналам; список сводок"""
+        sessions_dir = sessions_dir or SESSIONS_DIR
+        try:
+            names = sorted(os.listdir(sessions_dir))
+        except OSError:
+            return []
+        summaries = []
+        for name in names:
+            if not name.endswith(cls.SUFFIX):
+                continue
+            session_id = name[:-len(cls.SUFFIX)]
+            path = os.path.join(sessions_dir, name)
+            summary_path = os.path.join(sessions_dir, f"{session_id}.json")
+            try:
+                if cls.in_use(path):
+                    # Сессия другого запущенного экземпляра программы
+                    continue
+                # Целая сводка уже есть - упали после ее сохранения
+                if not cls.summary_saved(summary_path):
+                    summary = cls.summarize(path, session_id)
+                    if summary is not None:
+                        write_json_atomic(summary_path, summary)
+                        summaries.append(summary)
+                os.remove(path)
+            except (OSError, KeyError, TypeError, ValueError) as e:
+                print(f"✗ Не удалось восстановить сессию {session_id}: {e}")
+        return summaries
+
+
+class SimulatedVideoSource:
+    """Сценарная камера без устройства (интерфейс как у cv2.VideoCapture)
+    
+    Сценарий - список (состояние, секунды), повторяется по кругу от epoch.
+    Состояния: present - лицо в центре, absent - только фон, partial - лицо
+    наполовину за краем кадра, dark - темная комната, fast - лицо быстро
+    двигается (смаз), closed - глаза закрыты. Время берется из SessionClock, поэтому при ускорении
+    сценарий проигрывается быстрее.
+    """
+    
+    STATES = ('present', 'absent', 'partial', 'dark', 'fast', 'closed')
+    DEFAULT_SCRIPT = [
+        ('present', 600), ('absent', 120), ('present', 420), ('partial', 60),
+        ('present', 300), ('dark', 90), ('present', 240), ('fast', 45),
+        ('absent', 300), ('present', 480),
+    ]
+    
+    def __init__(self, script=None, width=640, height=480, fps=30, clock=None, epoch=None, seed=0):
+        self.script = list(script or self.DEFAULT_SCRIPT)
+        self.cycle = sum(seconds for _, seconds in self.script)
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.clock = clock or SessionClock()
+        self.epoch = self.clock.time() if epoch is None else epoch
+        self.seed = seed
+        self.opened = True
+        self.next_frame = 0
+        self.grabbed = None
+        self.background = None
+        self.cache = {}
+    
+    @staticmethod
+    def parse_script(text):
+        """"present:300,absent:60,..." -> [(состояние, секунды), ...]"""
+        script = []
+        for part in text.split(","):
+            state, seconds = part.strip().split(":")
+            if state not in SimulatedVideoSource.STATES:
+                raise ValueError(f"неизвестное состояние сценария: {state}")
+            script.append((state, float(seconds)))
+        return script
+    
+    @classmethod
+    def opener(cls, script=None, clock=None, **kwargs):
+        """Функция открытия для CameraPool: все «камеры» идут по одному сценарию"""
+        clock = clock or SessionClock()
+        epoch = clock.time()
+        return lambda index, backend: cls(script, clock=clock, epoch=epoch, seed=index, **kwargs)
+    
+    def state_at(self, t):
+        position = (t - self.epoch) % self.cycle
+        for state, seconds in self.script:
+            if position < seconds:
+                return state
+            position -= seconds
+        return self.script[-1][0]
+    
+    def segments(self, start, end):
+        """Отрезки сценария [(состояние, начало, конец)] внутри [start, end]"""
+        result = []
+        cycle_start = self.epoch + ((start - self.epoch) // self.cycle) * self.cycle
+        t = cycle_start
+        while t < end:
+            for state, seconds in self.script:
+                a, b = max(t, start), min(t + seconds, end)
+                if a < b:
+                    result.append((state, a, b))
+                t += seconds
+        return result
+    
+    # Интерфейс cv2.VideoCapture
+    
+    def isOpened(self):
+        return self.opened
+    
+    def release(self):
+        self.opened = False
+    
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            self.width = int(value)
+        elif prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            self.height = int(value)
+        elif prop == cv2.CAP_PROP_FPS:
+            self.fps = value
+        else:
+            return False
+        self.background = None
+        self.cache = {}
+        return True
+    
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0
+    
+    def grab(self):
+        if not self.opened:
+            return False
+        # Кадры выдаются не чаще fps (по часам сессии)
+        now = self.clock.time()
+        if now < self.next_frame:
+            self.clock.sleep(self.next_frame - now)
+            now = self.next_frame
+        self.next_frame = now + 1.0 / self.fps
+        self.grabbed = now
+        return True
+    
+    def retrieve(self):
+        if self.grabbed is None:
+            return False, None
+        return True, self.render(self.state_at(self.grabbed), self.grabbed)
+    
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+    
+    # Отрисовка
+    
+    def render(self, state, t):
+        if state in self.cache:
+            return self.cache[state].copy()
+        
+        frame = self._background().copy()
+        cx, cy = self.width // 2, self.height // 2
+        if state == 'present':
+            self._draw_face(frame, cx, cy)
+        elif state == 'partial':
+            self._draw_face(frame, self.width // 20, cy)
+        elif state == 'closed':
+            self._draw_face(frame, cx, cy, eyes_open=False)
+        elif state == 'dark':
+            self._draw_face(frame, cx, cy)
+            frame = (frame * 0.08).astype(np.uint8)
+        elif state == 'fast':
+            # Лицо мечется по кадру - смаз по горизонтали
+            offset = int(self.width * 0.3 * math.sin(t * 2 * math.pi * 1.5))
+            self._draw_face(frame, cx + offset, cy)
+            return cv2.blur(frame, (max(3, self.width // 20), 1))
+        
+        self.cache[state] = frame
+        return frame.copy()
+    
+    def _background(self):
+        """Фон с «мебелью» - контрастный, чтобы кадр без лица не считался плохим"""
+        if self.background is None:
+            rng = np.random.default_rng(self.seed)
+            background = np.full((self.height, self.width, 3), (90, 110, 120), np.uint8)
+            for _ in range(12):
+                x, y = int(rng.integers(0, self.width)), int(rng.integers(0, self.height))
+                w, h = int(rng.integers(20, self.width // 3)), int(rng.integers(20, self.height // 3))
+                color = tuple(int(c) for c in rng.integers(30, 220, 3))
+                cv2.rectangle(background, (x, y), (x + w, y + h), color, -1)
+            noise = rng.integers(-12, 12, background.shape)
+            self.background = np.clip(background + noise, 0, 255).astype(np.uint8)
+        return self.background
+    
+    def _draw_face(self, frame, cx, cy, eyes_open=True):
+        """Схематичное лицо, которое находят каскады лиц и глаз"""
+        fw = self.width // 5
+        fh = int(fw * 1.3)
+        cv2.ellipse(frame, (cx, cy), (fw // 2, fh // 2), 0, 0, 360, (150, 180, 215), -1)
+        ex, ey = int(fw * 0.22), cy - fh // 8
+        for side in (-1, 1):
+            eye = (cx + side * ex, ey)
+            axes = (int(fw * 0.1), int(fw * 0.05))
+            if eyes_open:
+                cv2.ellipse(frame, eye, axes, 0, 0, 360, (235, 235, 235), -1)
+                cv2.circle(frame, eye, int(fw * 0.045), (30, 25, 20), -1)
+                cv2.ellipse(frame, eye, axes, 0, 0, 360, (70, 60, 60), 2)
+            else:
+                # Закрытый глаз - только линия века
+                cv2.line(frame, (eye[0] - axes[0], eye[1]), (eye[0] + axes[0], eye[1]), (40, 30, 30), 2)
+            cv2.ellipse(frame, (eye[0], eye[1] - int(fw * 0.1)), (int(fw * 0.11), int(fw * 0.05)),
+                        0, 180, 360, (50, 40, 35), max(2, fw // 25))
+        cv2.line(frame, (cx, ey + fw // 10), (cx - fw // 20, cy + fh // 10), (120, 140, 170), 2)
+        cv2.ellipse(frame, (cx, cy + fh // 4), (fw // 6, fw // 20), 0, 0, 360, (80, 80, 160), -1)
+        cv2.GaussianBlur(frame, (5, 5), 0, dst=frame)
+
+
+class FrameRecorder:
+    """Запись проанализированных кадров сессии для точного повтора
+    
+    Файл - заголовок JSON фиксированного размера и записи одинаковой длины:
+    метка времени, масштаб детекции, флаги и рамки результата, серый кадр
+    в том виде, в каком его видел детектор. Записи только дописываются,
+    поэтому даже после аварийного выхода файл читается до последнего
+    целого кадра. Если размер кадра меняется (смена профиля), начинается
+    следующая часть: <id>.1.frames, <id>.2.frames...
+    """
+    
+    MAGIC = b"APFRAMES1\n"
+    HEADER_SIZE = 4096
+    MAX_FACES = 4
+    
+    FLAG_UNKNOWN = 1
+    FLAG_FACE = 2
+    FLAG_EYES = 4
+    FLAG_RESUMED = 8
+    
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = dict(meta)
+        self.file = None
+        self.part = -1
+        self.part_count = 0
+        self.shape = None
+        self.record = None
+        self.count = 0
+    
+    @staticmethod
+    def record_dtype(height, width):
+        return np.dtype([
+            ('timestamp', '<f8'),
+            ('scale', '<f4'),
+            ('flags', 'u1'),
+            ('face_count', 'u1'),
+            ('faces', '<i4', (FrameRecorder.MAX_FACES, 4)),
+            ('eye_counts', 'u1', (FrameRecorder.MAX_FACES,)),
+            ('gray', 'u1', (height, width)),
+        ])
+    
+    @staticmethod
+    def part_path(path, index):
+        if index == 0:
+            return path
+        root, ext = os.path.splitext(path)
+        return f"{root}.{index}{ext}"
+    
+    @classmethod
+    def read_header(cls, path):
+        with open(path, "rb") as f:
+            header = f.read(cls.HEADER_SIZE)
+        if not header.startswith(cls.MAGIC):
+            raise ValueError(f"не файл записи кадров: {path}")
+        return json.loads(header[len(cls.MAGIC):].decode("utf-8"))
+    
+    def _write_header(self, end=None):
+        meta = dict(self.meta, part=self.part, height=self.shape[0], width=self.shape[1],
+                    count=self.part_count)
+        if end is not None:
+            meta['end'] = end
+        data = self.MAGIC + json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.HEADER_SIZE:
+            raise ValueError("слишком большой заголовок записи")
+        self.file.seek(0)
+        self.file.write(data.ljust(self.HEADER_SIZE, b" "))
+        self.file.seek(0, os.SEEK_END)
+    
+    def _open_part(self, shape, timestamp):
+        if self.file is not None:
+            self._close_part(timestamp)
+        self.part += 1
+        self.part_count = 0
+        self.shape = shape
+        self.record = np.zeros(1, self.record_dtype(*shape))
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.file = open(self.part_path(self.path, self.part), "wb")
+        self._write_header()
+    
+    def _close_part(self, end):
+        try:
+            self._write_header(end)
+        finally:
+            self.file.close()
+            self.file = None
+    
+    def append(self, timestamp, gray, result, scale, resumed=False):
+        """Дописать проанализированный кадр и его результат"""
+        if self.file is None or gray.shape != self.shape:
+            self._open_part(gray.shape, timestamp)
+        record = self.record[0]
+        flags = 0
+        if result.unknown:
+            flags |= self.FLAG_UNKNOWN
+        if result.face_detected:
+            flags |= self.FLAG_FACE
+        if result.eyes_detected:
+            flags |= self.FLAG_EYES
+        if resumed:
+            flags |= self.FLAG_RESUMED
+        record['timestamp'] = timestamp
+        record['scale'] = scale
+        record['flags'] = flags
+        faces = result.faces[:self.MAX_FACES]
+        record['face_count'] = len(faces)
+        record['faces'] = 0
+        record['eye_counts'] = 0
+        for i, face in enumerate(faces):
+            record['faces'][i] = face
+            record['eye_counts'][i] = min(255, len(result.eyes[i]) if i < len(result.eyes) else 0)
+        record['gray'] = gray
+        self.file.write(self.record.tobytes())
+        self.part_count += 1
+        self.count += 1
+    
+    def close(self, end):
+        if self.file is not None:
+            self._close_part(end)
+
+
+class FrameRecording:
+    """Чтение записи кадров через np.memmap
+    
+    Кадры не загружаются в память целиком: записи читаются с диска по
+    обращению, так что по многочасовой записи можно свободно перематывать.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.parts = []
+        self.meta = None
+        index = 0
+        while os.path.exists(FrameRecorder.part_path(path, index)):
+            part_path = FrameRecorder.part_path(path, index)
+            meta = FrameRecorder.read_header(part_path)
+            if self.meta is None:
+                self.meta = meta
+            else:
+                self.meta['end'] = meta.get('end', self.meta.get('end'))
+            dtype = FrameRecorder.record_dtype(meta['height'], meta['width'])
+            # Число целых записей - по размеру файла (заголовок мог не обновиться)
+            count = (os.path.getsize(part_path) - FrameRecorder.HEADER_SIZE) // dtype.itemsize
+            if count > 0:
+                self.parts.append(np.memmap(part_path, dtype=dtype, mode='r',
+                                            offset=FrameRecorder.HEADER_SIZE, shape=(count,)))
+            index += 1
+        if not self.parts:
+            raise ValueError(f"в записи нет кадров: {path}")
+        self.offsets = np.cumsum([0] + [len(part) for part in self.parts])
+        self.timestamps = np.concatenate([np.array(part['timestamp']) for part in self.parts])
+    
+    def __len__(self):
+        return int(self.offsets[-1])
+    
+    @property
+    def start(self):
+        return self.meta.get('start', float(self.timestamps[0]))
+    
+    @property
+    def end(self):
+        return max(self.meta.get('end') or 0.0, float(self.timestamps[-1]))
+    
+    @property
+    def speed(self):
+        return self.meta.get('speed', 1.0)
+    
+    def record(self, index):
+        part = int(np.searchsorted(self.offsets, index, side='right')) - 1
+        return self.parts[part][index - self.offsets[part]]
+    
+    def index_at(self, timestamp):
+        """Номер первого кадра не раньше timestamp (для перемотки)"""
+        return min(len(self) - 1, int(np.searchsorted(self.timestamps, timestamp)))
+
+
+class ReplayClock:
+    """Часы повтора: время сессии идет только по меткам записанных кадров
+    
+    rate - скорость воспроизведения относительно записи (0 - без пауз).
+    speed - ускорение часов исходной сессии, от него зависят те же
+    ограничения, что и при записи.
+    """
+    
+    MAX_SLEEP = 0.05
+    
+    def __init__(self, recording, rate=1.0):
+        self.origin = recording.start
+        self.speed = recording.speed
+        self.rate = rate
+        self.now = self.origin
+    
+    def reset(self):
+        self.now = self.origin
+    
+    def time(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        real = seconds / (self.speed * self.rate) if self.rate > 0 else 0.0005
+        time.sleep(min(real, self.MAX_SLEEP))
+    
+    def finish(self, end):
+        self.now = max(self.now, end)
+
+
+class ReplayVideoSource:
+    """Источник кадров из записи (интерфейс как у cv2.VideoCapture)
+    
+    Выдает записанные кадры по порядку и переводит ReplayClock на метку
+    каждого кадра, поэтому track_eyes получает то же время и те же
+    изображения, что и в исходной сессии. Кадры отдаются неотраженными -
+    цикл отслеживания отразит их обратно.
+    """
+    
+    MAX_REPORTED = 20
+    
+    def __init__(self, recording, clock, opened=True, first=0):
+        self.recording = recording
+        self.clock = clock
+        self.opened = opened
+        self.index = first - 1
+        self.real_origin = None
+        self.current = None
+        self.checked = 0
+        self.mismatches = 0
+        self.reported = []
+    
+    @classmethod
+    def opener(cls, recording, clock, first=0):
+        """Функция открытия для CameraPool: запись доступна как камера #0"""
+        return lambda index, backend: cls(recording, clock, opened=index == 0, first=first)
+    
+    def isOpened(self):
+        return self.opened
+    
+    def release(self):
+        self.opened = False
+    
+    def set(self, prop, value):
+        # Размер кадра задан записью
+        return False
+    
+    def get(self, prop):
+        record = self.current if self.current is not None else self.recording.record(0)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return record['gray'].shape[1]
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return record['gray'].shape[0]
+        if prop == cv2.CAP_PROP_FPS:
+            return self.recording.meta.get('detection', {}).get('detection_hz', 0)
+        return 0
+    
+    def grab(self):
+        if not self.opened:
+            return False
+        index = self.index + 1
+        if index >= len(self.recording):
+            self.clock.finish(self.recording.end)
+            return False
+        timestamp = float(self.recording.timestamps[index])
+        rate = self.clock.rate
+        if rate > 0:
+            # Расписание от первого кадра - задержки цикла не накапливаются
+            if self.real_origin is None:
+                self.real_origin = time.time() - (timestamp - self.clock.origin) / (self.clock.speed * rate)
+            due = self.real_origin + (timestamp - self.clock.origin) / (self.clock.speed * rate)
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        self.index = index
+        self.current = self.recording.record(index)
+        self.clock.now = timestamp
+        return True
+    
+    def retrieve(self):
+        if self.current is None:
+            return False, None
+        frame = cv2.cvtColor(np.array(self.current['gray']), cv2.COLOR_GRAY2BGR)
+        return True, cv2.flip(frame, 1)
+    
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+    
+    @property
+    def resumed(self):
+        """Первый кадр после паузы в исходной сессии"""
+        return bool(self.current['flags'] & FrameRecorder.FLAG_RESUMED)
+    
+    @property
+    def scale(self):
+        return float(self.current['scale'])
+    
+    def verify(self, result):
+        """Сравнить результат повтора с записанным для текущего кадра"""
+        record = self.current
+        self.checked += 1
+        flags = record['flags']
+        differences = []
+        if bool(flags & FrameRecorder.FLAG_UNKNOWN) != result.unknown:
+            differences.append("качество кадра")
+        if bool(flags & FrameRecorder.FLAG_FACE) != result.face_detected:
+            differences.append("лицо")
+        if bool(flags & FrameRecorder.FLAG_EYES) != result.eyes_detected:
+            differences.append("глаза")
+        count = int(record['face_count'])
+        faces = [tuple(int(v) for v in face) for face in record['faces'][:count]]
+        if faces != [tuple(int(v) for v in face) for face in result.faces[:FrameRecorder.MAX_FACES]]:
+            differences.append("рамки лиц")
+        else:
+            eyes = [len(result.eyes[i]) if i < len(result.eyes) else 0 for i in range(count)]
+            if eyes != [int(v) for v in record['eye_counts'][:count]]:
+                differences.append("рамки глаз")
+        if differences:
+            self.mismatches += 1
+            if len(self.reported) < self.MAX_REPORTED:
+                offset = float(record['timestamp']) - self.recording.start
+                self.reported.append((self.index, offset, ", ".join(differences)))
+
+
+class JpegFrame:
+    """Сжатый кадр MJPEG: декодируется только то, что нужно, и сразу в
+    уменьшенном масштабе (масштабирование DCT в libjpeg)"""
+    
+    def __init__(self, data, reduction=1, mirror=False):
+        self.data = data
+        self.reduction = reduction
+        self.mirror = mirror
+    
+    def _decode(self, flags):
+        image = cv2.imdecode(self.data, flags[self.reduction])
+        if image is not None and self.mirror:
+            image = cv2.flip(image, 1)
+        return image
+    
+    def gray(self):
+        """Серый кадр для детекции"""
+        return self._decode({
+            1: cv2.IMREAD_GRAYSCALE,
+            2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+            4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+            8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+        })
+    
+    def color(self):
+        """Цветной кадр того же масштаба (только для превью)"""
+        return self._decode({
+            1: cv2.IMREAD_COLOR,
+            2: cv2.IMREAD_REDUCED_COLOR_2,
+            4: cv2.IMREAD_REDUCED_COLOR_4,
+            8: cv2.IMREAD_REDUCED_COLOR_8,
+        })
+
+
+class MjpegReader:
+    """Чтение кадров MJPEG без декодирования драйвером в BGR
+    
+    Камера переводится в MJPG с CAP_PROP_CONVERT_RGB=0, и read() отдает
+    сжатые байты. Если драйвер так не умеет (кадр не JPEG), enable()
+    возвращает камеру в обычный режим и сообщает False.
+    """
+    
+    # Меньше этой ширины кадр не уменьшаем (для нее заданы параметры детектора)
+    MIN_DECODED_WIDTH = 640
+    
+    def __init__(self, cap, mirror=False):
+        self.cap = cap
+        self.mirror = mirror
+        self.reduction = 1
+    
+    @staticmethod
+    def is_jpeg(data):
+        return (isinstance(data, np.ndarray) and data.dtype == np.uint8 and data.size > 4
+                and data.reshape(-1)[0] == 0xFF and data.reshape(-1)[1] == 0xD8)
+    
+    def enable(self):
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        ret, data = self.cap.read()
+        if ret and self.is_jpeg(data):
+            self.update_reduction()
+            return True
+        self.disable()
+        return False
+    
+    def disable(self):
+        self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+    
+    def update_reduction(self):
+        """Масштаб декодирования по текущей ширине кадра (после смены разрешения)"""
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.reduction = 1
+        while self.reduction < 8 and width // (self.reduction * 2) >= self.MIN_DECODED_WIDTH:
+            self.reduction *= 2
+    
+    def read(self):
+        ret, data = self.cap.read()
+        if not ret or not self.is_jpeg(data):
+            return None
+        return JpegFrame(data.reshape(-1), self.reduction, self.mirror)
+
+
 class IVCamManager:
     """Менеджер для работы с iVCam"""
     
-    def __init__(self):
+    def __init__(self, camera_pool=None):
+        self.camera_pool = camera_pool or CameraPool()
         self.ivcam_connected = False
         self.cap = None
         self.camera_index = None
@@ -90,7 +1270,7 @@ class IVCamManager:
         # Пробуем найти iVCam среди камер
         max_cameras = 10
         for i in range(max_cameras):
-            cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
+            cap = self.camera_pool.open_probe(i)
             if cap.isOpened():
                 ret, frame = cap.read()
                 if ret:
@@ -146,7 +1326,7 @@ class IVCamManager:
         
         # Проверяем наличие драйвера через DirectShow
         try:
-            cap = cv2.VideoCapture(1, cv2.CAP_DSHOW)
+            cap = self.camera_pool.open_probe(1)
             if cap.isOpened():
                 cap.release()
                 self.ivcam_installed = True
@@ -168,10 +1348,12 @@ class IVCamManager:
                 return False
         
         try:
-            # Используем DirectShow для Windows
-            self.cap = cv2.VideoCapture(self.camera_index, cv2.CAP_DSHOW)
+            # Берем камеру из пула (если она уже открыта - подключаемся к ней)
+            if self.cap is not None:
+                self.cap.release()
+            self.cap = self.camera_pool.acquire(self.camera_index)
             
-            if self.cap.isOpened():
+            if self.cap is not None:
                 # Настраиваем параметры для лучшей производительности
                 self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
                 self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
@@ -195,69 +1377,3801 @@ class IVCamManager:
             print(f"✗ Ошибка подключения к iVCam: {e}")
             return False
     
+    def set_resolution(self, width, height):
+        """Смена разрешения без переподключения камеры"""
+        if self.cap and self.ivcam_connected:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    
+    def keep_alive(self):
+        """Захват кадра без декодирования, чтобы поток камеры не засыпал"""
+        cap = self.cap
+        if cap and self.ivcam_connected:
+            return cap.grab()
+        return False
+    
     def get_frame(self):
         """Получение кадра с iVCam"""
-        if self.cap and self.ivcam_connected:
-            ret, frame = self.cap.read()
+        # Дескриптор берем один раз: release() из другого потока может его обнулить
+        cap = self.cap
+        if cap and self.ivcam_connected:
+            ret, frame = cap.read()
             if ret:
                 return frame
         return None
     
-    def release(self):
-        """Освобождение ресурсов iVCam"""
+    def release(self, cap=None):
+        """Освобождение ресурсов iVCam (cap - только этот дескриптор сессии)"""
+        if cap is not None and cap is not self.cap:
+            # Камера уже передана следующей сессии - отдаем только свой дескриптор
+            cap.release()
+            return
         if self.cap:
             self.cap.release()
             self.cap = None
         self.ivcam_connected = False
         self.ivcam_running = False
     
-    def is_connected(self):
-        """Проверка подключения iVCam"""
-        return self.ivcam_connected
+    def is_connected(self):
+        """Проверка подключения iVCam"""
+        return self.ivcam_connected
+    
+    def get_connection_info(self):
+        """Получение информации о подключении"""
+        if self.cap and self.ivcam_connected:
+            width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            fps = self.cap.get(cv2.CAP_PROP_FPS)
+        else:
+            width = height = fps = 0
+        
+        return {
+            'connected': self.ivcam_connected,
+            'camera_index': self.camera_index,
+            'resolution': f"{width}x{height}",
+            'fps': fps,
+            'installed': self.ivcam_installed
+        }
+    
+    def scan_all_cameras(self):
+        """Сканирование всех доступных камер для отладки"""
+        print("📡 Сканирование всех камер...")
+        cameras = []
+        
+        max_cameras = 10
+        for i in range(max_cameras):
+            cap = self.camera_pool.open_probe(i)
+            if cap.isOpened():
+                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                fps = cap.get(cv2.CAP_PROP_FPS)
+                
+                cameras.append({
+                    'index': i,
+                    'width': width,
+                    'height': height,
+                    'fps': fps
+                })
+                
+                print(f"  Камера #{i}: {width}x{height} @ {fps}FPS")
+                cap.release()
+            else:
+                print(f"  Камера #{i}: недоступна")
+        
+        return cameras
+
+
+class FrameQuality:
+    """Дешевые метрики качества кадра (по уменьшенной копии)"""
+    
+    def __init__(self, brightness, contrast, sharpness, reason=None, enhance=False):
+        # Средняя яркость 0..255
+        self.brightness = brightness
+        # Контраст - стандартное отклонение яркости
+        self.contrast = contrast
+        # Резкость - дисперсия лапласиана
+        self.sharpness = sharpness
+        # Причина непригодности ("dark", "overexposed", "flat", "blurred") или None
+        self.reason = reason
+        # Стоит ли выравнивать гистограмму перед детекцией
+        self.enhance = enhance
+    
+    @property
+    def usable(self):
+        return self.reason is None
+    
+    def describe(self):
+        names = {
+            'dark': "слишком темно",
+            'overexposed': "засвет",
+            'flat': "нет контраста",
+            'blurred': "размытие",
+        }
+        return names.get(self.reason, "норма")
+
+
+class DetectionResult:
+    """Результат анализа одного кадра"""
+    
+    def __init__(self, timestamp, faces=None, eyes=None, tracks=None, quality=None):
+        self.timestamp = timestamp
+        # Рамки лиц (x, y, w, h) в координатах кадра
+        self.faces = faces if faces is not None else []
+        # Для каждого лица - список рамок глаз в координатах кадра
+        self.eyes = eyes if eyes is not None else []
+        # Сопровождаемые лица (FaceTrack), включая временно потерянные
+        self.tracks = tracks if tracks is not None else []
+        # Решение, объединенное по нескольким камерам (None - по этому кадру)
+        self.fused_face = None
+        self.fused_eyes = None
+        self.sources = {}
+        # Качество кадра (None - не оценивалось)
+        self.quality = quality
+    
+    @property
+    def unknown(self):
+        """Кадр непригоден для анализа: нельзя сказать, есть ли лицо"""
+        return self.quality is not None and not self.quality.usable
+    
+    @property
+    def face_detected(self):
+        if self.fused_face is not None:
+            return self.fused_face
+        return len(self.faces) > 0
+    
+    @property
+    def eyes_detected(self):
+        if self.fused_eyes is not None:
+            return self.fused_eyes
+        return any(len(face_eyes) > 0 for face_eyes in self.eyes)
+
+
+class DetectorPool:
+    """Каскады Haar: файл читается и разбирается один раз на процесс
+    
+    Разобранное дерево XML общее, а экземпляры CascadeClassifier у
+    каждого потока свои (detectMultiScale одного экземпляра из разных
+    потоков небезопасен).
+    """
+    
+    FACE = 'haarcascade_frontalface_default.xml'
+    EYE = 'haarcascade_eye.xml'
+    
+    def __init__(self, cascade_dir=None):
+        self.cascade_dir = cascade_dir or cv2.data.haarcascades
+        self.lock = threading.Lock()
+        # Имя файла -> (FileStorage, корневой узел); FileStorage держим,
+        # пока живы узлы
+        self.parsed = {}
+        self.local = threading.local()
+        # Метрики загрузки
+        self.file_metrics = {}
+        self.instances = 0
+        self.instance_ms = 0.0
+    
+    def _parse(self, name):
+        """Чтение и разбор файла каскада (только при первом обращении)"""
+        with self.lock:
+            if name in self.parsed:
+                return self.parsed[name]
+            
+            path = os.path.join(self.cascade_dir, name)
+            started = time.perf_counter()
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            read_ms = (time.perf_counter() - started) * 1000
+            
+            started = time.perf_counter()
+            storage = cv2.FileStorage(text, cv2.FILE_STORAGE_READ | cv2.FILE_STORAGE_MEMORY)
+            node = storage.getFirstTopLevelNode()
+            parse_ms = (time.perf_counter() - started) * 1000
+            
+            self.parsed[name] = (storage, node)
+            self.file_metrics[name] = {
+                'bytes': len(text),
+                'read_ms': round(read_ms, 2),
+                'parse_ms': round(parse_ms, 2),
+            }
+            return self.parsed[name]
+    
+    def create(self, name):
+        """Новый экземпляр каскада (для передачи в другой поток) или None"""
+        try:
+            _, node = self._parse(name)
+            started = time.perf_counter()
+            cascade = cv2.CascadeClassifier()
+            with self.lock:
+                loaded = cascade.read(node)
+            if not loaded or cascade.empty():
+                # Старые версии OpenCV не читают каскад из узла - грузим файл
+                cascade = cv2.CascadeClassifier(os.path.join(self.cascade_dir, name))
+            elapsed = (time.perf_counter() - started) * 1000
+        except Exception as e:
+            print(f"Предупреждение: не удалось загрузить каскад {name}: {e}")
+            return None
+        
+        with self.lock:
+            self.instances += 1
+            self.instance_ms += elapsed
+        return cascade
+    
+    def get(self, name):
+        """Экземпляр каскада текущего потока"""
+        cascades = getattr(self.local, 'cascades', None)
+        if cascades is None:
+            cascades = self.local.cascades = {}
+        if name not in cascades:
+            cascades[name] = self.create(name)
+        return cascades[name]
+    
+    def new_analyzer(self):
+        """Анализатор со своими экземплярами каскадов"""
+        return FaceAnalyzer(self.create(self.FACE), self.create(self.EYE))
+    
+    def thread_analyzer(self):
+        """Анализатор на каскадах текущего потока"""
+        return FaceAnalyzer(self.get(self.FACE), self.get(self.EYE))
+    
+    def metrics(self):
+        with self.lock:
+            return {
+                'files': dict(self.file_metrics),
+                'instances': self.instances,
+                'instance_ms': round(self.instance_ms, 2),
+            }
+    
+    def describe(self):
+        m = self.metrics()
+        parse_ms = sum(f['read_ms'] + f['parse_ms'] for f in m['files'].values())
+        average = m['instance_ms'] / m['instances'] if m['instances'] else 0
+        return (f"каскадов разобрано: {len(m['files'])} за {parse_ms:.1f} мс, "
+                f"экземпляров: {m['instances']} (в среднем {average:.1f} мс)")
+
+
+class FaceAnalyzer:
+    """Детекция лиц и пакетная детекция глаз на кадре"""
+    
+    # Размер плитки лица в мозаике для каскада глаз
+    EYE_TILE_WIDTH = 120
+    EYE_TILE_HEIGHT = 72
+    EYE_TILE_GAP = 8
+    # Доля высоты лица, в которой ищем глаза
+    EYE_REGION = 0.6
+    
+    # Ширина кадра, для которой задан min_size
+    REFERENCE_WIDTH = 640
+    # Размер окна каскада лиц - меньше искать бессмысленно
+    MIN_FACE_WINDOW = 24
+    
+    # Ширина уменьшенной копии для оценки качества кадра
+    QUALITY_SAMPLE_WIDTH = 160
+    # Пороги непригодного кадра
+    MIN_BRIGHTNESS = 30
+    MAX_BRIGHTNESS = 225
+    MIN_CONTRAST = 10
+    MIN_SHARPNESS = 8
+    # Ниже этих значений кадр пригоден, но выравнивание улучшит детекцию
+    ENHANCE_BRIGHTNESS = 80
+    ENHANCE_CONTRAST = 35
+    
+    def __init__(self, face_cascade, eye_cascade):
+        self.face_cascade = face_cascade
+        self.eye_cascade = eye_cascade
+        self.scale_factor = 1.1
+        self.min_neighbors = 5
+        self.min_size = (50, 50)
+        # Во сколько раз уменьшать кадр перед поиском лиц
+        self.detection_scale = 1.0
+        # Пропускать непригодные кадры без запуска каскадов
+        self.quality_filter = True
+        self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    
+    def analyze(self, gray, timestamp=None):
+        """Поиск всех лиц и глаз на сером кадре"""
+        if timestamp is None:
+            timestamp = time.time()
+        
+        quality = None
+        if self.quality_filter:
+            quality = self.assess_quality(gray)
+            if not quality.usable:
+                # Каскады на таком кадре бесполезны - результат "неизвестно"
+                return DetectionResult(timestamp, quality=quality)
+            if quality.enhance:
+                gray = self.clahe.apply(gray)
+        
+        faces = self.detect_faces(gray)
+        eyes = self.detect_eyes_batched(gray, faces)
+        return DetectionResult(timestamp, faces, eyes, quality=quality)
+    
+    def assess_quality(self, gray):
+        """Яркость, контраст и резкость по уменьшенной копии кадра"""
+        height, width = gray.shape[:2]
+        if width > self.QUALITY_SAMPLE_WIDTH:
+            scale = self.QUALITY_SAMPLE_WIDTH / width
+            small = cv2.resize(gray, (self.QUALITY_SAMPLE_WIDTH, max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        else:
+            small = gray
+        
+        mean, std = cv2.meanStdDev(small)
+        brightness = float(mean[0][0])
+        contrast = float(std[0][0])
+        sharpness = float(cv2.Laplacian(small, cv2.CV_64F).var())
+        
+        reason = None
+        if brightness < self.MIN_BRIGHTNESS:
+            reason = 'dark'
+        elif brightness > self.MAX_BRIGHTNESS:
+            reason = 'overexposed'
+        elif contrast < self.MIN_CONTRAST:
+            reason = 'flat'
+        elif sharpness < self.MIN_SHARPNESS:
+            reason = 'blurred'
+        
+        enhance = brightness < self.ENHANCE_BRIGHTNESS or contrast < self.ENHANCE_CONTRAST
+        return FrameQuality(brightness, contrast, sharpness, reason, enhance)
+    
+    def detect_faces(self, gray):
+        """Детекция лиц каскадом Haar"""
+        if self.face_cascade is None:
+            return []
+        
+        scale = self.detection_scale
+        small = gray
+        if scale != 1.0:
+            small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        
+        # min_size задан для кадра шириной 640 - пересчитываем под текущий
+        k = small.shape[1] / self.REFERENCE_WIDTH
+        min_size = (max(self.MIN_FACE_WINDOW, int(self.min_size[0] * k)),
+                    max(self.MIN_FACE_WINDOW, int(self.min_size[1] * k)))
+        
+        faces = self.face_cascade.detectMultiScale(
+            small,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=min_size
+        )
+        return [tuple(int(v / scale) for v in face) for face in faces]
+    
+    def detect_eyes_batched(self, gray, faces):
+        """Поиск глаз сразу для всех лиц за один проход каскада
+        
+        Верхние части лиц приводятся к одному размеру и склеиваются в
+        мозаику, по которой каскад глаз запускается один раз. Крупные лица
+        при этом уменьшаются, а накладные расходы на пирамиду масштабов
+        делятся между всеми людьми в кадре.
+        """
+        eyes = [[] for _ in faces]
+        if self.eye_cascade is None or not faces:
+            return eyes
+        
+        tile_w = self.EYE_TILE_WIDTH
+        tile_h = self.EYE_TILE_HEIGHT
+        step = tile_w + self.EYE_TILE_GAP
+        
+        mosaic = np.zeros((tile_h, step * len(faces) - self.EYE_TILE_GAP), dtype=np.uint8)
+        regions = []
+        for i, (x, y, w, h) in enumerate(faces):
+            region_h = max(1, int(h * self.EYE_REGION))
+            roi = gray[y:y+region_h, x:x+w]
+            if roi.size == 0:
+                regions.append(None)
+                continue
+            mosaic[:, i*step:i*step+tile_w] = cv2.resize(roi, (tile_w, tile_h))
+            regions.append((x, y, w / tile_w, region_h / tile_h))
+        
+        found = self.eye_cascade.detectMultiScale(
+            mosaic,
+            minSize=(tile_w // 8, tile_w // 8),
+            maxSize=(tile_w // 2, tile_w // 2)
+        )
+        
+        for (ex, ey, ew, eh) in found:
+            i = int(ex + ew // 2) // step
+            if i >= len(faces) or regions[i] is None:
+                continue
+            # Центр глаза попал в зазор между плитками
+            if ex + ew // 2 - i * step >= tile_w:
+                continue
+            x, y, sx, sy = regions[i]
+            eyes[i].append((
+                int(x + (ex - i * step) * sx),
+                int(y + ey * sy),
+                int(ew * sx),
+                int(eh * sy)
+            ))
+        
+        return eyes
+
+
+class FaceTrack:
+    """Лицо, сопровождаемое между кадрами"""
+    
+    def __init__(self, track_id, box, eyes, timestamp):
+        self.track_id = track_id
+        self.box = box
+        self.eyes = eyes
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.hits = 1
+        self.missed = 0
+        # Владелец ли это (None - еще не проверяли) и число проверок
+        self.owner = None
+        self.owner_checks = 0
+    
+    @property
+    def visible(self):
+        return self.missed == 0
+
+
+class FaceTracker:
+    """Присвоение лицам стабильных ID по пересечению рамок между кадрами"""
+    
+    def __init__(self, iou_threshold=0.3, max_lost_seconds=10):
+        self.iou_threshold = iou_threshold
+        self.max_lost_seconds = max_lost_seconds
+        self.tracks = {}
+        self.next_id = 1
+    
+    @staticmethod
+    def box_iou(a, b):
+        """Пересечение рамок, деленное на объединение"""
+        ax, ay, aw, ah = a
+        bx, by, bw, bh = b
+        ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+        iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+        inter = ix * iy
+        union = aw * ah + bw * bh - inter
+        return inter / union if union > 0 else 0.0
+    
+    def _match_score(self, track, box):
+        """Оценка соответствия лица треку (0 - не подходит)"""
+        iou = self.box_iou(track.box, box)
+        if iou >= self.iou_threshold:
+            return iou
+        
+        # При быстром движении рамки могут почти не пересекаться -
+        # допускаем близкие центры у лиц похожего размера
+        tx, ty, tw, th = track.box
+        bx, by, bw, bh = box
+        dx = (tx + tw / 2) - (bx + bw / 2)
+        dy = (ty + th / 2) - (by + bh / 2)
+        if (dx * dx + dy * dy) ** 0.5 < 0.5 * tw and 0.7 < bw / tw < 1.4:
+            return self.iou_threshold / 2
+        return 0.0
+    
+    def update(self, faces, eyes, timestamp):
+        """Сопоставление найденных лиц с треками, возвращает все живые треки"""
+        pairs = []
+        for track in self.tracks.values():
+            for i, box in enumerate(faces):
+                score = self._match_score(track, box)
+                if score > 0:
+                    pairs.append((score, track.track_id, i))
+        
+        # Жадное сопоставление: сначала самые уверенные пары
+        pairs.sort(reverse=True)
+        matched_tracks = set()
+        matched_faces = set()
+        for score, track_id, i in pairs:
+            if track_id in matched_tracks or i in matched_faces:
+                continue
+            track = self.tracks[track_id]
+            track.box = faces[i]
+            track.eyes = eyes[i]
+            track.last_seen = timestamp
+            track.hits += 1
+            track.missed = 0
+            matched_tracks.add(track_id)
+            matched_faces.add(i)
+        
+        for track_id, track in list(self.tracks.items()):
+            if track_id in matched_tracks:
+                continue
+            track.missed += 1
+            track.eyes = []
+            if timestamp - track.last_seen > self.max_lost_seconds:
+                del self.tracks[track_id]
+        
+        for i, box in enumerate(faces):
+            if i not in matched_faces:
+                track = FaceTrack(self.next_id, box, eyes[i], timestamp)
+                self.tracks[track.track_id] = track
+                self.next_id += 1
+        
+        return list(self.tracks.values())
+    
+    def reset(self):
+        """Сброс всех треков"""
+        self.tracks = {}
+        self.next_id = 1
+
+
+def uniform_lbp_table():
+    """Номера столбцов для 8-битных LBP-кодов: 58 равномерных и общий"""
+    table = np.full(256, 58, dtype=np.uint8)
+    column = 0
+    for code in range(256):
+        bits = [(code >> i) & 1 for i in range(8)]
+        if sum(bits[i] != bits[(i + 1) % 8] for i in range(8)) <= 2:
+            table[code] = column
+            column += 1
+    return table
+
+
+class OwnerVerifier:
+    """Проверка, что сопровождаемое лицо - зарегистрированный владелец
+    
+    Подпись лица - гистограммы равномерных LBP-кодов по сетке ячеек
+    выровненной по яркости вырезки (как в LBPH, но на NumPy без
+    opencv-contrib). Расстояние - хи-квадрат до ближайшего образца,
+    образцы хранятся и в отраженном виде: кадры камеры ПК зеркалятся, а
+    iVCam - нет. Проверяется только новый трек (несколько первых кадров),
+    результат кэшируется в треке - стоимость на кадр не растет.
+    """
+    
+    SIZE = 64
+    GRID = 4
+    # Коды с не более чем двумя переходами 0/1 - свой столбец, прочие - общий
+    UNIFORM = uniform_lbp_table()
+    BINS = 59
+    NEIGHBORS = ((-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1))
+    # Расстояние, ниже которого лицо считается владельцем. Эмпирическое
+    # значение: на пробных снимках свои лица ложились заметно ниже, чужие -
+    # выше. Для другой камеры или освещения его можно задать через
+    # ANTIPROCRASTINATOR_OWNER_THRESHOLD (порог, записанный с образцом, важнее)
+    MATCH_THRESHOLD = 0.3
+    # Сколько первых кадров трека пытаться опознать владельца
+    VERIFY_ATTEMPTS = 3
+    MIN_SAMPLES = 5
+    # Порог по умолчанию с учетом окружения (разбирается один раз)
+    _default_threshold = None
+    
+    def __init__(self, samples=None, threshold=None):
+        # Образцы: (число, ячейки, столбцы)
+        self.samples = samples
+        self.threshold = threshold if threshold is not None else self.default_threshold()
+        # Затраты на проверки
+        self.checks = 0
+        self.check_ms = 0.0
+    
+    @classmethod
+    def default_threshold(cls):
+        """ANTIPROCRASTINATOR_OWNER_THRESHOLD или MATCH_THRESHOLD"""
+        if cls._default_threshold is None:
+            threshold = cls.MATCH_THRESHOLD
+            value = os.environ.get("ANTIPROCRASTINATOR_OWNER_THRESHOLD")
+            if value:
+                try:
+                    threshold = float(value)
+                    if not threshold > 0:
+                        raise ValueError("порог должен быть больше нуля")
+                except ValueError as e:
+                    print(f"⚠️ Некорректный ANTIPROCRASTINATOR_OWNER_THRESHOLD={value!r} ({e}), "
+                          f"порог {cls.MATCH_THRESHOLD}")
+                    threshold = cls.MATCH_THRESHOLD
+            cls._default_threshold = threshold
+        return cls._default_threshold
+    
+    @property
+    def enrolled(self):
+        return self.samples is not None and len(self.samples) > 0
+    
+    @classmethod
+    def signature(cls, gray, box, mirror=False):
+        """Подпись лица в рамке (None - рамка вне кадра)"""
+        x, y, w, h = box
+        # Без фона по краям рамки каскада
+        roi = gray[max(0, y + h // 10):y + h * 19 // 20, max(0, x + w // 10):x + w * 9 // 10]
+        if roi.size == 0:
+            return None
+        roi = cv2.resize(roi, (cls.SIZE + 2, cls.SIZE + 2), interpolation=cv2.INTER_AREA)
+        if mirror:
+            roi = cv2.flip(roi, 1)
+        roi = cv2.equalizeHist(roi)
+        
+        center = roi[1:-1, 1:-1]
+        codes = np.zeros(center.shape, dtype=np.uint8)
+        for bit, (dy, dx) in enumerate(cls.NEIGHBORS):
+            neighbor = roi[1 + dy:cls.SIZE + 1 + dy, 1 + dx:cls.SIZE + 1 + dx]
+            codes |= (neighbor >= center).astype(np.uint8) << bit
+        
+        cell = np.arange(cls.SIZE) // (cls.SIZE // cls.GRID)
+        cells = cell[:, None] * cls.GRID + cell[None, :]
+        histograms = np.bincount((cells * cls.BINS + cls.UNIFORM[codes]).ravel(),
+                                 minlength=cls.GRID * cls.GRID * cls.BINS)
+        histograms = histograms.reshape(cls.GRID * cls.GRID, cls.BINS).astype(np.float32)
+        return histograms / histograms.sum(axis=1, keepdims=True)
+    
+    def distance(self, signature):
+        """Хи-квадрат до ближайшего образца (в среднем на ячейку)"""
+        diff = (self.samples - signature) ** 2 / (self.samples + signature + 1e-9)
+        return float(diff.sum(axis=(1, 2)).min() / signature.shape[0])
+    
+    def enroll(self, gray_frames_boxes):
+        """Образцы по кадрам с лицом владельца: [(серый кадр, рамка), ...]"""
+        samples = []
+        for gray, box in gray_frames_boxes:
+            for mirror in (False, True):
+                signature = self.signature(gray, box, mirror)
+                if signature is not None:
+                    samples.append(signature)
+        if len(samples) < 2 * self.MIN_SAMPLES:
+            raise ValueError(f"нужно хотя бы {self.MIN_SAMPLES} кадров с лицом")
+        self.samples = np.stack(samples)
+    
+    def verify(self, track, gray):
+        """Проверка трека, пока владелец не опознан или не кончились попытки"""
+        if track.owner is not None:
+            return track.owner
+        started = time.perf_counter()
+        signature = self.signature(gray, track.box)
+        match = signature is not None and self.distance(signature) < self.threshold
+        self.checks += 1
+        self.check_ms += (time.perf_counter() - started) * 1000
+        
+        track.owner_checks += 1
+        if match:
+            track.owner = True
+        elif track.owner_checks >= self.VERIFY_ATTEMPTS:
+            track.owner = False
+        return match
+    
+    def save(self, path=None):
+        """Атомарная запись образцов"""
+        path = path or OWNER_PROFILE_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, samples=self.samples, threshold=self.threshold)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path=None):
+        """Образцы владельца с диска (без образцов - пустой проверяющий)"""
+        path = path or OWNER_PROFILE_PATH
+        if not os.path.exists(path):
+            return cls()
+        try:
+            with np.load(path) as data:
+                samples = data['samples'].astype(np.float32)
+                # Порог, записанный с образцом, важнее порога по умолчанию
+                threshold = float(data['threshold']) if 'threshold' in data.files else None
+            if samples.shape[1:] != (cls.GRID * cls.GRID, cls.BINS):
+                raise ValueError(f"неожиданный размер образцов {samples.shape}")
+            return cls(samples, threshold)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️ Не удалось загрузить образец лица владельца: {e}")
+            return cls()
+
+
+class BlinkEstimator:
+    """Моргания и долгие закрытия глаз по рамкам глаз основного лица
+    
+    Открытость глаза - доля строк центральной полосы рамки, в которых есть
+    темные пиксели (радужка и зрачок). Закрытый глаз дает только линию
+    века. Каскад глаз на закрытых глазах обычно ничего не находит, поэтому
+    используются последние найденные рамки относительно рамки лица.
+    Скользящее окно хранится в кольцевых массивах NumPy с накопленными
+    суммами - обновление за O(1) на кадр.
+    """
+    
+    WINDOW_SECONDS = 60
+    CAPACITY = 4096
+    # Открытость ниже этой доли от обычной - глаза закрыты
+    CLOSED_RATIO = 0.65
+    # Моргание - закрытие от MIN_BLINK до MAX_BLINK секунд
+    MIN_BLINK = 0.05
+    MAX_BLINK = 0.5
+    # Закрытие дольше - сонливость
+    LONG_CLOSURE = 1.5
+    # Разрыв между кадрами, после которого текущее закрытие не отслеживается
+    MAX_GAP = 2.0
+    
+    def __init__(self):
+        # Окно кадров: время, длительность и признак закрытых глаз
+        self.times = np.zeros(self.CAPACITY)
+        self.durations = np.zeros(self.CAPACITY)
+        self.closed = np.zeros(self.CAPACITY, dtype=bool)
+        self.head = 0
+        self.size = 0
+        self.window_time = 0.0
+        self.window_closed = 0.0
+        # Окно морганий (моменты)
+        self.blink_times = np.zeros(256)
+        self.blink_head = 0
+        self.blink_size = 0
+        
+        self.baseline = None
+        self.relative_eyes = []
+        self.last_timestamp = None
+        self.closed_since = None
+        self.long_reported = False
+        self.blinks = 0
+        self.long_closures = 0
+    
+    @property
+    def drowsy(self):
+        """Глаза закрыты дольше LONG_CLOSURE прямо сейчас"""
+        return self.long_reported
+    
+    @staticmethod
+    def openness(gray, box):
+        x, y, w, h = box
+        band = gray[y:y + h, x + w * 3 // 10:x + w * 7 // 10]
+        if band.size == 0:
+            return None
+        band = band.astype(np.float32)
+        lowest = band.min()
+        threshold = lowest + 0.35 * (band.mean() - lowest)
+        return float((band < threshold).any(axis=1).mean())
+    
+    def update(self, gray, face, eyes, timestamp):
+        """Учет кадра; возвращает события: "blink", "long_closure" """
+        gap = timestamp - self.last_timestamp if self.last_timestamp is not None else 0.0
+        self.last_timestamp = timestamp
+        if gap > self.MAX_GAP:
+            self.closed_since = None
+            self.long_reported = False
+            gap = 0.0
+        
+        if face is None:
+            # Лица нет - это отсутствие, а не закрытые глаза
+            self.closed_since = None
+            self.long_reported = False
+            return []
+        
+        fx, fy, fw, fh = face
+        if eyes:
+            self.relative_eyes = [((x - fx) / fw, (y - fy) / fh, w / fw, h / fh) for x, y, w, h in eyes]
+            boxes = eyes
+        elif self.relative_eyes:
+            boxes = [(int(fx + rx * fw), int(fy + ry * fh), max(1, int(rw * fw)), max(1, int(rh * fh)))
+                     for rx, ry, rw, rh in self.relative_eyes]
+        else:
+            return []
+        
+        values = [v for v in (self.openness(gray, box) for box in boxes) if v is not None]
+        if not values:
+            return []
+        value = sum(values) / len(values)
+        
+        closed = self.baseline is not None and value < self.CLOSED_RATIO * self.baseline
+        if eyes and not closed:
+            # Каскад видит открытые глаза - уточняем обычную открытость
+            self.baseline = value if self.baseline is None else 0.95 * self.baseline + 0.05 * value
+        if self.baseline is None:
+            return []
+        
+        self._push(timestamp, gap, closed)
+        return self._closure_events(timestamp, closed)
+    
+    def _push(self, timestamp, duration, closed):
+        """Добавление кадра в окно и вытеснение устаревших (амортизированно O(1))"""
+        if self.size == self.CAPACITY:
+            self._evict_oldest()
+        i = (self.head + self.size) % self.CAPACITY
+        self.times[i] = timestamp
+        self.durations[i] = duration
+        self.closed[i] = closed
+        self.size += 1
+        self.window_time += duration
+        if closed:
+            self.window_closed += duration
+        
+        while self.size and self.times[self.head] < timestamp - self.WINDOW_SECONDS:
+            self._evict_oldest()
+        while self.blink_size and self.blink_times[self.blink_head] < timestamp - self.WINDOW_SECONDS:
+            self.blink_head = (self.blink_head + 1) % len(self.blink_times)
+            self.blink_size -= 1
+    
+    def _evict_oldest(self):
+        i = self.head
+        self.window_time -= self.durations[i]
+        if self.closed[i]:
+            self.window_closed -= self.durations[i]
+        self.head = (self.head + 1) % self.CAPACITY
+        self.size -= 1
+    
+    def _closure_events(self, timestamp, closed):
+        events = []
+        if closed:
+            if self.closed_since is None:
+                self.closed_since = timestamp
+            elif not self.long_reported and timestamp - self.closed_since >= self.LONG_CLOSURE:
+                self.long_reported = True
+                self.long_closures += 1
+                events.append("long_closure")
+        elif self.closed_since is not None:
+            duration = timestamp - self.closed_since
+            if self.MIN_BLINK <= duration <= self.MAX_BLINK:
+                self.blinks += 1
+                if self.blink_size == len(self.blink_times):
+                    self.blink_head = (self.blink_head + 1) % len(self.blink_times)
+                    self.blink_size -= 1
+                self.blink_times[(self.blink_head + self.blink_size) % len(self.blink_times)] = timestamp
+                self.blink_size += 1
+                events.append("blink")
+            self.closed_since = None
+            self.long_reported = False
+        return events
+    
+    def blink_rate(self):
+        """Морганий в минуту за окно"""
+        if self.window_time <= 0:
+            return 0.0
+        return self.blink_size * 60.0 / min(self.window_time, self.WINDOW_SECONDS)
+    
+    def perclos(self):
+        """Доля времени с закрытыми глазами за окно"""
+        return self.window_closed / self.window_time if self.window_time > 0 else 0.0
+
+
+class PersonStats:
+    """Статистика фокуса одного человека (по ID трека)"""
+    
+    # Через сколько секунд отсутствия засчитывается отвлечение
+    DISTRACTION_SECONDS = 3
+    # Максимальный учитываемый интервал между кадрами
+    MAX_FRAME_GAP = 1.0
+    
+    def __init__(self, track_id, timestamp):
+        self.track_id = track_id
+        self.first_seen = timestamp
+        self.last_update = timestamp
+        self.focus_time = 0.0
+        self.seen_time = 0.0
+        self.distraction_count = 0
+        self.state = None
+        self.state_since = timestamp
+        self.distraction_counted = False
+        # Моменты смены состояния: (время, состояние)
+        self.timeline = []
+    
+    def update(self, track, timestamp):
+        """Учет очередного кадра для трека"""
+        if not track.visible:
+            state = "away"
+        elif track.eyes:
+            state = "focused"
+        else:
+            state = "eyes_hidden"
+        
+        dt = min(timestamp - self.last_update, self.MAX_FRAME_GAP)
+        if self.state == "focused":
+            self.focus_time += dt
+        if self.state in ("focused", "eyes_hidden"):
+            self.seen_time += dt
+        self.last_update = timestamp
+        
+        if state != self.state:
+            self.state = state
+            self.state_since = timestamp
+            self.distraction_counted = False
+            self.timeline.append((timestamp, state))
+        
+        if (state == "away" and not self.distraction_counted
+                and timestamp - self.state_since > self.DISTRACTION_SECONDS):
+            self.distraction_count += 1
+            self.distraction_counted = True
+    
+    def to_dict(self):
+        """Сводка для отображения и сохранения"""
+        return {
+            'track_id': self.track_id,
+            'first_seen': self.first_seen,
+            'focus_time': round(self.focus_time, 2),
+            'seen_time': round(self.seen_time, 2),
+            'distraction_count': self.distraction_count,
+            'timeline': [(round(t, 2), s) for t, s in self.timeline]
+        }
+
+
+class FocusRollups:
+    """Итоги фокуса по часам, дням и неделям
+    
+    Итоги пополняются по одной сессии при ее завершении, поэтому история
+    открывается сразу и не перечитывает хронологии всех сессий. Сводки,
+    которых еще нет в итогах (первый запуск, аварийный выход), добавляются
+    при загрузке. Почасовые итоги хранятся HOUR_RETENTION_DAYS дней,
+    дневные и недельные - без ограничения.
+    """
+    
+    LEVELS = ('hour', 'day', 'week')
+    HOUR_RETENTION_DAYS = 90
+    
+    def __init__(self, path=None):
+        self.path = path or ROLLUPS_PATH
+        self.lock = threading.Lock()
+        self.buckets = {level: {} for level in self.LEVELS}
+        # Сессии, уже учтенные в итогах
+        self.applied = set()
+    
+    @staticmethod
+    def bucket_key(level, timestamp):
+        moment = datetime.fromtimestamp(timestamp)
+        if level == 'hour':
+            return moment.strftime("%Y-%m-%d %H:00")
+        if level == 'day':
+            return moment.strftime("%Y-%m-%d")
+        year, week, _ = moment.isocalendar()
+        return f"{year}-W{week:02d}"
+    
+    @staticmethod
+    def empty_bucket():
+        return {'focus_seconds': 0.0, 'session_seconds': 0.0, 'sessions': 0,
+                'distractions': 0, 'longest_streak': 0.0}
+    
+    @staticmethod
+    def split_hours(start, end):
+        """Отрезок [start, end] по границам часов (границы дней и недель тоже на них)"""
+        pieces = []
+        while start < end:
+            hour = datetime.fromtimestamp(start).replace(minute=0, second=0, microsecond=0)
+            boundary = min(end, (hour + timedelta(hours=1)).timestamp())
+            pieces.append((start, boundary))
+            start = boundary
+        return pieces
+    
+    @staticmethod
+    def focus_streaks(summary, start):
+        """Непрерывные отрезки фокуса сессии по ее хронологии"""
+        timeline = summary.get('timeline') or []
+        duration = float(summary.get('duration', 0))
+        streaks = []
+        for i, (offset, state) in enumerate(timeline):
+            end = timeline[i + 1][0] if i + 1 < len(timeline) else duration
+            if state == "focused" and end > offset:
+                streaks.append((start + offset, start + end))
+        return streaks
+    
+    def _bucket(self, level, timestamp):
+        return self.buckets[level].setdefault(self.bucket_key(level, timestamp), self.empty_bucket())
+    
+    def add_session(self, summary):
+        """Учесть завершенную сессию (повторно одна сессия не учитывается)"""
+        with self.lock:
+            session_id = summary.get('session_id')
+            if session_id in self.applied:
+                return False
+            start = datetime.fromisoformat(summary['start']).timestamp()
+            duration = float(summary.get('duration', 0))
+            focus = float(summary.get('focus_time', 0))
+            streaks = self.focus_streaks(summary, start)
+            
+            # Время фокуса из сводки точнее хронологии - раскладываем его
+            # по часам пропорционально отрезкам фокуса
+            streak_total = sum(b - a for a, b in streaks)
+            focus_pieces = []
+            if streak_total > 0:
+                for a, b in streaks:
+                    focus_pieces.extend((pa, (pb - pa) * focus / streak_total)
+                                        for pa, pb in self.split_hours(a, b))
+            elif focus > 0:
+                focus_pieces.append((start, focus))
+            session_pieces = [(a, b - a) for a, b in self.split_hours(start, start + duration)]
+            
+            for level in self.LEVELS:
+                bucket = self._bucket(level, start)
+                bucket['sessions'] += 1
+                bucket['distractions'] += int(summary.get('distraction_count', 0))
+                for timestamp, seconds in focus_pieces:
+                    self._bucket(level, timestamp)['focus_seconds'] += seconds
+                for timestamp, seconds in session_pieces:
+                    self._bucket(level, timestamp)['session_seconds'] += seconds
+                for a, b in streaks:
+                    # Серия относится к периоду, в котором началась
+                    bucket = self._bucket(level, a)
+                    bucket['longest_streak'] = max(bucket['longest_streak'], b - a)
+            
+            self.applied.add(session_id)
+            self._prune()
+            return True
+    
+    def _prune(self):
+        cutoff = self.bucket_key('hour', time.time() - self.HOUR_RETENTION_DAYS * 86400)
+        for key in [key for key in self.buckets['hour'] if key < cutoff]:
+            del self.buckets['hour'][key]
+    
+    def series(self, level, count, now=None):
+        """Последние count периодов (от старых к новым), пустые - с нулями"""
+        step = {'hour': 3600, 'day': 86400, 'week': 7 * 86400}[level]
+        now = time.time() if now is None else now
+        keys = []
+        for i in range(count - 1, -1, -1):
+            key = self.bucket_key(level, now - i * step)
+            if not keys or keys[-1] != key:
+                keys.append(key)
+        with self.lock:
+            return [(key, dict(self.buckets[level].get(key) or self.empty_bucket())) for key in keys]
+    
+    def sync(self, sessions_dir=None):
+        """Добавить сводки сессий, которых еще нет в итогах"""
+        sessions_dir = sessions_dir or SESSIONS_DIR
+        try:
+            names = os.listdir(sessions_dir)
+        except FileNotFoundError:
+            return 0
+        added = 0
+        for name in sorted(names):
+            if not name.endswith(".json") or name[:-5] in self.applied:
+                continue
+            try:
+                with open(os.path.join(sessions_dir, name), encoding="utf-8") as f:
+                    summary = json.load(f)
+                if self.add_session(summary):
+                    added += 1
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"⚠️ Сводка {name} пропущена в итогах: {e}")
+        return added
+    
+    def save(self):
+        """Сохранение (через временный файл, чтобы не оставить обрезанный)"""
+        with self.lock:
+            data = {
+                'version': 1,
+                'applied': sorted(self.applied),
+                'buckets': {level: {key: {k: round(v, 1) if isinstance(v, float) else v
+                                          for k, v in bucket.items()}
+                                    for key, bucket in self.buckets[level].items()}
+                            for level in self.LEVELS},
+            }
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+    
+    @classmethod
+    def load(cls, path=None):
+        """Загрузка итогов (если файла нет - пустые, заполнятся при sync)"""
+        path = path or ROLLUPS_PATH
+        rollups = cls(path)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            rollups.applied = set(data.get('applied', []))
+            for level in cls.LEVELS:
+                rollups.buckets[level] = data.get('buckets', {}).get(level, {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            # Итоги пересобираются из сводок сессий
+            print(f"⚠️ Не удалось загрузить итоги фокуса, пересчитываю: {e}")
+            rollups = cls(path)
+        return rollups
+
+
+class DetectionProfile:
+    """Параметры детектора: каскад Haar, масштаб кадра и частота анализа"""
+    
+    def __init__(self, scale_factor=1.1, min_neighbors=5, min_size=(50, 50),
+                 detection_scale=1.0, detection_hz=15, absence_seconds=1.5,
+                 require_eyes=False):
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = tuple(min_size)
+        self.detection_scale = detection_scale
+        self.detection_hz = detection_hz
+        # Через сколько секунд отсутствия считать, что пользователь отвлекся
+        self.absence_seconds = absence_seconds
+        # Считать ли лицо без видимых глаз отвлечением
+        self.require_eyes = require_eyes
+    
+    def with_sensitivity(self, level, strict=False):
+        """Профиль для уровня чувствительности 1-10 (на уровне 5 - без изменений)
+        
+        Чем выше чувствительность, тем строже каскад принимает лицо и тем
+        быстрее отсутствие считается отвлечением. Частоту анализа ползунок не
+        меняет - ее задает профиль производительности. Строгий режим
+        дополнительно требует видимых глаз и вдвое сокращает допустимое время
+        отсутствия.
+        """
+        shift = level - 5
+        profile = DetectionProfile(
+            scale_factor=round(max(1.03, self.scale_factor - 0.01 * shift), 3),
+            min_neighbors=max(2, self.min_neighbors + shift // 2),
+            min_size=self.min_size,
+            detection_scale=self.detection_scale,
+            detection_hz=self.detection_hz,
+            absence_seconds=round(self.absence_seconds * 0.8 ** shift, 2),
+            require_eyes=self.require_eyes or strict,
+        )
+        if strict:
+            profile.absence_seconds = round(profile.absence_seconds / 2, 2)
+        # Меньше полсекунды - ложные тревоги от мерцания детекции
+        profile.absence_seconds = max(0.5, profile.absence_seconds)
+        return profile
+    
+    def apply(self, analyzer):
+        """Передать параметры каскада детектору"""
+        analyzer.scale_factor = self.scale_factor
+        analyzer.min_neighbors = self.min_neighbors
+        analyzer.min_size = self.min_size
+    
+    def to_dict(self):
+        return {
+            'scale_factor': self.scale_factor,
+            'min_neighbors': self.min_neighbors,
+            'min_size': list(self.min_size),
+            'detection_scale': self.detection_scale,
+            'detection_hz': self.detection_hz,
+            'absence_seconds': self.absence_seconds,
+            'require_eyes': self.require_eyes,
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        defaults = cls().to_dict()
+        defaults.update({k: v for k, v in data.items() if k in defaults})
+        return cls(**defaults)
+    
+    @classmethod
+    def load(cls, path=None):
+        """Загрузка профиля (если файла нет - параметры по умолчанию)"""
+        path = path or DETECTOR_PROFILE_PATH
+        try:
+            with open(path, encoding="utf-8") as f:
+                profile = cls.from_dict(json.load(f))
+            print(f"✓ Загружен профиль детектора: {path}")
+            return profile
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError, TypeError) as e:
+            print(f"⚠️ Не удалось загрузить профиль детектора: {e}")
+            return cls()
+    
+    def save(self, path=None):
+        path = path or DETECTOR_PROFILE_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+
+class PerformanceProfile:
+    """Профиль производительности: разрешение, масштаб и частота анализа"""
+    
+    def __init__(self, key, title, capture_size, detection_scale, detection_hz, preview_fps):
+        self.key = key
+        self.title = title
+        self.capture_size = capture_size
+        self.detection_scale = detection_scale
+        self.detection_hz = detection_hz
+        self.preview_fps = preview_fps
+    
+    def describe(self):
+        """Краткое описание для интерфейса"""
+        w, h = self.capture_size
+        return (f"{self.title}: {w}x{h}, масштаб {self.detection_scale:g}, "
+                f"{self.detection_hz} Гц, превью {self.preview_fps} FPS")
+
+
+PERFORMANCE_PROFILES = {
+    'max_accuracy': PerformanceProfile('max_accuracy', "Максимальная точность", (1280, 720), 0.75, 15, 30),
+    'balanced': PerformanceProfile('balanced', "Баланс", (640, 480), 1.0, 10, 15),
+    'battery_saver': PerformanceProfile('battery_saver', "Экономия батареи", (320, 240), 1.0, 3, 5),
+}
+
+
+class PowerMonitor:
+    """Выбор профиля производительности по батарее, загрузке и температуре CPU"""
+    
+    def __init__(self, confirm_polls=2):
+        # Сколько опросов подряд должен совпасть выбор, чтобы профиль сменился
+        self.confirm_polls = confirm_polls
+        self.candidate = None
+        self.candidate_polls = 0
+        self.last_reading = {}
+        # Первый вызов cpu_percent всегда возвращает 0 - запускаем замер
+        try:
+            psutil.cpu_percent(interval=None)
+        except Exception:
+            pass
+    
+    def read_sensors(self):
+        """Снятие показаний батареи, загрузки и температуры (что доступно)"""
+        reading = {'battery_percent': None, 'on_battery': False,
+                   'cpu_percent': None, 'cpu_temp': None}
+        
+        try:
+            battery = psutil.sensors_battery()
+            if battery is not None:
+                reading['battery_percent'] = battery.percent
+                reading['on_battery'] = not battery.power_plugged
+        except Exception:
+            pass
+        
+        try:
+            reading['cpu_percent'] = psutil.cpu_percent(interval=None)
+        except Exception:
+            pass
+        
+        # Температура доступна не везде (на Windows psutil ее не отдает)
+        if hasattr(psutil, 'sensors_temperatures'):
+            try:
+                temps = psutil.sensors_temperatures()
+                values = [t.current for entries in temps.values() for t in entries if t.current]
+                if values:
+                    reading['cpu_temp'] = max(values)
+            except Exception:
+                pass
+        
+        self.last_reading = reading
+        return reading
+    
+    def choose_profile(self, reading):
+        """Профиль, подходящий под текущие показания"""
+        load = reading['cpu_percent'] or 0
+        temp = reading['cpu_temp'] or 0
+        
+        if temp >= 90 or load >= 90:
+            return 'battery_saver'
+        if reading['on_battery']:
+            percent = reading['battery_percent']
+            if percent is not None and percent < 50:
+                return 'battery_saver'
+            return 'balanced'
+        if load < 50 and temp < 70:
+            return 'max_accuracy'
+        return 'balanced'
+    
+    def poll(self, current_key):
+        """Опрос датчиков; возвращает ключ нового профиля или None"""
+        choice = self.choose_profile(self.read_sensors())
+        
+        if choice == current_key:
+            self.candidate = None
+            self.candidate_polls = 0
+            return None
+        
+        if choice != self.candidate:
+            self.candidate = choice
+            self.candidate_polls = 0
+        self.candidate_polls += 1
+        
+        if self.candidate_polls >= self.confirm_polls:
+            self.candidate = None
+            self.candidate_polls = 0
+            return choice
+        return None
+
+
+class ResourceSampler:
+    """Затраты процесса за сессию: CPU (всего и по потокам), пик памяти,
+    переключения контекста
+    
+    Раз в interval секунд фоновый поток снимает показания psutil; в итог
+    идет разница с началом сессии. Дочерние процессы (анализ камеры в
+    отдельном процессе) учитываются вместе с основным.
+    """
+    
+    TOP_THREADS = 8
+    
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        
+        self.started_at = None
+        self.base_cpu = None
+        self.base_ctx = None
+        self.base_threads = {}
+        self.base_children = {}
+        
+        self.elapsed = 0.0
+        self.cpu_user = 0.0
+        self.cpu_system = 0.0
+        # ID потока -> (имя, секунды CPU за сессию); завершившиеся остаются
+        self.thread_cpu = {}
+        # PID дочернего процесса -> секунды CPU за сессию
+        self.children_cpu = {}
+        self.peak_rss = 0
+        self.ctx_voluntary = 0
+        self.ctx_involuntary = 0
+        self.samples = 0
+    
+    def _threads(self):
+        try:
+            return self.process.threads()
+        except psutil.Error:
+            return []
+    
+    def _children(self):
+        try:
+            return self.process.children(recursive=True)
+        except psutil.Error:
+            return []
+    
+    @staticmethod
+    def _child_cpu(child):
+        times = child.cpu_times()
+        return times.user + times.system
+    
+    def start(self):
+        self.started_at = time.time()
+        self.base_cpu = self.process.cpu_times()
+        self.base_ctx = self.process.num_ctx_switches()
+        self.base_threads = {t.id: t.user_time + t.system_time for t in self._threads()}
+        for child in self._children():
+            try:
+                self.base_children[child.pid] = self._child_cpu(child)
+            except psutil.Error:
+                pass
+        self._sample()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self._sample()
+            except psutil.Error:
+                pass
+    
+    def _sample(self):
+        cpu = self.process.cpu_times()
+        ctx = self.process.num_ctx_switches()
+        rss = self.process.memory_info().rss
+        # Имена потоков Python по системному ID (у потоков OpenCV и Qt имени нет)
+        names = {t.native_id: t.name for t in threading.enumerate() if t.native_id is not None}
+        threads = {t.id: (names.get(t.id), t.user_time + t.system_time - self.base_threads.get(t.id, 0.0))
+                   for t in self._threads()}
+        children = {}
+        for child in self._children():
+            try:
+                children[child.pid] = self._child_cpu(child) - self.base_children.get(child.pid, 0.0)
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        
+        with self.lock:
+            self.elapsed = time.time() - self.started_at
+            self.cpu_user = cpu.user - self.base_cpu.user
+            self.cpu_system = cpu.system - self.base_cpu.system
+            for thread_id, (name, seconds) in threads.items():
+                known = self.thread_cpu.get(thread_id)
+                name = name or (known[0] if known else f"поток {thread_id}")
+                self.thread_cpu[thread_id] = (name, seconds)
+            self.children_cpu.update(children)
+            self.peak_rss = max(self.peak_rss, rss)
+            self.ctx_voluntary = ctx.voluntary - self.base_ctx.voluntary
+            self.ctx_involuntary = ctx.involuntary - self.base_ctx.involuntary
+            self.samples += 1
+    
+    def stop(self):
+        """Последний замер и остановка потока (повторный вызов ничего не делает)"""
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        try:
+            self._sample()
+        except psutil.Error:
+            pass
+    
+    def cpu_seconds(self):
+        return self.cpu_user + self.cpu_system + sum(self.children_cpu.values())
+    
+    def summary(self):
+        """Итог для сводки сессии"""
+        with self.lock:
+            cpu = self.cpu_seconds()
+            by_name = {}
+            for name, seconds in self.thread_cpu.values():
+                by_name[name] = by_name.get(name, 0.0) + max(0.0, seconds)
+            for pid, seconds in self.children_cpu.items():
+                by_name[f"процесс {pid}"] = max(0.0, seconds)
+            ranked = sorted(by_name.items(), key=lambda item: -item[1])
+            threads = {name: round(seconds, 2) for name, seconds in ranked[:self.TOP_THREADS]}
+            rest = sum(seconds for _, seconds in ranked[self.TOP_THREADS:])
+            if rest > 0:
+                threads["прочие"] = round(rest, 2)
+            return {
+                'cpu_seconds': round(cpu, 2),
+                'cpu_user': round(self.cpu_user, 2),
+                'cpu_system': round(self.cpu_system, 2),
+                'children_cpu': round(sum(self.children_cpu.values()), 2),
+                # Средняя загрузка в процентах одного ядра
+                'cpu_percent': round(cpu / self.elapsed * 100, 1) if self.elapsed > 0 else 0.0,
+                'peak_rss_mb': round(self.peak_rss / (1024 * 1024), 1),
+                'ctx_switches': {'voluntary': self.ctx_voluntary, 'involuntary': self.ctx_involuntary},
+                'threads': threads,
+                'samples': self.samples,
+                'interval': self.interval,
+            }
+    
+    def describe(self):
+        with self.lock:
+            cpu = self.cpu_seconds()
+            percent = cpu / self.elapsed * 100 if self.elapsed > 0 else 0.0
+            return (f"\nНагрузка: CPU {percent:.1f}% ядра ({cpu:.0f} с), "
+                    f"память до {self.peak_rss / (1024 * 1024):.0f} МБ")
+
+
+class X11IdleSource:
+    """Время бездействия из X11 (расширение MIT-SCREEN-SAVER, libXss)"""
+    
+    name = "x11"
+    
+    class Info(ctypes.Structure):
+        _fields_ = [('window', ctypes.c_ulong), ('state', ctypes.c_int), ('kind', ctypes.c_int),
+                    ('til_or_since', ctypes.c_ulong), ('idle', ctypes.c_ulong),
+                    ('event_mask', ctypes.c_ulong)]
+    
+    def __init__(self):
+        xlib_path = ctypes.util.find_library("X11")
+        xss_path = ctypes.util.find_library("Xss")
+        if not xlib_path or not xss_path:
+            raise OSError("не найдены libX11/libXss")
+        self.xlib = ctypes.cdll.LoadLibrary(xlib_path)
+        self.xss = ctypes.cdll.LoadLibrary(xss_path)
+        self.xlib.XOpenDisplay.restype = ctypes.c_void_p
+        self.xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self.xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        self.xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self.xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self.xlib.XFree.argtypes = [ctypes.c_void_p]
+        self.xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(self.Info)
+        self.xss.XScreenSaverQueryInfo.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(self.Info)]
+        
+        # Свое соединение с X-сервером: Xlib не потокобезопасна
+        self.lock = threading.Lock()
+        self.display = self.xlib.XOpenDisplay(None)
+        if not self.display:
+            raise OSError("нет соединения с X-сервером")
+        self.root = self.xlib.XDefaultRootWindow(self.display)
+        self.info = self.xss.XScreenSaverAllocInfo()
+        if not self.info:
+            self.xlib.XCloseDisplay(self.display)
+            raise OSError("XScreenSaverAllocInfo не удался")
+    
+    def idle_seconds(self):
+        with self.lock:
+            if not self.xss.XScreenSaverQueryInfo(self.display, self.root, self.info):
+                raise OSError("нет расширения MIT-SCREEN-SAVER")
+            return self.info.contents.idle / 1000.0
+    
+    def close(self):
+        with self.lock:
+            if self.display:
+                self.xlib.XFree(self.info)
+                self.xlib.XCloseDisplay(self.display)
+                self.display = None
+
+
+class WindowsIdleSource:
+    """Время бездействия Windows (GetLastInputInfo)"""
+    
+    name = "windows"
+    
+    class LastInputInfo(ctypes.Structure):
+        _fields_ = [('cbSize', ctypes.c_uint), ('dwTime', ctypes.c_uint)]
+    
+    def __init__(self):
+        self.user32 = ctypes.windll.user32
+        self.kernel32 = ctypes.windll.kernel32
+        self.info = self.LastInputInfo()
+        self.info.cbSize = ctypes.sizeof(self.info)
+    
+    def idle_seconds(self):
+        if not self.user32.GetLastInputInfo(ctypes.byref(self.info)):
+            raise OSError("GetLastInputInfo не удался")
+        # Счетчик миллисекунд 32-битный и переполняется раз в 49 дней
+        return ((self.kernel32.GetTickCount() - self.info.dwTime) & 0xFFFFFFFF) / 1000.0
+    
+    def close(self):
+        pass
+
+
+class EvdevIdleSource:
+    """Последнее событие ввода из /dev/input/event* (нужны права, группа input)
+    
+    Работает и без X-сервера (Wayland, консоль). Фоновый поток ждет
+    событий через select и запоминает время последнего.
+    """
+    
+    name = "evdev"
+    INPUT_DIR = "/dev/input"
+    
+    def __init__(self, paths=None):
+        if paths is None:
+            try:
+                paths = [os.path.join(self.INPUT_DIR, name) for name in sorted(os.listdir(self.INPUT_DIR))
+                         if name.startswith("event")]
+            except OSError:
+                paths = []
+        self.fds = []
+        for path in paths:
+            try:
+                self.fds.append(os.open(path, os.O_RDONLY | os.O_NONBLOCK))
+            except OSError:
+                pass
+        if not self.fds:
+            raise OSError("нет доступа к устройствам ввода /dev/input")
+        # До первого события считаем, что ввода не было
+        self.last_input = 0.0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="evdev-input", daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                ready, _, _ = select.select(self.fds, [], [], 0.5)
+            except (OSError, ValueError):
+                return
+            for fd in ready:
+                try:
+                    while os.read(fd, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+                except OSError:
+                    # Устройство отключили - больше его не слушаем
+                    self.fds.remove(fd)
+            if ready:
+                self.last_input = time.time()
+    
+    def idle_seconds(self):
+        return time.time() - self.last_input
+    
+    def close(self):
+        self.stop_event.set()
+        self.thread.join(1)
+        for fd in self.fds:
+            os.close(fd)
+        self.fds = []
+
+
+class ScriptedInputSource:
+    """Сценарий ввода для проверок: "active:30,idle:10,..." по часам сессии"""
+    
+    name = "script"
+    STATES = ('active', 'idle')
+    
+    def __init__(self, script, clock=None):
+        self.script = []
+        for part in script.split(","):
+            state, seconds = part.strip().split(":")
+            if state not in self.STATES:
+                raise ValueError(f"неизвестное состояние ввода: {state}")
+            self.script.append((state, float(seconds)))
+        self.cycle = sum(seconds for _, seconds in self.script)
+        self.clock = clock or SessionClock()
+        self.epoch = self.clock.time()
+    
+    def idle_seconds(self):
+        position = (self.clock.time() - self.epoch) % self.cycle
+        for state, seconds in self.script:
+            if position < seconds:
+                return 0.0 if state == 'active' else position
+            position -= seconds
+        return 0.0
+    
+    def close(self):
+        pass
+
+
+class InputActivityMonitor:
+    """Активность клавиатуры и мыши для планировщика анализа камеры
+    
+    Пока пользователь печатает или двигает мышь (бездействие меньше
+    active_seconds), он почти наверняка на месте. Источник выбирается по
+    платформе или ANTIPROCRASTINATOR_INPUT (x11, evdev, windows, off или
+    сценарий "active:30,idle:10"); если ни один не доступен, ввод
+    считается неактивным и камера анализируется с полной частотой.
+    """
+    
+    ACTIVE_SECONDS = 2.0
+    # Источник опрашивается не чаще (секунды реального времени)
+    POLL_INTERVAL = 0.25
+    
+    def __init__(self, source=None, active_seconds=ACTIVE_SECONDS):
+        self.source = source
+        self.active_seconds = active_seconds
+        self.last_poll = 0.0
+        self.idle = None
+    
+    @classmethod
+    def create(cls, clock=None):
+        choice = os.environ.get("ANTIPROCRASTINATOR_INPUT", "auto")
+        if choice == "off":
+            return cls()
+        if ":" in choice:
+            return cls(ScriptedInputSource(choice, clock))
+        if choice == "auto":
+            if sys.platform == "win32":
+                candidates = [WindowsIdleSource]
+            elif os.environ.get("DISPLAY"):
+                candidates = [X11IdleSource, EvdevIdleSource]
+            else:
+                candidates = [EvdevIdleSource]
+        else:
+            candidates = [source for source in (X11IdleSource, EvdevIdleSource, WindowsIdleSource)
+                          if source.name == choice]
+        for source_class in candidates:
+            try:
+                source = source_class()
+                source.idle_seconds()
+                print(f"⌨️ Активность ввода: {source.name}")
+                return cls(source)
+            except (OSError, AttributeError) as e:
+                print(f"⚠️ Источник активности ввода {source_class.name} недоступен: {e}")
+        return cls()
+    
+    @property
+    def available(self):
+        return self.source is not None
+    
+    def idle_seconds(self):
+        """Секунды без ввода (None - источник недоступен)"""
+        if self.source is None:
+            return None
+        now = time.time()
+        if now - self.last_poll >= self.POLL_INTERVAL:
+            self.last_poll = now
+            try:
+                self.idle = self.source.idle_seconds()
+            except OSError:
+                self.idle = None
+        return self.idle
+    
+    def active(self):
+        idle = self.idle_seconds()
+        return idle is not None and idle < self.active_seconds
+    
+    def close(self):
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+
+class StatsUploader:
+    """Фоновая выгрузка статистики сессий на сервер сбора
+    
+    Записи сначала сохраняются в очередь на диске, затем рабочий поток
+    собирает их в пачки, сжимает gzip и отправляет через одну
+    keep-alive сессию requests. При ошибках сети пачка остается на диске
+    и повторяется с экспоненциальной задержкой, в том числе после
+    перезапуска программы. Вызывающие потоки никогда не ждут сеть.
+    """
+    
+    def __init__(self, url, queue_dir=None, batch_size=20,
+                 timeout=10, max_backoff=300, max_queue_files=10000):
+        queue_dir = queue_dir or UPLOAD_QUEUE_DIR
+        self.url = url
+        self.queue_dir = queue_dir
+        self.rejected_dir = os.path.join(queue_dir, "rejected")
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.max_queue_files = max_queue_files
+        
+        self.pending = queue.Queue()
+        self.wake_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.idle_event = threading.Event()
+        self.thread = None
+        self.session = None
+        self.backoff = 0
+        self.file_counter = 0
+        
+        # Счетчики для отображения и отладки
+        self.sent_records = 0
+        self.sent_batches = 0
+        self.failed_attempts = 0
+        self.last_error = None
+    
+    def start(self):
+        """Запуск рабочего потока"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        os.makedirs(self.queue_dir, exist_ok=True)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="stats-uploader", daemon=True)
+        self.thread.start()
+    
+    def enqueue(self, kind, payload):
+        """Поставить запись в очередь (не блокирует)"""
+        self.idle_event.clear()
+        self.pending.put({'kind': kind, 'created': time.time(), 'payload': payload})
+        self.wake_event.set()
+    
+    def wait_idle(self, timeout=None):
+        """Дождаться, пока очередь будет полностью отправлена"""
+        return self.idle_event.wait(timeout)
+    
+    def stop(self, timeout=5):
+        """Остановка потока; неотправленное остается на диске"""
+        self.stop_event.set()
+        self.wake_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self._spool_pending()
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+    
+    def _spool_pending(self):
+        """Перенос записей из памяти в очередь на диске"""
+        while True:
+            try:
+                record = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            
+            self.file_counter += 1
+            name = f"{time.time_ns():020d}-{self.file_counter:06d}.json"
+            path = os.path.join(self.queue_dir, name)
+            try:
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump(record, f, ensure_ascii=False)
+                os.replace(path + ".tmp", path)
+            except OSError as e:
+                print(f"✗ Не удалось сохранить запись для выгрузки: {e}")
+    
+    def _queued_files(self):
+        """Файлы очереди в порядке поступления"""
+        try:
+            names = sorted(n for n in os.listdir(self.queue_dir) if n.endswith(".json"))
+        except OSError:
+            return []
+        
+        # Ограничиваем размер очереди, выбрасывая самые старые записи
+        if len(names) > self.max_queue_files:
+            for name in names[:len(names) - self.max_queue_files]:
+                self._remove(os.path.join(self.queue_dir, name))
+            names = names[len(names) - self.max_queue_files:]
+        return [os.path.join(self.queue_dir, n) for n in names]
+    
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    
+    def _load_batch(self, paths):
+        """Чтение пачки записей с диска (битые файлы удаляются)"""
+        records = []
+        loaded = []
+        for path in paths:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    records.append(json.load(f))
+                loaded.append(path)
+            except (OSError, ValueError):
+                self._remove(path)
+        return records, loaded
+    
+    def _create_session(self):
+        """Одна keep-alive сессия с небольшим пулом соединений"""
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+            'User-Agent': 'Antiprocrastinator3000',
+        })
+        return session
+    
+    def _send(self, records):
+        """Отправка пачки; возвращает HTTP-код ответа"""
+        body = gzip.compress(json.dumps({'records': records}, ensure_ascii=False).encode("utf-8"))
+        response = self.session.post(self.url, data=body, timeout=self.timeout)
+        return response.status_code
+    
+    def _wait_backoff(self):
+        """Экспоненциальная задержка с разбросом перед повтором"""
+        self.backoff = min(self.max_backoff, max(2, self.backoff * 2))
+        self.stop_event.wait(self.backoff * random.uniform(0.8, 1.2))
+    
+    def _run(self):
+        """Основной цикл рабочего потока"""
+        self.session = self._create_session()
+        
+        while not self.stop_event.is_set():
+            self._spool_pending()
+            files = self._queued_files()
+            
+            if not files:
+                if self.pending.empty():
+                    self.idle_event.set()
+                self.wake_event.wait(30)
+                self.wake_event.clear()
+                continue
+            
+            records, paths = self._load_batch(files[:self.batch_size])
+            if not records:
+                continue
+            
+            try:
+                status = self._send(records)
+            except requests.RequestException as e:
+                self.failed_attempts += 1
+                self.last_error = str(e)
+                self._wait_backoff()
+                continue
+            
+            if 200 <= status < 300:
+                for path in paths:
+                    self._remove(path)
+                self.sent_records += len(records)
+                self.sent_batches += 1
+                self.backoff = 0
+            elif 400 <= status < 500 and status not in (408, 429):
+                # Сервер отверг данные - повтор не поможет, откладываем в сторону
+                os.makedirs(self.rejected_dir, exist_ok=True)
+                for path in paths:
+                    try:
+                        os.replace(path, os.path.join(self.rejected_dir, os.path.basename(path)))
+                    except OSError:
+                        self._remove(path)
+                self.last_error = f"HTTP {status}"
+            else:
+                self.failed_attempts += 1
+                self.last_error = f"HTTP {status}"
+                self._wait_backoff()
+
+
+class FocusEvent:
+    """Событие фокуса, публикуемое циклом отслеживания"""
+    
+    kind = "event"
+    
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+    
+    def to_dict(self):
+        data = dict(vars(self))
+        data['kind'] = self.kind
+        return data
+
+
+class FaceLost(FocusEvent):
+    """Лицо пропало из кадра"""
+    
+    kind = "face_lost"
+
+
+class FaceReturned(FocusEvent):
+    """Лицо вернулось; away_seconds - сколько его не было"""
+    
+    kind = "face_returned"
+    
+    def __init__(self, timestamp, away_seconds):
+        super().__init__(timestamp)
+        self.away_seconds = away_seconds
+
+
+class EyesHidden(FocusEvent):
+    """Лицо в кадре, но глаза перестали быть видны"""
+    
+    kind = "eyes_hidden"
+
+
+class Distraction(FocusEvent):
+    """Засчитано отвлечение (reason: away, eyes_hidden, drowsy)"""
+    
+    kind = "distraction"
+    
+    def __init__(self, timestamp, count, reason):
+        super().__init__(timestamp)
+        self.count = count
+        self.reason = reason
+
+
+class SessionTick(FocusEvent):
+    """Текущая статистика сессии (публикуется на каждом кадре)"""
+    
+    kind = "session_tick"
+    
+    def __init__(self, timestamp, session_duration, focus_time, distraction_count, text):
+        super().__init__(timestamp)
+        self.session_duration = session_duration
+        self.focus_time = focus_time
+        self.distraction_count = distraction_count
+        self.text = text
+
+
+class EventSubscription:
+    """Подписчик шины со своей ограниченной очередью
+    
+    Политики переполнения:
+      drop_oldest - выбрасывается самое старое событие в очереди;
+      drop_newest - выбрасывается пришедшее событие;
+      merge       - на каждый тип события хранится только последнее.
+    """
+    
+    POLICIES = ('drop_oldest', 'drop_newest', 'merge')
+    
+    def __init__(self, callback, kinds=None, maxsize=64, policy='drop_oldest', name=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"неизвестная политика: {policy}")
+        self.callback = callback
+        self.kinds = set(kinds) if kinds else None
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.name = name or getattr(callback, '__name__', 'subscriber')
+        self.is_async = asyncio.iscoroutinefunction(callback)
+        self.queue = None
+        self.pending = {}
+        self.task = None
+        
+        self.delivered = 0
+        self.dropped = 0
+        self.merged = 0
+        self.errors = 0
+    
+    def accepts(self, event):
+        return self.kinds is None or event.kind in self.kinds
+    
+    def offer(self, event):
+        """Положить событие в очередь, не ожидая (вызывается в цикле шины)"""
+        if self.policy == 'merge':
+            if event.kind in self.pending:
+                self.pending[event.kind] = event
+                self.merged += 1
+                return
+            self.pending[event.kind] = event
+            self.queue.put_nowait(event.kind)
+            return
+        if self.queue.qsize() >= self.maxsize:
+            self.dropped += 1
+            if self.policy == 'drop_newest':
+                return
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+    
+    def describe(self):
+        return (f"{self.name}: доставлено {self.delivered}, отброшено {self.dropped}, "
+                f"слито {self.merged}, ошибок {self.errors}")
+
+
+class FocusEventBus:
+    """Асинхронная шина событий фокуса
+    
+    Цикл asyncio работает в отдельном потоке. publish() можно вызывать из
+    любого потока: он только ставит раздачу в цикл шины и сразу
+    возвращается, поэтому медленный подписчик не задерживает детекцию.
+    Каждый подписчик читает свою ограниченную очередь; обычные функции
+    вызываются в пуле потоков, корутины - прямо в цикле шины.
+    """
+    
+    def __init__(self, workers=2):
+        self.workers = workers
+        self.loop = None
+        self.executor = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.subscriptions = []
+        self.published = 0
+    
+    def start(self):
+        """Запуск потока с циклом событий"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.ready.clear()
+        self.thread = threading.Thread(target=self._run, name="focus-event-bus", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+    
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        # Свой пул для обычных подписчиков - закрывается вместе с шиной
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="focus-event")
+        loop.set_default_executor(self.executor)
+        self.loop = loop
+        for subscription in self.subscriptions:
+            self._attach(subscription)
+        self.ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            self.loop = None
+            loop.close()
+            self.executor.shutdown(wait=False)
+    
+    def subscribe(self, callback, kinds=None, maxsize=64, policy='drop_oldest', name=None):
+        """Подписка на события (kinds=None - на все типы)"""
+        subscription = EventSubscription(callback, kinds, maxsize, policy, name)
+        self.subscriptions.append(subscription)
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._attach, subscription)
+        return subscription
+    
+    def _attach(self, subscription):
+        if subscription.task is not None:
+            return
+        # Размер ограничивает offer(), сама очередь asyncio без лимита,
+        # чтобы put_nowait никогда не бросал исключение
+        subscription.queue = asyncio.Queue()
+        subscription.task = self.loop.create_task(self._consume(subscription))
+    
+    def publish(self, event):
+        """Опубликовать событие (не блокирует, можно из любого потока)"""
+        loop = self.loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._dispatch, event)
+        except RuntimeError:
+            # Цикл уже остановлен - событие просто теряется
+            pass
+    
+    def _dispatch(self, event):
+        self.published += 1
+        for subscription in self.subscriptions:
+            if subscription.queue is not None and subscription.accepts(event):
+                subscription.offer(event)
+    
+    async def _consume(self, subscription):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await subscription.queue.get()
+            event = subscription.pending.pop(item) if subscription.policy == 'merge' else item
+            try:
+                if subscription.is_async:
+                    await subscription.callback(event)
+                else:
+                    await loop.run_in_executor(None, subscription.callback, event)
+                subscription.delivered += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                subscription.errors += 1
+                print(f"⚠️ Подписчик {subscription.name}: {e}")
+    
+    async def _shutdown(self):
+        tasks = [s.task for s in self.subscriptions if s.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for subscription in self.subscriptions:
+            subscription.task = None
+        asyncio.get_running_loop().stop()
+    
+    def stop(self, timeout=2):
+        """Остановка цикла; недоставленные события отбрасываются"""
+        loop = self.loop
+        if loop is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), loop)
+            except RuntimeError:
+                pass
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+    
+    def describe(self):
+        lines = [f"опубликовано {self.published}"]
+        lines.extend(s.describe() for s in self.subscriptions)
+        return "; ".join(lines)
+
+
+class SamplingProfiler:
+    """Сэмплирующий профайлер всех потоков приложения
+    
+    Раз в interval секунд снимает стеки всех потоков через
+    sys._current_frames() и считает одинаковые стеки. Результат - формат
+    "свернутых стеков" (поток;внешняя;...;внутренняя количество), который
+    понимают flamegraph.pl, speedscope и inferno.
+    """
+    
+    def __init__(self, interval=0.01, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.counts = {}
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self.stop_event = threading.Event()
+        self.thread = None
+    
+    @property
+    def running(self):
+        return self.thread is not None
+    
+    def start(self):
+        self.counts = {}
+        self.samples = 0
+        self.started = time.time()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join(2)
+        self.thread = None
+        self.elapsed = time.time() - self.started
+    
+    def _run(self):
+        own = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+    
+    def write_collapsed(self, path):
+        """Запись свернутых стеков (для flamegraph)"""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class FrameRing:
+    """Кольцо слотов кадров и результатов в общей памяти процессов
+    
+    Каждый слот - заголовок (результат анализа) и буфер кадра. Запись
+    защищена счетчиком seq (seqlock): нечетный - слот пишется, читатель
+    сверяет счетчик до и после чтения и отбрасывает порванный кадр.
+    """
+    
+    SLOTS = 4
+    MAX_WIDTH = 1280
+    MAX_HEIGHT = 720
+    MAX_FACES = 8
+    MAX_EYES = 4
+    # Причины непригодности кадра (FrameQuality.reason) <-> код в заголовке
+    REASONS = (None, 'dark', 'overexposed', 'flat', 'blurred')
+    
+    @classmethod
+    def header_dtype(cls):
+        return np.dtype([
+            ('seq', 'u8'),
+            ('timestamp', 'f8'),
+            ('width', 'u4'),
+            ('height', 'u4'),
+            ('analyzed', 'u1'),
+            ('reason', 'u1'),
+            # Качество оценивалось (нулевой вектор - законный темный кадр)
+            ('has_quality', 'u1'),
+            ('quality', 'f4', (3,)),
+            ('faces_count', 'u4'),
+            ('faces', 'i4', (cls.MAX_FACES, 4)),
+            ('eyes_count', 'u4', (cls.MAX_FACES,)),
+            ('eyes', 'i4', (cls.MAX_FACES, cls.MAX_EYES, 4)),
+        ])
+    
+    def __init__(self, name=None, create=False):
+        header = self.header_dtype()
+        frame_bytes = self.MAX_HEIGHT * self.MAX_WIDTH * 3
+        size = (header.itemsize + frame_bytes) * self.SLOTS
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.headers = np.ndarray((self.SLOTS,), header, buffer=self.shm.buf)
+        self.frames = np.ndarray((self.SLOTS, self.MAX_HEIGHT, self.MAX_WIDTH, 3), np.uint8,
+                                 buffer=self.shm.buf, offset=header.itemsize * self.SLOTS)
+        if create:
+            self.headers['seq'] = 0
+        self.count = 0
+    
+    @property
+    def name(self):
+        return self.shm.name
+    
+    def write(self, frame, timestamp, result=None):
+        """Запись кадра (и результата, если кадр анализировался) - сторона захвата"""
+        height, width = frame.shape[:2]
+        if width > self.MAX_WIDTH or height > self.MAX_HEIGHT:
+            scale = min(self.MAX_WIDTH / width, self.MAX_HEIGHT / height)
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+            height, width = frame.shape[:2]
+            if result is not None:
+                # Рамки - вместе с кадром
+                result = DetectionResult(
+                    result.timestamp,
+                    [self.scale_box(face, scale) for face in result.faces],
+                    [[self.scale_box(eye, scale) for eye in face_eyes] for face_eyes in result.eyes],
+                    quality=result.quality)
+        
+        n = self.count
+        self.count += 1
+        i = n % self.SLOTS
+        h = self.headers
+        h['seq'][i] = 2 * n + 1
+        self.frames[i, :height, :width] = frame
+        h['timestamp'][i] = timestamp
+        h['width'][i] = width
+        h['height'][i] = height
+        h['analyzed'][i] = result is not None
+        if result is not None:
+            quality = result.quality
+            h['reason'][i] = self.REASONS.index(quality.reason) if quality is not None else 0
+            h['has_quality'][i] = quality is not None
+            h['quality'][i] = (quality.brightness, quality.contrast, quality.sharpness) if quality else (0, 0, 0)
+            faces = result.faces[:self.MAX_FACES]
+            h['faces_count'][i] = len(faces)
+            for k, face in enumerate(faces):
+                h['faces'][i, k] = face
+                face_eyes = result.eyes[k][:self.MAX_EYES] if k < len(result.eyes) else []
+                h['eyes_count'][i, k] = len(face_eyes)
+                for e, eye in enumerate(face_eyes):
+                    h['eyes'][i, k, e] = eye
+        h['seq'][i] = 2 * n + 2
+    
+    @staticmethod
+    def scale_box(box, scale):
+        return tuple(int(round(v * scale)) for v in box)
+    
+    def latest(self, analyzed=False, since=0):
+        """Новейший целый слот (индекс, seq) с seq > since или None"""
+        seqs = self.headers['seq'].copy()
+        best = None
+        for i in range(self.SLOTS):
+            seq = int(seqs[i])
+            if seq <= since or seq % 2:
+                continue
+            if analyzed and not self.headers['analyzed'][i]:
+                continue
+            if best is None or seq > best[1]:
+                best = (i, seq)
+        return best
+    
+    def read_frame(self, i, seq):
+        """Копия кадра слота (None, если слот успели перезаписать)"""
+        height, width = int(self.headers['height'][i]), int(self.headers['width'][i])
+        frame = self.frames[i, :height, :width].copy()
+        return frame if self.headers['seq'][i] == seq else None
+    
+    def read_result(self, i, seq):
+        """DetectionResult слота (None, если слот успели перезаписать)"""
+        header = self.headers[i].copy()
+        if self.headers['seq'][i] != seq:
+            return None
+        faces = [tuple(int(v) for v in header['faces'][k]) for k in range(header['faces_count'])]
+        eyes = [[tuple(int(v) for v in header['eyes'][k, e]) for e in range(header['eyes_count'][k])]
+                for k in range(len(faces))]
+        quality = None
+        if header['has_quality']:
+            brightness, contrast, sharpness = (float(v) for v in header['quality'])
+            quality = FrameQuality(brightness, contrast, sharpness, self.REASONS[header['reason']])
+        return DetectionResult(float(header['timestamp']), faces, eyes, quality=quality)
+    
+    def close(self):
+        # Представления numpy держат буфер - освобождаем их до закрытия
+        self.headers = None
+        self.frames = None
+        self.shm.close()
+    
+    def unlink(self):
+        self.shm.unlink()
+
+
+def capture_process_main(ring_name, conn, camera_index, mirror, settings):
+    """Дочерний процесс: захват кадров и анализ, запись в FrameRing"""
+    ring = FrameRing(ring_name)
+    simulate = os.environ.get("ANTIPROCRASTINATOR_SIMULATE")
+    if simulate:
+        cap = SimulatedVideoSource(None if simulate == "1" else SimulatedVideoSource.parse_script(simulate))
+    else:
+        cap = cv2.VideoCapture(camera_index)
+    analyzer = DetectorPool().new_analyzer()
+    capture_size = None
+    
+    try:
+        if not cap.isOpened():
+            conn.send(("error", f"Не удалось открыть камеру #{camera_index}"))
+            return
+        conn.send(("ready", os.getpid()))
+        
+        paused = False
+        last_tick = 0
+        last_detection = 0
+        while True:
+            # Команды родителя: настройки, пауза, остановка
+            while conn.poll():
+                command, value = conn.recv()
+                if command == "stop":
+                    return
+                if command == "pause":
+                    paused = value
+                elif command == "settings":
+                    settings = value
+            if settings['capture_size'] != capture_size:
+                capture_size = settings['capture_size']
+                cap.set(cv2.CAP_PROP_FRAME_WIDTH, capture_size[0])
+                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, capture_size[1])
+            for key in ('scale_factor', 'min_neighbors', 'min_size', 'detection_scale'):
+                setattr(analyzer, key, settings[key])
+            
+            if paused:
+                # На паузе только поддерживаем камеру, ждем команду
+                cap.grab()
+                conn.poll(1.0)
+                last_detection = 0
+                continue
+            
+            hz = settings['detection_hz']
+            delay = last_tick + 1.0 / max(hz, settings['preview_fps']) - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            last_tick = time.time()
+            
+            ret, frame = cap.read()
+            if not ret:
+                conn.send(("error", "Камера перестала отдавать кадры"))
+                return
+            if mirror:
+                frame = cv2.flip(frame, 1)
+            
+            now = time.time()
+            result = None
+            if now - last_detection >= 1.0 / hz:
+                last_detection = now
+                result = analyzer.analyze(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), now)
+            ring.write(frame, now, result)
+    except (EOFError, BrokenPipeError):
+        # Родитель завершился
+        pass
+    finally:
+        cap.release()
+        ring.close()
+        conn.close()
+
+
+class CaptureProcess:
+    """Захват и анализ камеры ПК в дочернем процессе
+    
+    Haar в отдельном процессе не держит GIL интерфейса. Кадры и результаты
+    приходят через FrameRing без сериализации, команды - через Pipe.
+    """
+    
+    START_TIMEOUT = 20
+    
+    def __init__(self, camera_index, mirror=True):
+        self.camera_index = camera_index
+        self.mirror = mirror
+        self.ring = None
+        self.conn = None
+        self.process = None
+        self.error = None
+        self.last_frame_seq = 0
+        self.last_result_seq = 0
+    
+    def start(self, settings):
+        """Запуск процесса; True, когда камера открыта"""
+        # spawn: дочерний процесс не наследует потоки и состояние Qt
+        context = multiprocessing.get_context("spawn")
+        self.ring = FrameRing(create=True)
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=capture_process_main,
+            args=(self.ring.name, child_conn, self.camera_index, self.mirror, settings),
+            name="capture-process",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        
+        if not self.conn.poll(self.START_TIMEOUT):
+            self.error = "Процесс захвата не ответил"
+            self.stop()
+            return False
+        status, value = self.conn.recv()
+        if status != "ready":
+            self.error = value
+            self.stop()
+            return False
+        return True
+    
+    def send(self, command, value=None):
+        try:
+            self.conn.send((command, value))
+        except (OSError, BrokenPipeError):
+            pass
+    
+    def apply_settings(self, settings):
+        self.send("settings", settings)
+    
+    def set_paused(self, paused):
+        self.send("pause", paused)
+    
+    def alive(self):
+        if self.conn is not None and self.conn.poll():
+            status, value = self.conn.recv()
+            if status == "error":
+                self.error = value
+        return self.error is None and self.process is not None and self.process.is_alive()
+    
+    def poll(self):
+        """(новый кадр или None, новый результат анализа или None)"""
+        frame = None
+        latest = self.ring.latest(since=self.last_frame_seq)
+        if latest is not None:
+            frame = self.ring.read_frame(*latest)
+            if frame is not None:
+                self.last_frame_seq = latest[1]
+        
+        result = None
+        latest = self.ring.latest(analyzed=True, since=self.last_result_seq)
+        if latest is not None:
+            result = self.ring.read_result(*latest)
+            if result is not None:
+                self.last_result_seq = latest[1]
+        return frame, result
+    
+    def stop(self, timeout=3):
+        if self.process is not None:
+            self.send("stop")
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(1)
+            self.process = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring.unlink()
+            self.ring = None
+
+
+class SourceWorker:
+    """Захват и анализ одной камеры в своем потоке со своей частотой"""
+    
+    # Частота захвата на паузе (только поддержание камеры)
+    PAUSED_HZ = 1.0
+    
+    def __init__(self, name, read_frame, analyzer, rate_hz, mirror=False, min_hz=1.0, owner_verifier=None):
+        self.name = name
+        self.read_frame = read_frame
+        self.analyzer = analyzer
+        # Только владелец: лица этой камеры сопровождаются и проверяются здесь
+        self.owner_verifier = owner_verifier
+        self.tracker = FaceTracker()
+        self.rate_hz = rate_hz
+        self.max_hz = rate_hz
+        self.min_hz = min_hz
+        self.mirror = mirror
+        self.paused = False
+        
+        self.lock = threading.Lock()
+        self.latest_frame = None
+        self.latest_result = None
+        self.seq = 0
+        # Сглаженное время одной детекции, мс
+        self.detect_ms = 0.0
+        
+        self.stop_event = threading.Event()
+        self.thread = None
+    
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name=f"source-{self.name}", daemon=True)
+        self.thread.start()
+    
+    def stop(self, timeout=2):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+    
+    def cpu_percent(self):
+        """Оценка загрузки одного ядра этим источником"""
+        if self.detect_ms == 0:
+            return 0.0
+        # Частота не может быть выше, чем успевает детектор
+        return self.detect_ms * min(self.rate_hz, 1000 / self.detect_ms) / 10
+    
+    def latest(self):
+        with self.lock:
+            return self.seq, self.latest_frame, self.latest_result
+    
+    def _run(self):
+        while not self.stop_event.is_set():
+            started = time.time()
+            frame = self.read_frame()
+            
+            if frame is not None and not self.paused:
+                if self.mirror:
+                    frame = cv2.flip(frame, 1)
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                t0 = time.perf_counter()
+                result = self.analyzer.analyze(gray, started)
+                ms = (time.perf_counter() - t0) * 1000
+                self.detect_ms = ms if self.detect_ms == 0 else 0.8 * self.detect_ms + 0.2 * ms
+                if self.owner_verifier is not None and not result.unknown:
+                    self.filter_owner(result, gray, started)
+                
+                with self.lock:
+                    self.latest_frame = frame
+                    self.latest_result = result
+                    self.seq += 1
+            
+            rate = self.PAUSED_HZ if self.paused else self.rate_hz
+            self.stop_event.wait(max(0.0, started + 1.0 / rate - time.time()))
+    
+    def filter_owner(self, result, gray, now):
+        """Голос источника - только по лицам владельца в его кадре"""
+        result.tracks = self.tracker.update(result.faces, result.eyes, now)
+        visible = [track for track in result.tracks if track.visible]
+        if not visible:
+            return
+        for track in visible:
+            self.owner_verifier.verify(track, gray)
+        owners = [track for track in visible if track.owner]
+        result.fused_face = bool(owners)
+        result.fused_eyes = any(track.eyes for track in owners)
+
+
+class FusionController:
+    """Объединение решений нескольких камер в пределах бюджета CPU
+    
+    Присутствие и внимание засчитываются, если их видит хотя бы одна
+    свежая камера. Полезность камеры - как часто именно она одна дает
+    положительное решение (например, телефон сбоку видит лицо, когда
+    ноутбук уже нет). При превышении бюджета снижается частота менее
+    полезной камеры, при запасе - повышается у более полезной.
+    """
+    
+    STALE_SECONDS = 2.0
+    REBALANCE_INTERVAL = 2.0
+    
+    def __init__(self, workers, cpu_budget=50):
+        # Первый источник - основной: его кадры и рамки идут в превью и статистику
+        self.workers = workers
+        self.cpu_budget = cpu_budget
+        self.usefulness = {w.name: 0.5 for w in workers}
+        self.last_seqs = {}
+        self.last_rebalance = 0
+    
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+    
+    def stop(self, timeout=2):
+        for worker in self.workers:
+            worker.stop(timeout)
+    
+    def set_paused(self, paused):
+        for worker in self.workers:
+            worker.paused = paused
+    
+    def set_max_rate(self, hz):
+        """Верхняя граница частоты из профилей"""
+        for worker in self.workers:
+            worker.max_hz = hz
+            worker.rate_hz = min(worker.rate_hz, hz)
+    
+    def fuse(self, now):
+        """Кадр основного источника и объединенный результат (или None)"""
+        decisions = {}
+        fresh = False
+        unknown_quality = None
+        for worker in self.workers:
+            seq, frame, result = worker.latest()
+            if result is None or now - result.timestamp > self.STALE_SECONDS:
+                continue
+            if result.unknown:
+                # Непригодный кадр источника не голосует
+                unknown_quality = result.quality
+                continue
+            decisions[worker.name] = result.face_detected and result.eyes_detected, result.face_detected
+            if self.last_seqs.get(worker.name) != seq:
+                self.last_seqs[worker.name] = seq
+                fresh = True
+        
+        _, frame, main = self.workers[0].latest()
+        if not decisions:
+            if unknown_quality is not None:
+                return frame, DetectionResult(now, quality=unknown_quality)
+            return frame, None
+        
+        if fresh:
+            self._update_usefulness(decisions)
+        if now - self.last_rebalance >= self.REBALANCE_INTERVAL:
+            self.rebalance()
+            self.last_rebalance = now
+        
+        if main is not None and self.workers[0].name in decisions:
+            fused = DetectionResult(now, main.faces, main.eyes)
+        else:
+            fused = DetectionResult(now)
+        fused.fused_face = any(face for _, face in decisions.values())
+        fused.fused_eyes = any(attentive for attentive, _ in decisions.values())
+        fused.sources = decisions
+        return frame, fused
+    
+    def _update_usefulness(self, decisions):
+        """Полезность: источник один видит внимание, остальные - нет"""
+        if len(decisions) < 2:
+            return
+        for name, (attentive, _) in decisions.items():
+            others = any(a for n, (a, _) in decisions.items() if n != name)
+            unique = 1.0 if attentive and not others else 0.0
+            self.usefulness[name] = 0.95 * self.usefulness[name] + 0.05 * unique
+    
+    def total_cpu_percent(self):
+        return sum(w.cpu_percent() for w in self.workers)
+    
+    def rebalance(self):
+        """Подстройка частот источников под бюджет CPU"""
+        total = self.total_cpu_percent()
+        ranked = sorted(self.workers, key=lambda w: self.usefulness[w.name])
+        
+        if total > self.cpu_budget:
+            for worker in ranked:
+                if worker.rate_hz > worker.min_hz:
+                    worker.rate_hz = max(worker.min_hz, worker.rate_hz * 0.75)
+                    break
+        elif total < 0.7 * self.cpu_budget:
+            for worker in reversed(ranked):
+                if worker.rate_hz < worker.max_hz:
+                    worker.rate_hz = min(worker.max_hz, worker.rate_hz * 1.25)
+                    break
+
+
+class DetectorTuner:
+    """Подбор параметров детектора по размеченной записи
+    
+    Запись - любой видеофайл, который читает OpenCV, разметка - CSV со
+    строками "начало_сек,конец_сек,метка", где метка одна из present,
+    away, looking_away. Для каждой комбинации параметров каскада и
+    масштаба видео проходится один раз с максимальной частотой анализа;
+    более редкие частоты моделируются удержанием последнего результата,
+    как это происходит в track_eyes. Стоимость считается в миллисекундах
+    детекции на один кадр камеры (с учетом пропущенных кадров).
+    """
+    
+    LABELS = ("present", "away", "looking_away")
+    
+    DEFAULT_GRID = {
+        'scale_factor': [1.05, 1.1, 1.2, 1.3],
+        'min_neighbors': [3, 5, 7],
+        'min_size': [(40, 40), (60, 60)],
+        'detection_scale': [1.0, 0.75, 0.5],
+        'detection_hz': [10, 5, 2, 1],
+    }
+    
+    def __init__(self, video_path, labels, face_cascade, eye_cascade, grid=None):
+        self.video_path = video_path
+        self.labels = labels
+        self.analyzer = FaceAnalyzer(face_cascade, eye_cascade)
+        self.grid = dict(self.DEFAULT_GRID)
+        if grid:
+            self.grid.update(grid)
+        self.video_fps = 30.0
+    
+    @classmethod
+    def load_labels(cls, path):
+        """Чтение разметки: список (начало, конец, метка)"""
+        labels = []
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                parts = [p.strip() for p in line.split(",")]
+                try:
+                    start, end, label = float(parts[0]), float(parts[1]), parts[2]
+                except (IndexError, ValueError):
+                    # Строка заголовка или мусор
+                    continue
+                if label not in cls.LABELS:
+                    raise ValueError(f"Неизвестная метка '{label}' в строке {line_no}")
+                labels.append((start, end, label))
+        return sorted(labels)
+    
+    def label_at(self, t):
+        """Метка для момента времени (None - кадр не размечен)"""
+        for start, end, label in self.labels:
+            if start <= t < end:
+                return label
+        return None
+    
+    def evaluate_detector(self, profile, base_hz):
+        """Прогон видео с параметрами каскада; результат на каждом такте base_hz"""
+        profile.apply(self.analyzer)
+        self.analyzer.detection_scale = profile.detection_scale
+        
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            raise IOError(f"Не удалось открыть запись {self.video_path}")
+        self.video_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        
+        samples = []
+        total_ms = 0.0
+        frame_index = 0
+        next_sample = 0.0
+        try:
+            while True:
+                t = frame_index / self.video_fps
+                frame_index += 1
+                if t < next_sample:
+                    # Кадр между тактами - пропускаем без декодирования
+                    if not cap.grab():
+                        break
+                    continue
+                
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                next_sample += 1.0 / base_hz
+                
+                label = self.label_at(t)
+                if label is None:
+                    continue
+                
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                started = time.perf_counter()
+                result = self.analyzer.analyze(gray, t)
+                total_ms += (time.perf_counter() - started) * 1000
+                samples.append((label, result.face_detected and result.eyes_detected))
+        finally:
+            cap.release()
+        
+        ms_per_detection = total_ms / len(samples) if samples else 0.0
+        return samples, ms_per_detection
+    
+    @staticmethod
+    def balanced_accuracy(samples, step):
+        """Точность при анализе каждого step-го такта (результат удерживается)"""
+        hits = {True: 0, False: 0}
+        totals = {True: 0, False: 0}
+        held = False
+        for i, (label, predicted) in enumerate(samples):
+            if i % step == 0:
+                held = predicted
+            truth = label == "present"
+            totals[truth] += 1
+            hits[truth] += held == truth
+        
+        parts = [hits[k] / totals[k] for k in (True, False) if totals[k]]
+        return sum(parts) / len(parts) if parts else 0.0
+    
+    def run(self):
+        """Перебор сетки параметров; возвращает список результатов"""
+        base_hz = max(self.grid['detection_hz'])
+        results = []
+        
+        combos = [
+            (sf, mn, ms, sc)
+            for sf in self.grid['scale_factor']
+            for mn in self.grid['min_neighbors']
+            for ms in self.grid['min_size']
+            for sc in self.grid['detection_scale']
+        ]
+        for n, (sf, mn, ms, sc) in enumerate(combos, 1):
+            profile = DetectionProfile(sf, mn, ms, sc, base_hz)
+            samples, ms_per_detection = self.evaluate_detector(profile, base_hz)
+            print(f"  [{n}/{len(combos)}] scaleFactor={sf} minNeighbors={mn} "
+                  f"minSize={ms} масштаб={sc}: {ms_per_detection:.1f} мс/детекцию")
+            
+            for hz in self.grid['detection_hz']:
+                step = max(1, int(round(base_hz / hz)))
+                results.append({
+                    'profile': DetectionProfile(sf, mn, ms, sc, hz),
+                    'accuracy': self.balanced_accuracy(samples, step),
+                    'ms_per_frame': ms_per_detection * hz / self.video_fps,
+                })
+        return results
+    
+    @staticmethod
+    def pareto_front(results):
+        """Результаты, которые нельзя улучшить по точности без роста стоимости"""
+        front = []
+        best_accuracy = -1.0
+        for r in sorted(results, key=lambda r: (r['ms_per_frame'], -r['accuracy'])):
+            if r['accuracy'] > best_accuracy:
+                front.append(r)
+                best_accuracy = r['accuracy']
+        return front
+    
+    @staticmethod
+    def choose(front, tolerance=0.02):
+        """Самая дешевая точка фронта с точностью не хуже лучшей минус tolerance"""
+        best = max(r['accuracy'] for r in front)
+        for r in front:
+            if r['accuracy'] >= best - tolerance:
+                return r
+        return front[-1]
+
+
+def run_tuner_cli(argv):
+    """Командная строка подбора параметров детектора"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        prog="антипрокрастинатор3000.py --tune",
+        description="Подбор параметров детектора по размеченной записи"
+    )
+    parser.add_argument("video", help="видеозапись пользователя")
+    parser.add_argument("labels", help="CSV разметка: начало_сек,конец_сек,present|away|looking_away")
+    parser.add_argument("--tolerance", type=float, default=0.02,
+                        help="допустимая потеря точности ради скорости (по умолчанию 0.02)")
+    parser.add_argument("--output", default=DETECTOR_PROFILE_PATH,
+                        help="куда сохранить выбранный профиль")
+    parser.add_argument("--dry-run", action="store_true", help="не сохранять профиль")
+    args = parser.parse_args(argv)
+    
+    detectors = DetectorPool()
+    tuner = DetectorTuner(args.video, DetectorTuner.load_labels(args.labels),
+                          detectors.create(DetectorPool.FACE), detectors.create(DetectorPool.EYE))
+    print(f"🔧 Подбор параметров по записи {args.video}...")
+    front = DetectorTuner.pareto_front(tuner.run())
+    
+    print("\nФронт Парето (точность / мс на кадр камеры):")
+    for r in front:
+        p = r['profile']
+        print(f"  {r['accuracy']*100:5.1f}%  {r['ms_per_frame']:6.2f} мс  "
+              f"scaleFactor={p.scale_factor} minNeighbors={p.min_neighbors} "
+              f"minSize={p.min_size} масштаб={p.detection_scale} {p.detection_hz} Гц")
+    
+    chosen = DetectorTuner.choose(front, args.tolerance)
+    print(f"\n✓ Выбрано: {chosen['accuracy']*100:.1f}%, {chosen['ms_per_frame']:.2f} мс на кадр")
+    if not args.dry_run:
+        chosen['profile'].save(args.output)
+        print(f"✓ Профиль сохранен: {args.output}")
+    return 0
+
+
+def run_soak_cli(argv):
+    """Долгий ускоренный прогон на симулированной камере (--soak)"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        prog="антипрокрастинатор3000.py --soak",
+        description="Ускоренный многочасовой прогон сессий на сценарной камере"
+    )
+    parser.add_argument("--hours", type=float, default=8.0, help="сколько часов симулировать (по умолчанию 8)")
+    parser.add_argument("--session-minutes", type=int, default=120, help="длина одной сессии таймера")
+    parser.add_argument("--speed", type=float, default=60.0, help="ускорение времени (по умолчанию 60)")
+    parser.add_argument("--script", help="сценарий камеры: present:300,absent:60,...")
+    parser.add_argument("--input", help="сценарий ввода: active:30,idle:10,... (по умолчанию ввод не учитывается)")
+    parser.add_argument("--profile", default="battery_saver", choices=sorted(PERFORMANCE_PROFILES))
+    parser.add_argument("--max-rss-growth", type=float, default=40.0,
+                        help="допустимый рост памяти после первой сессии, МБ")
+    args = parser.parse_args(argv)
+    
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    # Сценарные сессии не должны попасть в настоящую историю, итоги и очередь
+    # выгрузки, а разбор журналов при запуске - трогать журналы живой программы
+    data_dir = tempfile.mkdtemp(prefix="antiprocrastinator-soak-")
+    isolate_app_data(data_dir)
+    # Настоящие клавиатура и мышь сделали бы частоту анализа случайной
+    os.environ["ANTIPROCRASTINATOR_INPUT"] = args.input or "off"
+    app = QApplication(sys.argv[:1])
+    process = psutil.Process()
+    
+    def handles():
+        return process.num_handles() if hasattr(process, "num_handles") else process.num_fds()
+    
+    clock = SessionClock(args.speed)
+    script = SimulatedVideoSource.parse_script(args.script) if args.script else None
+    opener = SimulatedVideoSource.opener(script, clock=clock)
+    reference = opener(0, None)
+    
+    window = EyeTrackerApp(clock=clock, camera_opener=opener)
+    window.interactive = False
+    window.profile_combo.setCurrentIndex(window.profile_combo.findData(args.profile))
+    window.enable_sound_checkbox.setChecked(True)
+    # Лицо сценарной камеры не совпадет с образцом владельца
+    window.owner_only_checkbox.setChecked(False)
+    window.time_spin.setMaximum(24 * 60)
+    window.time_spin.setValue(args.session_minutes)
+    
+    def pump(seconds):
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            app.processEvents()
+            time.sleep(0.02)
+    
+    # Фоновые проверки iVCam при старте не должны попасть в базовую линию
+    pump(3)
+    base_threads = threading.active_count()
+    base_handles = handles()
+    print(f"🧪 Прогон: {args.hours} ч по {args.session_minutes} мин, ускорение ×{args.speed}, "
+          f"потоков {base_threads}, дескрипторов {base_handles}")
+    
+    failures = []
+    warm_rss = None
+    sessions = max(1, int(round(args.hours * 60 / args.session_minutes)))
+    for number in range(1, sessions + 1):
+        window.start_timer()
+        if not window.is_tracking:
+            failures.append(f"сессия {number}: не запустилась")
+            break
+        start = window.session_start_time
+        timer_thread, tracking_thread = window.timer_thread, window.tracking_thread
+        
+        while window.timer_running:
+            pump(1)
+        timer_thread.join(10)
+        tracking_thread.join(10)
+        end = start + window.total_session_time if window.total_session_time else clock.time()
+        
+        # Ожидания по сценарию камеры
+        durations = {state: 0.0 for state in SimulatedVideoSource.STATES}
+        counts = {state: 0 for state in SimulatedVideoSource.STATES}
+        for state, a, b in reference.segments(start, end):
+            durations[state] += b - a
+            counts[state] += 1
+        length = end - start
+        slack = 0.03 * length + args.speed
+        low_focus = durations['present'] - slack
+        high_focus = durations['present'] + durations['partial'] + durations['fast'] + slack
+        low_distractions = sum(1 for state, a, b in reference.segments(start, end)
+                               if state == 'absent' and b - a > 2 * args.speed)
+        high_distractions = (counts['absent'] + counts['partial'] + counts['fast'] + counts['dark']
+                             + counts['closed'] + 1)
+        
+        rss = process.memory_info().rss / (1024 * 1024)
+        if warm_rss is None:
+            warm_rss = rss
+        resources = window.last_resources or {}
+        print(f"  сессия {number}: фокус {window.focus_time/60:.1f} мин "
+              f"(ожидалось {low_focus/60:.1f}..{high_focus/60:.1f}), "
+              f"нет данных {window.unknown_time/60:.1f} мин (темно {durations['dark']/60:.1f}), "
+              f"отвлечений {window.distraction_count} ({low_distractions}..{high_distractions}), "
+              f"RSS {rss:.1f} МБ, CPU {resources.get('cpu_percent', 0)}% ядра, "
+              f"потоков {threading.active_count()}")
+        
+        if not low_focus <= window.focus_time <= high_focus:
+            failures.append(f"сессия {number}: время фокуса {window.focus_time:.0f} с вне ожидаемого")
+        if window.unknown_time > durations['dark'] + slack:
+            failures.append(f"сессия {number}: лишнее время без данных {window.unknown_time:.0f} с")
+        if not low_distractions <= window.distraction_count <= high_distractions:
+            failures.append(f"сессия {number}: отвлечений {window.distraction_count} вне ожидаемого")
+    
+    # После выхода камера закрывается, фоновые потоки должны завершиться
+    window.camera_pool.close_all()
+    window.event_bus.stop()
+    window.input_monitor.close()
+    if window.stats_uploader is not None:
+        window.stats_uploader.stop()
+    pump(2)
+    rss = process.memory_info().rss / (1024 * 1024)
+    if warm_rss is not None and rss - warm_rss > args.max_rss_growth:
+        failures.append(f"рост памяти {rss - warm_rss:.1f} МБ после первой сессии")
+    if threading.active_count() > base_threads:
+        names = sorted(t.name for t in threading.enumerate())
+        failures.append(f"потоков {threading.active_count()} вместо {base_threads}: {names}")
+    if handles() > base_handles + 2:
+        failures.append(f"дескрипторов {handles()} вместо {base_handles}")
+    
+    shutil.rmtree(data_dir, ignore_errors=True)
+    if failures:
+        print("✗ Прогон не пройден:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print(f"✓ Прогон пройден: RSS {rss:.1f} МБ, потоков {threading.active_count()}, дескрипторов {handles()}")
+    return 0
+
+
+def run_replay_cli(argv):
+    """Повтор записанной сессии через track_eyes (--replay)"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        prog="антипрокрастинатор3000.py --replay",
+        description="Точный повтор сессии по записи кадров (<id>.frames в папке сессий)"
+    )
+    parser.add_argument("path", help="файл записи кадров")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="скорость относительно записи (по умолчанию 0 - как можно быстрее)")
+    parser.add_argument("--from", dest="start", type=float, default=None,
+                        help="начать с секунды записи (без сверки с сохраненной сводкой)")
+    args = parser.parse_args(argv)
+    # Повтор анализирует каждый записанный кадр - ввод здесь не нужен
+    os.environ["ANTIPROCRASTINATOR_INPUT"] = "off"
+    # Журнал и события повтора не должны попасть в настоящую историю, итоги
+    # и очередь выгрузки: отдельный каталог данных, из настоящего - только
+    # образец лица владельца
+    owner_profile_path = OWNER_PROFILE_PATH
+    data_dir = tempfile.mkdtemp(prefix="antiprocrastinator-replay-")
+    isolate_app_data(data_dir)
+    if os.path.exists(owner_profile_path):
+        shutil.copy(owner_profile_path, OWNER_PROFILE_PATH)
+    
+    recording = FrameRecording(args.path)
+    meta = recording.meta
+    clock = ReplayClock(recording, args.speed)
+    first = 0
+    if args.start is not None:
+        # Перемотка: сессия начинается с найденного кадра
+        first = recording.index_at(recording.start + args.start)
+        clock.origin = float(recording.timestamps[first])
+    source_opener = ReplayVideoSource.opener(recording, clock, first)
+    sources = []
+    
+    def opener(index, backend):
+        source = source_opener(index, backend)
+        sources.append(source)
+        return source
+    
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication(sys.argv[:1])
+    window = EyeTrackerApp(clock=clock, camera_opener=opener)
+    window.interactive = False
+    window.enable_sound_checkbox.setChecked(False)
+    window.record_checkbox.setChecked(False)
+    # Проверка владельца - как в исходной сессии (по текущему образцу)
+    window.owner_only_checkbox.setChecked(meta.get('owner_only', False))
+    if meta.get('profile') in PERFORMANCE_PROFILES:
+        window.profile_combo.setCurrentIndex(window.profile_combo.findData(meta['profile']))
+    duration = recording.end - clock.origin
+    window.time_spin.setMaximum(24 * 60)
+    window.time_spin.setValue(int(duration / 60) + 1)
+    
+    def pump(seconds):
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            app.processEvents()
+            time.sleep(0.02)
+    
+    # Проверки камер при старте читают кадры - после них время сбрасываем
+    pump(3)
+    clock.reset()
+    # Профиль детекции - записанный: отложенный пересчет по ползунку и
+    # строгому режиму окна заменил бы его настройками по умолчанию
+    window.sensitivity_timer.stop()
+    window.detection_profile = DetectionProfile.from_dict(meta.get('detection', {}))
+    window.detection_profile.apply(window.face_analyzer)
+    print(f"🎞️ Повтор: {len(recording) - first} кадров, {duration / 60:.1f} мин, "
+          f"скорость {'максимальная' if args.speed <= 0 else f'×{args.speed}'}")
+    
+    window.start_timer()
+    if not window.is_tracking:
+        print("✗ Повтор не запустился")
+        shutil.rmtree(data_dir, ignore_errors=True)
+        return 1
+    # Повтор не сохраняется как новая сессия
+    window.session_id = None
+    window.tracking_thread.join()
+    window.stop_timer()
+    pump(0.5)
+    window.event_bus.stop()
+    window.input_monitor.close()
+    shutil.rmtree(data_dir, ignore_errors=True)
+    source = sources[-1]
+    
+    print(f"  фокус {window.focus_time:.1f} с, нет данных {window.unknown_time:.1f} с, "
+          f"отвлечений {window.distraction_count}")
+    for t, state in window.focus_timeline:
+        print(f"    {t - clock.origin:8.2f} с  {state}")
+    failed = False
+    if source.mismatches:
+        failed = True
+        print(f"✗ Результат детекции разошелся с записью на {source.mismatches} из {source.checked} кадров:")
+        for index, offset, what in source.reported:
+            print(f"  - кадр {index} ({offset:.2f} с): {what}")
+    else:
+        print(f"✓ Детекция совпала с записью на всех {source.checked} кадрах")
+    
+    summary_path = os.path.join(os.path.dirname(args.path), f"{meta.get('session_id')}.json")
+    if args.start is None and os.path.exists(summary_path):
+        with open(summary_path, encoding="utf-8") as f:
+            summary = json.load(f)
+        print(f"  в сводке сессии: фокус {summary['focus_time']} с, отвлечений {summary['distraction_count']}")
+        if (summary['distraction_count'] != window.distraction_count
+                or abs(summary['focus_time'] - window.focus_time) > 0.1):
+            failed = True
+            print("✗ Итог повтора отличается от сохраненной сводки")
+    return 1 if failed else 0
+
+
+class TrackingDaemon:
+    """Сессия без окон: захват, детекция, таймер и сигнал в одном потоке
+    
+    Управляется через StatusServer (JSON по HTTP на localhost). Интерфейс
+    Qt не создается, поэтому нет ни виджетов, ни перерисовок.
+    """
+    
+    PAUSE_KEEPALIVE_INTERVAL = 1.0
+    
+    def __init__(self, camera_index=0, profile_key='balanced', clock=None, camera_opener=None):
+        self.camera_index = camera_index
+        self.clock = clock or SessionClock()
+        self.camera_pool = CameraPool(grace_seconds=0, opener=camera_opener)
+        self.detectors = DetectorPool()
+        self.analyzer = self.detectors.new_analyzer()
+        self.detection_profile = DetectionProfile.load()
+        self.detection_profile.apply(self.analyzer)
+        self.performance_profile = PERFORMANCE_PROFILES[profile_key]
+        self.enable_sound = True
+        # Звук сигнала pygame (создается при первом сигнале; False - недоступен)
+        self.alarm_tone = None
+        
+        self.lock = threading.Lock()
+        self.resume_event = threading.Event()
+        self.thread = None
+        self.state = "idle"
+        self._reset_session()
+    
+    def _reset_session(self):
+        self.session_id = None
+        self.session_start_time = None
+        self.finished_at = None
+        self.end_time = None
+        self.timer_seconds = 0
+        self.focus_time = 0.0
+        self.unknown_time = 0.0
+        self.distraction_count = 0
+        self.face_detected = False
+        self.eyes_detected = False
+        self.status_text = "Отслеживание неактивно"
+        self.alarm_playing = False
+        self.error = None
+        self.focus_timeline = []
+        self.tracker = FaceTracker()
+        self.blink_estimator = BlinkEstimator()
+    
+    # Управление сессией (вызывается из потоков HTTP-сервера)
+    
+    def start(self, minutes=25):
+        with self.lock:
+            if self.state in ("running", "paused"):
+                raise ValueError("сессия уже идет")
+            thread = self.thread
+        # Предыдущий поток ждем без блокировки: завершаясь, он сам ее берет
+        if thread is not None:
+            thread.join(10)
+        with self.lock:
+            if self.state in ("running", "paused"):
+                raise ValueError("сессия уже идет")
+            if self.thread is not None and self.thread.is_alive():
+                raise ValueError("предыдущая сессия еще завершается")
+            self._reset_session()
+            self.session_id = uuid.uuid4().hex
+            self.timer_seconds = int(minutes * 60)
+            self.state = "running"
+            self.resume_event.set()
+            self.thread = threading.Thread(target=self._run, name="daemon-tracking", daemon=True)
+            self.thread.start()
+        return self.status()
+    
+    def pause(self):
+        with self.lock:
+            if self.state != "running":
+                raise ValueError("сессия не идет")
+            self.state = "paused"
+            self.resume_event.clear()
+            self.alarm_playing = False
+        return self.status()
+    
+    def resume(self):
+        with self.lock:
+            if self.state != "paused":
+                raise ValueError("сессия не на паузе")
+            self.state = "running"
+            self.resume_event.set()
+        return self.status()
+    
+    def stop(self):
+        with self.lock:
+            if self.state in ("running", "paused"):
+                self.state = "stopping"
+                self.resume_event.set()
+            thread = self.thread
+        if thread is not None:
+            thread.join(10)
+        return self.status()
+    
+    def status(self):
+        """Живой статус сессии для клиентов"""
+        with self.lock:
+            now = self.finished_at or self.clock.time()
+            elapsed = now - self.session_start_time if self.session_start_time else 0
+            remaining = max(0, self.end_time - now) if self.end_time and self.state != "finished" else 0
+            return {
+                'state': self.state,
+                'session_id': self.session_id,
+                'elapsed': round(elapsed, 1),
+                'remaining': round(remaining, 1),
+                'focus_time': round(self.focus_time, 1),
+                'focus_percentage': round(self.focus_time / elapsed * 100, 1) if elapsed > 0 else 0,
+                'distraction_count': self.distraction_count,
+                'unknown_time': round(self.unknown_time, 1),
+                'face_detected': self.face_detected,
+                'eyes_detected': self.eyes_detected,
+                'status': self.status_text,
+                'alarm': self.alarm_playing,
+                'blink_rate': round(self.blink_estimator.blink_rate(), 1),
+                'profile': self.performance_profile.key,
+                'error': self.error,
+            }
+    
+    # Поток отслеживания
+    
+    def _run(self):
+        cap = self.camera_pool.acquire(self.camera_index)
+        if cap is None:
+            with self.lock:
+                self.error = f"Не удалось открыть камеру #{self.camera_index}"
+                self.state = "finished"
+            return
+        
+        profile, detection = self.performance_profile, self.detection_profile
+        width, height = profile.capture_size
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.analyzer.detection_scale = min(profile.detection_scale, detection.detection_scale)
+        detection_hz = min(profile.detection_hz, detection.detection_hz)
+        
+        self.session_start_time = self.clock.time()
+        self.end_time = self.session_start_time + self.timer_seconds
+        absent_since = None
+        distraction_counted = False
+        last_detection = 0
+        last_check = self.session_start_time
+        
+        try:
+            while self.state in ("running", "paused"):
+                now = self.clock.time()
+                if self.state == "paused":
+                    # Таймер стоит, камера поддерживается редкими кадрами
+                    self.end_time += now - last_check
+                    last_check = now
+                    cap.grab()
+                    self.resume_event.wait(self.PAUSE_KEEPALIVE_INTERVAL)
+                    # После паузы отсутствие - новый эпизод со своим сигналом
+                    absent_since = None
+                    distraction_counted = False
+                    last_detection = 0
+                    continue
+                last_check = now
+                if now >= self.end_time:
+                    break
+                
+                delay = last_detection + 1.0 / detection_hz - now
+                if delay > 0:
+                    self.clock.sleep(delay)
+                    now = self.clock.time()
+                
+                ret, frame = cap.read()
+                if not ret:
+                    self.error = "Камера перестала отдавать кадры"
+                    break
+                gray = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2GRAY)
+                
+                frame_dt = min(now - last_detection, self.clock.speed) if last_detection else 0
+                last_detection = now
+                result = self.analyzer.analyze(gray, now)
+                if result.unknown:
+                    with self.lock:
+                        self.unknown_time += frame_dt
+                        self.status_text = f"Плохое изображение ({result.quality.describe()})"
+                    if absent_since is not None:
+                        absent_since += frame_dt
+                    continue
+                
+                result.tracks = self.tracker.update(result.faces, result.eyes, now)
+                if result.faces:
+                    main = max(range(len(result.faces)), key=lambda i: result.faces[i][2] * result.faces[i][3])
+                    self.blink_estimator.update(gray, result.faces[main], result.eyes[main], now)
+                else:
+                    self.blink_estimator.update(gray, None, None, now)
+                drowsy = self.blink_estimator.drowsy
+                present = (result.face_detected and (result.eyes_detected or not detection.require_eyes)
+                           and not drowsy)
+                
+                with self.lock:
+                    self.face_detected = result.face_detected
+                    self.eyes_detected = result.eyes_detected
+                    if present:
+                        absent_since = None
+                        distraction_counted = False
+                        self.focus_time += frame_dt
+                        self.alarm_playing = False
+                        self.status_text = "Смотрим на экран" if result.eyes_detected else "Глаза не видны"
+                    else:
+                        if absent_since is None:
+                            absent_since = now
+                        if now - absent_since > detection.absence_seconds:
+                            self.status_text = "Глаза закрыты" if drowsy else "Отвернулись от экрана"
+                            if not distraction_counted:
+                                self.distraction_count += 1
+                                distraction_counted = True
+                            if self.enable_sound and not self.alarm_playing:
+                                self.alarm_playing = True
+                                threading.Thread(target=self._alarm_loop, name="daemon-alarm", daemon=True).start()
+                        else:
+                            self.status_text = "Лицо не обнаружено"
+                    
+                    state = "drowsy" if drowsy else ("focused" if present else "away")
+                    if not self.focus_timeline or self.focus_timeline[-1][1] != state:
+                        self.focus_timeline.append((now, state))
+        except Exception as e:
+            self.error = str(e)
+            print(f"Ошибка в отслеживании (демон): {e}")
+        finally:
+            cap.release()
+            with self.lock:
+                self.alarm_playing = False
+                self.finished_at = self.clock.time()
+                self.state = "finished"
+            self._save_summary()
+    
+    def _alarm_loop(self):
+        """Повторяющийся сигнал, пока пользователь не вернется"""
+        while self.alarm_playing and self.state == "running":
+            try:
+                if winsound is not None:
+                    winsound.Beep(1000, 300)
+                else:
+                    tone = self._alarm_tone()
+                    if tone is None:
+                        raise RuntimeError("звук pygame недоступен")
+                    tone.play()
+            except Exception:
+                print("\a", end="", flush=True)
+            time.sleep(1)
+    
+    def _alarm_tone(self):
+        """Тон 1 кГц на 0.3 с (микшер и буфер - один раз); None - звука нет"""
+        if self.alarm_tone is None:
+            try:
+                if not pygame.mixer.get_init():
+                    pygame.mixer.init()
+                frequency, size, channels = pygame.mixer.get_init()
+                t = np.arange(int(frequency * 0.3)) / frequency
+                wave = (np.sin(2 * np.pi * 1000 * t) * 16000).astype(np.int16)
+                if channels > 1:
+                    wave = np.repeat(wave[:, None], channels, axis=1)
+                self.alarm_tone = pygame.sndarray.make_sound(np.ascontiguousarray(wave))
+            except Exception as e:
+                print(f"⚠️ Звук через pygame недоступен ({e}) - сигнал звонком терминала")
+                self.alarm_tone = False
+        return self.alarm_tone or None
+    
+    def _save_summary(self):
+        duration = self.finished_at - self.session_start_time
+        summary = {
+            'session_id': self.session_id,
+            'start': datetime.fromtimestamp(self.session_start_time).isoformat(timespec='seconds'),
+            'duration': round(duration, 1),
+            'focus_time': round(self.focus_time, 1),
+            'focus_percentage': round(self.focus_time / duration * 100, 1) if duration > 0 else 0,
+            'distraction_count': self.distraction_count,
+            'unknown_time': round(self.unknown_time, 1),
+            'blinks': self.blink_estimator.blinks,
+            'drowsy_events': self.blink_estimator.long_closures,
+            'camera': "pc",
+            'profile': self.performance_profile.key,
+            'timeline': [(round(t - self.session_start_time, 2), s) for t, s in self.focus_timeline],
+            'headless': True,
+        }
+        try:
+            os.makedirs(SESSIONS_DIR, exist_ok=True)
+            write_json_atomic(os.path.join(SESSIONS_DIR, f"{self.session_id}.json"), summary)
+        except OSError as e:
+            print(f"✗ Не удалось сохранить статистику сессии: {e}")
+    
+    def close(self):
+        self.stop()
+        self.camera_pool.close_all()
+
+
+class StatusServer:
+    """JSON-управление демоном по HTTP на localhost
+    
+    GET  /status               - статус сессии
+    POST /session/start        - {"minutes": 25}
+    POST /session/pause        - пауза
+    POST /session/resume       - продолжение
+    POST /session/stop         - остановка
+    POST /shutdown             - завершение демона
+    
+    Команды принимаются только с Content-Type: application/json, а запросы
+    с чужим Host или Origin отклоняются - страница в браузере не может ни
+    управлять демоном, ни читать статус.
+    """
+    
+    def __init__(self, daemon, host="127.0.0.1", port=8765):
+        self.daemon = daemon
+        self.stopped = threading.Event()
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+            
+            def reply(self, code, payload):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def local_request(self):
+                """Запрос с localhost, а не со страницы другого сайта"""
+                if self.headers.get("Host") not in server.allowed_hosts:
+                    # Чужое имя хоста - DNS rebinding
+                    self.reply(403, {'error': "неизвестный хост"})
+                    return False
+                origin = self.headers.get("Origin")
+                if origin is not None and origin not in server.allowed_origins:
+                    self.reply(403, {'error': "запрос со стороннего сайта"})
+                    return False
+                return True
+            
+            def do_GET(self):
+                if not self.local_request():
+                    return
+                if self.path == "/status":
+                    self.reply(200, server.daemon.status())
+                else:
+                    self.reply(404, {'error': "неизвестный адрес"})
+            
+            def do_POST(self):
+                if not self.local_request():
+                    return
+                # Страница браузера без предварительного запроса JSON не пришлет
+                content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+                if content_type != "application/json":
+                    self.reply(415, {'error': "нужен Content-Type: application/json"})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self.reply(400, {'error': "некорректный JSON"})
+                    return
+                if not isinstance(body, dict):
+                    self.reply(400, {'error': "тело запроса - не объект JSON"})
+                    return
+                try:
+                    self.reply(200, server.handle(self.path, body))
+                except KeyError:
+                    self.reply(404, {'error': "неизвестный адрес"})
+                except (ValueError, TypeError) as e:
+                    self.reply(409, {'error': str(e)})
+        
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        # Отвечаем только на обращения по адресу localhost
+        port = self.httpd.server_address[1]
+        self.allowed_hosts = {f"{name}:{port}" for name in (host, "127.0.0.1", "localhost")}
+        self.allowed_origins = {f"http://{name}" for name in self.allowed_hosts}
+    
+    @property
+    def address(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def handle(self, path, body):
+        if path == "/session/start":
+            return self.daemon.start(float(body.get("minutes", 25)))
+        if path == "/shutdown":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {'state': "shutting_down"}
+        actions = {
+            "/session/pause": self.daemon.pause,
+            "/session/resume": self.daemon.resume,
+            "/session/stop": self.daemon.stop,
+        }
+        return actions[path]()
+    
+    def serve_forever(self):
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.stopped.set()
+    
+    def shutdown(self):
+        self.daemon.close()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class DaemonClient:
+    """Тонкий клиент демона (для интерфейса или скриптов)"""
+    
+    def __init__(self, url="http://127.0.0.1:8765", timeout=5):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+    
+    def _post(self, path, payload=None):
+        response = requests.post(self.url + path, json=payload or {}, timeout=self.timeout)
+        data = response.json()
+        if response.status_code != 200:
+            raise RuntimeError(data.get('error', response.status_code))
+        return data
+    
+    def status(self):
+        return requests.get(self.url + "/status", timeout=self.timeout).json()
+    
+    def start(self, minutes=25):
+        return self._post("/session/start", {'minutes': minutes})
+    
+    def pause(self):
+        return self._post("/session/pause")
+    
+    def resume(self):
+        return self._post("/session/resume")
+    
+    def stop(self):
+        return self._post("/session/stop")
+
+
+class PreviewServer:
+    """Трансляция превью и статистики на localhost для панелей и отладки
+    
+    GET /              - страница с превью и статистикой
+    GET /preview.mjpg  - аннотированное превью (multipart/x-mixed-replace)
+    GET /events        - события фокуса (text/event-stream, JSON)
+    GET /stats         - последняя статистика сессии (JSON)
+    
+    Поток отслеживания только подменяет последний кадр, а без зрителей
+    ничего не делает. Кодирует отдельный поток - один раз на кадр и не
+    чаще MAX_FPS, сколько бы ни было зрителей. Каждый зритель ждет в своем
+    потоке сервера очередной JPEG; не успел отправить - получит следующий.
+    """
+    
+    DEFAULT_PORT = 8766
+    MAX_FPS = 10
+    JPEG_QUALITY = 70
+    # Статистика сессии в поток событий - не чаще (секунды)
+    STATS_INTERVAL = 1.0
+    # Сколько последних событий держать для отстающих зрителей
+    EVENTS_KEPT = 64
+    # Зритель, который не принимает данные дольше, отключается (секунды)
+    CLIENT_TIMEOUT = 5
+    
+    PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Антипрокрастинатор 3000</title></head>
+<body style="font-family: sans-serif">
+<img src="/preview.mjpg" style="max-width: 100%">
+<pre id="stats"></pre>
+<script>
+new EventSource("/events").onmessage = function (e) {
+    var event = JSON.parse(e.data);
+    if (event.kind === "session_tick") document.getElementById("stats").textContent = event.text;
+};
+</script>
+</body></html>
+"""
+    
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self.lock = threading.Lock()
+        self.frame_ready = threading.Condition(self.lock)
+        self.jpeg_ready = threading.Condition(self.lock)
+        self.events_ready = threading.Condition(self.lock)
+        self.running = False
+        # Последний кадр, ждущий кодирования, и последний JPEG
+        self.pending = None
+        self.jpeg = None
+        self.jpeg_seq = 0
+        self.viewers = 0
+        # Последние события: (номер, JSON)
+        self.events = []
+        self.event_seq = 0
+        self.stats = None
+        self.last_stats = 0.0
+        # Затраты на кодирование
+        self.offered = 0
+        self.encoded = 0
+        self.encode_ms = 0.0
+        self.encoder_thread = None
+        self.server_thread = None
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            timeout = server.CLIENT_TIMEOUT
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def reply(self, code, content_type, body):
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def do_GET(self):
+                try:
+                    if self.headers.get("Host") not in server.allowed_hosts:
+                        # Чужое имя хоста - страница другого сайта через DNS rebinding
+                        self.reply(403, "application/json; charset=utf-8",
+                                   json.dumps({'error': "неизвестный хост"}, ensure_ascii=False).encode("utf-8"))
+                    elif self.path == "/":
+                        self.reply(200, "text/html; charset=utf-8", server.PAGE.encode("utf-8"))
+                    elif self.path == "/preview.mjpg":
+                        server.stream_preview(self)
+                    elif self.path == "/events":
+                        server.stream_events(self)
+                    elif self.path == "/stats":
+                        body = json.dumps(server.stats or {}, ensure_ascii=False).encode("utf-8")
+                        self.reply(200, "application/json; charset=utf-8", body)
+                    else:
+                        self.reply(404, "application/json; charset=utf-8",
+                                   json.dumps({'error': "неизвестный адрес"}, ensure_ascii=False).encode("utf-8"))
+                except OSError:
+                    # Зритель отключился или не принимает данные
+                    pass
+        
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        # Отвечаем только на обращения по адресу localhost
+        port = self.httpd.server_address[1]
+        self.allowed_hosts = {f"{name}:{port}" for name in (host, "127.0.0.1", "localhost")}
+    
+    @property
+    def address(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self):
+        self.running = True
+        self.encoder_thread = threading.Thread(target=self._encode_loop, name="preview-encoder", daemon=True)
+        self.encoder_thread.start()
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever, name="preview-server", daemon=True)
+        self.server_thread.start()
+    
+    def stop(self, timeout=2.0):
+        with self.lock:
+            self.running = False
+            self.frame_ready.notify_all()
+            self.jpeg_ready.notify_all()
+            self.events_ready.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        for thread in (self.encoder_thread, self.server_thread):
+            if thread is not None:
+                thread.join(timeout)
+    
+    def offer(self, frame):
+        """Последний аннотированный кадр (вызывается потоком отслеживания)"""
+        if not self.viewers:
+            return
+        # Копия: буфер кадра источник может переиспользовать
+        frame = frame.copy()
+        with self.lock:
+            self.pending = frame
+            self.offered += 1
+            self.frame_ready.notify()
+    
+    def publish_event(self, event):
+        """Событие шины в поток /events (статистика - не чаще STATS_INTERVAL)"""
+        data = event.to_dict()
+        now = time.time()
+        with self.lock:
+            if event.kind == "session_tick":
+                self.stats = data
+                if now - self.last_stats < self.STATS_INTERVAL:
+                    return
+                self.last_stats = now
+            self.event_seq += 1
+            self.events.append((self.event_seq, json.dumps(data, ensure_ascii=False).encode("utf-8")))
+            del self.events[:-self.EVENTS_KEPT]
+            self.events_ready.notify_all()
+    
+    def _encode_loop(self):
+        last_encode = 0.0
+        while True:
+            with self.lock:
+                while self.running and self.pending is None:
+                    self.frame_ready.wait()
+                if not self.running:
+                    return
+            # Кадры, пришедшие за паузу, заменяют друг друга - кодируется последний
+            delay = last_encode + 1.0 / self.MAX_FPS - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            with self.lock:
+                frame, self.pending = self.pending, None
+            last_encode = time.time()
+            started = time.perf_counter()
+            ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.JPEG_QUALITY])
+            elapsed = (time.perf_counter() - started) * 1000
+            if not ok:
+                continue
+            with self.lock:
+                self.jpeg = data.tobytes()
+                self.jpeg_seq += 1
+                self.encoded += 1
+                self.encode_ms += elapsed
+                self.jpeg_ready.notify_all()
+    
+    def stream_preview(self, handler):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+        with self.lock:
+            self.viewers += 1
+        try:
+            seq = 0
+            while True:
+                with self.lock:
+                    while self.running and self.jpeg_seq == seq:
+                        self.jpeg_ready.wait()
+                    if not self.running:
+                        return
+                    seq, jpeg = self.jpeg_seq, self.jpeg
+                handler.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                                    + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n")
+        finally:
+            with self.lock:
+                self.viewers -= 1
+    
+    def stream_events(self, handler):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+        with self.lock:
+            seq = self.event_seq
+            stats = self.stats
+        if stats is not None:
+            handler.wfile.write(b"data: " + json.dumps(stats, ensure_ascii=False).encode("utf-8") + b"\n\n")
+        while True:
+            with self.lock:
+                if self.running and self.event_seq == seq:
+                    self.events_ready.wait(15)
+                if not self.running:
+                    return
+                fresh = [data for number, data in self.events if number > seq]
+                seq = self.event_seq
+            if not fresh:
+                # Комментарий SSE: проверка, что зритель еще подключен
+                handler.wfile.write(b": keepalive\n\n")
+            for data in fresh:
+                handler.wfile.write(b"data: " + data + b"\n\n")
+    
+    def describe(self):
+        with self.lock:
+            average = self.encode_ms / self.encoded if self.encoded else 0
+            return (f"превью: зрителей {self.viewers}, закодировано {self.encoded} из {self.offered} "
+                    f"кадров (в среднем {average:.1f} мс)")
+
+
+def run_daemon_cli(argv):
+    """Отслеживание без интерфейса (--daemon)"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        prog="антипрокрастинатор3000.py --daemon",
+        description="Фоновое отслеживание без окна, управление по HTTP (JSON) на localhost"
+    )
+    parser.add_argument("--port", type=int, default=8765, help="порт на 127.0.0.1 (по умолчанию 8765)")
+    parser.add_argument("--camera", type=int, default=0, help="номер камеры ПК")
+    parser.add_argument("--profile", default="balanced", choices=sorted(PERFORMANCE_PROFILES))
+    parser.add_argument("--start", type=float, metavar="МИНУТ", help="сразу начать сессию")
+    parser.add_argument("--no-sound", action="store_true", help="без звукового сигнала")
+    args = parser.parse_args(argv)
     
-    def get_connection_info(self):
-        """Получение информации о подключении"""
-        if self.cap and self.ivcam_connected:
-            width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = self.cap.get(cv2.CAP_PROP_FPS)
-        else:
-            width = height = fps = 0
-        
-        return {
-            'connected': self.ivcam_connected,
-            'camera_index': self.camera_index,
-            'resolution': f"{width}x{height}",
-            'fps': fps,
-            'installed': self.ivcam_installed
-        }
+    opener = None
+    simulate = os.environ.get("ANTIPROCRASTINATOR_SIMULATE")
+    if simulate:
+        opener = SimulatedVideoSource.opener(None if simulate == "1" else SimulatedVideoSource.parse_script(simulate))
     
-    def scan_all_cameras(self):
-        """Сканирование всех доступных камер для отладки"""
-        print("📡 Сканирование всех камер...")
-        cameras = []
-        
-        max_cameras = 10
-        for i in range(max_cameras):
-            cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
-            if cap.isOpened():
-                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                fps = cap.get(cv2.CAP_PROP_FPS)
-                
-                cameras.append({
-                    'index': i,
-                    'width': width,
-                    'height': height,
-                    'fps': fps
-                })
-                
-                print(f"  Камера #{i}: {width}x{height} @ {fps}FPS")
-                cap.release()
-            else:
-                print(f"  Камера #{i}: недоступна")
-        
-        return cameras
+    daemon = TrackingDaemon(args.camera, args.profile, camera_opener=opener)
+    daemon.enable_sound = not args.no_sound
+    server = StatusServer(daemon, port=args.port)
+    print(f"🛰️ Демон слушает {server.address} (GET /status, POST /session/start|pause|resume|stop)")
+    if args.start:
+        daemon.start(args.start)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
 
 
 class EyeTrackerApp(QMainWindow):
@@ -270,9 +5184,32 @@ class EyeTrackerApp(QMainWindow):
     update_face_status_signal = pyqtSignal(str, str)
     update_camera_status_signal = pyqtSignal(str, str)
     timer_finished_signal = pyqtSignal()
+    detection_cost_signal = pyqtSignal(str)
+    focus_event_signal = pyqtSignal(object)
     
-    def __init__(self):
+    # Интервал захвата кадров на паузе (поддержание камеры в рабочем состоянии)
+    PAUSE_KEEPALIVE_INTERVAL = 1.0
+    # Сколько секунд держать камеру открытой после последнего пользователя
+    CAMERA_GRACE_SECONDS = 30
+    # Сколько ждать завершения потоков сессии при остановке и выходе
+    SHUTDOWN_TIMEOUT = 3.0
+    # Частота проверки камерой, пока пользователь печатает или двигает мышь
+    INPUT_VERIFY_HZ = 2.0
+    
+    # Флаги и счетчики сессии живут в SessionState (меняются только его методами)
+    is_tracking = property(lambda self: self.session.tracking)
+    timer_running = property(lambda self: self.session.timer_running)
+    timer_paused = property(lambda self: self.session.paused)
+    alarm_playing = property(lambda self: self.session.alarm)
+    focus_time = property(lambda self: self.session.focus_time)
+    unknown_time = property(lambda self: self.session.unknown_time)
+    distraction_count = property(lambda self: self.session.distraction_count)
+    
+    def __init__(self, clock=None, camera_opener=None):
         super().__init__()
+        # Часы сессии и источник кадров можно подменить (симуляция, прогоны)
+        self.clock = clock or SessionClock()
+        self.camera_opener = camera_opener
         
         if not LIBS_LOADED:
             self.show_error_dialog()
@@ -300,21 +5237,41 @@ class EyeTrackerApp(QMainWindow):
     def init_variables(self):
         """Инициализация переменных"""
         # Основные переменные
-        self.is_tracking = False
-        self.timer_running = False
-        self.timer_paused = False
+        self.session = SessionState()
         self.timer_seconds = 0
-        self.alarm_playing = False
         self.face_detected = False
+        # Без окон-сообщений (ускоренные прогоны)
+        self.interactive = True
         self.camera_index = 0
         self.use_ivcam = False
+        # Совмещенный режим: камера ПК и iVCam одновременно
+        self.fusion_mode = False
+        self.fusion_cpu_budget = 50
+        # Захват и анализ камеры ПК в дочернем процессе
+        self.process_capture = False
+        self.pc_camera_index = 0
         
         # Потоки
         self.timer_thread = None
         self.tracking_thread = None
+        self.fusion = None
+        # Сброшено, пока сессия на паузе (будит поток отслеживания при продолжении)
+        self.resume_event = threading.Event()
+        self.resume_event.set()
+        
+        # Общий пул камер: тест, предпросмотр и отслеживание делят одно устройство
+        grace = float(os.environ.get("ANTIPROCRASTINATOR_CAMERA_GRACE", self.CAMERA_GRACE_SECONDS))
+        simulate = os.environ.get("ANTIPROCRASTINATOR_SIMULATE")
+        if self.camera_opener is None and simulate:
+            # Сценарная камера вместо устройства: 1 - сценарий по умолчанию
+            script = None if simulate == "1" else SimulatedVideoSource.parse_script(simulate)
+            self.camera_opener = SimulatedVideoSource.opener(script, clock=self.clock)
+            print("🎬 Используется симулированная камера")
+        self.camera_pool = CameraPool(grace_seconds=grace, opener=self.camera_opener)
+        self.pc_camera = None
         
         # Менеджер iVCam
-        self.ivcam_manager = IVCamManager()
+        self.ivcam_manager = IVCamManager(self.camera_pool)
         
         # Инициализация звука
         try:
@@ -322,18 +5279,71 @@ class EyeTrackerApp(QMainWindow):
         except:
             print("Предупреждение: не удалось инициализировать звук")
         
-        # Загрузка каскадов Haar
-        try:
-            self.face_cascade = cv2.CascadeClassifier(
-                cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-            )
-            self.eye_cascade = cv2.CascadeClassifier(
-                cv2.data.haarcascades + 'haarcascade_eye.xml'
-            )
-        except:
-            print("Предупреждение: не удалось загрузить каскады Haar")
-            self.face_cascade = None
-            self.eye_cascade = None
+        # Загрузка каскадов Haar: разбор XML один раз, экземпляры по потокам
+        self.detector_pool = DetectorPool()
+        
+        # Детектор и сопровождение лиц (несколько человек в кадре)
+        self.face_analyzer = self.detector_pool.new_analyzer()
+        print(f"📦 Детекторы: {self.detector_pool.describe()}")
+        # Параметры каскада, подобранные через --tune (если есть); итоговый
+        # профиль получается из него с учетом чувствительности и строгого режима
+        self.tuned_profile = DetectionProfile.load()
+        self.detection_profile = self.tuned_profile
+        self.detection_profile.apply(self.face_analyzer)
+        self.last_gray = None
+        self.face_tracker = FaceTracker()
+        self.person_stats = {}
+        # Трансляция превью и статистики на localhost (включается в настройках)
+        self.preview_server = None
+        # Образец лица владельца: фокус засчитывается только ему
+        self.owner_verifier = OwnerVerifier.load()
+        self.owner_only = False
+        
+        # Профиль производительности (переключается автоматически или вручную)
+        self.performance_profile = PERFORMANCE_PROFILES['balanced']
+        self.auto_profile = True
+        self.power_monitor = PowerMonitor()
+        
+        # Сессия и хронология состояний фокуса
+        self.session_id = None
+        self.focus_timeline = []
+        # Профайлер сессии (включается галочкой или ANTIPROCRASTINATOR_PROFILE=1)
+        self.profiler = None
+        # Запись кадров сессии (галочка или ANTIPROCRASTINATOR_RECORD=1)
+        self.record_frames = False
+        # Затраты процесса на текущую сессию и итог последней
+        self.resource_sampler = None
+        self.last_resources = None
+        # Клавиатура и мышь: во время ввода камера проверяется реже
+        self.input_monitor = InputActivityMonitor.create(self.clock)
+        self.input_aware = False
+        
+        # Итоги по часам, дням и неделям
+        self.rollups = FocusRollups.load()
+        
+        # Выгрузка статистики на сервер сбора (если задан адрес)
+        self.stats_uploader = None
+        if COLLECTOR_URL:
+            self.stats_uploader = StatsUploader(COLLECTOR_URL)
+            self.stats_uploader.start()
+        
+        # Журнал текущей сессии. Сессии, прерванные падением, закрываются
+        # до начала новой; недостающие в итогах сессии досчитываются в фоне
+        self.journal = None
+        self.recover_sessions()
+        threading.Thread(target=self.sync_rollups, name="sync_rollups", daemon=True).start()
+        
+        # Шина событий фокуса: цикл отслеживания только публикует,
+        # интерфейс, сигнал и выгрузка получают события через свои очереди
+        self.event_bus = FocusEventBus()
+        self.event_bus.subscribe(self.focus_event_signal.emit, policy='merge', name="interface")
+        if self.stats_uploader is not None:
+            self.event_bus.subscribe(self.upload_focus_event, maxsize=256, policy='drop_newest',
+                                     kinds=("face_lost", "face_returned", "eyes_hidden", "distraction"),
+                                     name="uploader")
+        # Слияние переставило бы face_lost/face_returned - теряем только самые старые
+        self.event_bus.subscribe(self.stream_focus_event, policy='drop_oldest', name="preview")
+        self.event_bus.start()
     
     def setup_ivcam(self):
         """Настройка iVCam"""
@@ -662,7 +5672,11 @@ class EyeTrackerApp(QMainWindow):
         cam_type_layout.addWidget(QLabel("Тип камеры:"))
         
         self.camera_type_combo = QComboBox()
-        self.camera_type_combo.addItems(["Встроенная камера ПК", "iVCam (телефон через USB)"])
+        self.camera_type_combo.addItems([
+            "Встроенная камера ПК",
+            "iVCam (телефон через USB)",
+            "ПК + iVCam (совмещенный режим)",
+        ])
         self.camera_type_combo.currentIndexChanged.connect(self.on_camera_type_changed)
         cam_type_layout.addWidget(self.camera_type_combo)
         
@@ -796,6 +5810,21 @@ class EyeTrackerApp(QMainWindow):
         
         camera_layout.addWidget(self.ivcam_frame)
         
+        # Бюджет CPU для совмещенного режима
+        self.fusion_frame = QWidget()
+        self.fusion_frame.setVisible(False)
+        fusion_layout = QHBoxLayout(self.fusion_frame)
+        fusion_layout.addWidget(QLabel("Бюджет CPU (% ядра):"))
+        self.fusion_budget_spin = QSpinBox()
+        self.fusion_budget_spin.setRange(10, 400)
+        self.fusion_budget_spin.setValue(self.fusion_cpu_budget)
+        self.fusion_budget_spin.setToolTip("Частота анализа менее полезной камеры снижается, "
+                                           "чтобы суммарная нагрузка не превышала бюджет")
+        self.fusion_budget_spin.valueChanged.connect(self.on_fusion_budget_changed)
+        fusion_layout.addWidget(self.fusion_budget_spin)
+        fusion_layout.addStretch()
+        camera_layout.addWidget(self.fusion_frame)
+        
         # Предпросмотр камеры
         self.camera_preview = QLabel("Камера не активна")
         self.camera_preview.setAlignment(Qt.AlignCenter)
@@ -845,6 +5874,11 @@ class EyeTrackerApp(QMainWindow):
         """)
         stats_layout.addWidget(self.stats_label)
         
+        # История по часам, дням и неделям (из готовых итогов)
+        history_btn = QPushButton("📅 История фокуса")
+        history_btn.clicked.connect(self.show_history)
+        stats_layout.addWidget(history_btn)
+        
         # Настройки отслеживания
         sensitivity_layout = QHBoxLayout()
         sensitivity_layout.addWidget(QLabel("Чувствительность:"))
@@ -856,6 +5890,12 @@ class EyeTrackerApp(QMainWindow):
         sensitivity_layout.addWidget(self.sensitivity_slider)
         stats_layout.addLayout(sensitivity_layout)
         
+        # Ожидаемая нагрузка и время реакции для выбранного уровня
+        self.sensitivity_cost_label = QLabel("Нагрузка: измеряется...")
+        self.sensitivity_cost_label.setWordWrap(True)
+        self.sensitivity_cost_label.setStyleSheet("font-size: 11px; color: #7f8c8d;")
+        stats_layout.addWidget(self.sensitivity_cost_label)
+        
         # Чекбоксы настроек
         self.enable_sound_checkbox = QCheckBox("Включить звуковые сигналы")
         self.enable_sound_checkbox.setChecked(True)
@@ -864,6 +5904,80 @@ class EyeTrackerApp(QMainWindow):
         self.strict_mode_checkbox = QCheckBox("Строгий режим (сигнал при малейшем отвлечении)")
         stats_layout.addWidget(self.strict_mode_checkbox)
         
+        # Профиль нагрузки сессии (если приложение "греет ноутбук")
+        self.profiling_checkbox = QCheckBox("Профилировать сессию (отчет о нагрузке)")
+        self.profiling_checkbox.setToolTip("Сохраняет профиль в папку статистики сессий, "
+                                           "формат для flamegraph/speedscope")
+        self.profiling_checkbox.setChecked(bool(os.environ.get("ANTIPROCRASTINATOR_PROFILE")))
+        stats_layout.addWidget(self.profiling_checkbox)
+        
+        # Запись кадров для точного повтора ("говорит, что я отвлекся, а я смотрел")
+        self.record_checkbox = QCheckBox("Записывать кадры сессии (для разбора ошибок)")
+        self.record_checkbox.setToolTip("Серые кадры и результаты детекции сохраняются в папку сессий; "
+                                        "повтор: --replay <файл>.frames")
+        self.record_checkbox.setChecked(bool(os.environ.get("ANTIPROCRASTINATOR_RECORD")))
+        stats_layout.addWidget(self.record_checkbox)
+        
+        # Детекция в отдельном процессе - интерфейс не тормозит при любой нагрузке
+        self.capture_process_checkbox = QCheckBox("Анализ камеры ПК в отдельном процессе")
+        self.capture_process_checkbox.setToolTip("Захват и поиск лиц идут в дочернем процессе, "
+                                                 "кадры передаются через общую память")
+        self.capture_process_checkbox.setChecked(bool(os.environ.get("ANTIPROCRASTINATOR_CAPTURE_PROCESS")))
+        stats_layout.addWidget(self.capture_process_checkbox)
+        
+        # Пока идет ввод с клавиатуры или мыши, камера только подтверждает присутствие
+        self.input_aware_checkbox = QCheckBox("Реже проверять камеру, пока я печатаю")
+        self.input_aware_checkbox.setToolTip(
+            f"Во время ввода анализ {self.INPUT_VERIFY_HZ:g} раз в секунду, в паузах и при "
+            f"отсутствии - полная частота")
+        self.input_aware_checkbox.setChecked(self.input_monitor.available)
+        self.input_aware_checkbox.setEnabled(self.input_monitor.available)
+        stats_layout.addWidget(self.input_aware_checkbox)
+        
+        # Посторонние лица (коллега рядом, собеседник на втором экране) не фокус
+        owner_layout = QHBoxLayout()
+        self.owner_only_checkbox = QCheckBox("Фокус только по моему лицу")
+        self.owner_only_checkbox.setToolTip("Сначала запишите образец лица кнопкой справа")
+        self.owner_only_checkbox.setChecked(self.owner_verifier.enrolled)
+        self.owner_only_checkbox.setEnabled(self.owner_verifier.enrolled)
+        owner_layout.addWidget(self.owner_only_checkbox)
+        self.enroll_owner_btn = QPushButton("🔐 Запомнить мое лицо")
+        self.enroll_owner_btn.clicked.connect(self.enroll_owner)
+        owner_layout.addWidget(self.enroll_owner_btn)
+        stats_layout.addLayout(owner_layout)
+        
+        # Превью и статистика для панели команды или удаленной отладки
+        port = int(os.environ.get("ANTIPROCRASTINATOR_PREVIEW_PORT", PreviewServer.DEFAULT_PORT))
+        self.preview_checkbox = QCheckBox(f"Трансляция превью на localhost:{port}")
+        self.preview_checkbox.setToolTip(f"Страница http://127.0.0.1:{port}/, поток /preview.mjpg, "
+                                         f"события /events")
+        self.preview_checkbox.toggled.connect(self.toggle_preview_server)
+        stats_layout.addWidget(self.preview_checkbox)
+        
+        # Изменения применяются с небольшой задержкой, пока ползунок двигают
+        self.sensitivity_timer = QTimer(self)
+        self.sensitivity_timer.setSingleShot(True)
+        self.sensitivity_timer.timeout.connect(self.apply_sensitivity)
+        self.sensitivity_slider.valueChanged.connect(lambda _: self.sensitivity_timer.start(300))
+        self.strict_mode_checkbox.stateChanged.connect(lambda _: self.sensitivity_timer.start(300))
+        self.sensitivity_timer.start(1000)
+        
+        # Профиль производительности
+        profile_layout = QHBoxLayout()
+        profile_layout.addWidget(QLabel("Профиль:"))
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItem("Авто (батарея и нагрузка)", None)
+        for key, profile in PERFORMANCE_PROFILES.items():
+            self.profile_combo.addItem(profile.title, key)
+        self.profile_combo.currentIndexChanged.connect(self.on_profile_combo_changed)
+        profile_layout.addWidget(self.profile_combo)
+        stats_layout.addLayout(profile_layout)
+        
+        self.profile_label = QLabel(self.performance_profile.describe())
+        self.profile_label.setWordWrap(True)
+        self.profile_label.setStyleSheet("font-size: 11px; color: #7f8c8d;")
+        stats_layout.addWidget(self.profile_label)
+        
         stats_group.setLayout(stats_layout)
         right_panel.addWidget(stats_group)
         
@@ -928,11 +6042,11 @@ class EyeTrackerApp(QMainWindow):
         self.setStatusBar(self.status_bar)
         self.status_bar.showMessage("Готов к работе. Проверьте iVCam подключение.")
         
-        # Инициализация статистики
+        # Инициализация статистики (счетчики фокуса - в self.session)
         self.session_start_time = None
-        self.focus_time = 0
-        self.distraction_count = 0
         self.total_session_time = 0
+        # Моргания и сонливость (по основному лицу)
+        self.blink_estimator = BlinkEstimator()
     
     def connect_signals(self):
         """Подключение сигналов"""
@@ -942,6 +6056,93 @@ class EyeTrackerApp(QMainWindow):
         self.update_face_status_signal.connect(self.update_face_status_display)
         self.update_camera_status_signal.connect(self.update_camera_status_display)
         self.timer_finished_signal.connect(self.on_timer_finished)
+        self.detection_cost_signal.connect(self.sensitivity_cost_label.setText)
+        self.focus_event_signal.connect(self.on_focus_event)
+        
+        # Периодический опрос батареи и нагрузки для авто-профиля
+        self.power_timer = QTimer(self)
+        self.power_timer.timeout.connect(self.poll_power_profile)
+        self.power_timer.start(10000)
+    
+    def on_profile_combo_changed(self, index):
+        """Ручной выбор профиля производительности"""
+        key = self.profile_combo.itemData(index)
+        self.auto_profile = key is None
+        if key is None:
+            self.poll_power_profile()
+        else:
+            self.set_performance_profile(key)
+    
+    def poll_power_profile(self):
+        """Автоматическая смена профиля по батарее, нагрузке и температуре"""
+        if not self.auto_profile:
+            return
+        key = self.power_monitor.poll(self.performance_profile.key)
+        if key is not None:
+            self.set_performance_profile(key)
+    
+    def apply_sensitivity(self):
+        """Пересчет профиля детекции по ползунку и строгому режиму"""
+        self.detection_profile = self.tuned_profile.with_sensitivity(
+            self.sensitivity_slider.value(),
+            self.strict_mode_checkbox.isChecked()
+        )
+        self.measure_detection_cost()
+    
+    def measure_detection_cost(self):
+        """Замер стоимости текущего профиля на этой машине (в фоне)"""
+        self.sensitivity_cost_label.setText("Нагрузка: измеряется...")
+        threading.Thread(
+            target=self._measure_detection_cost_thread,
+            args=(self.detection_profile, self.performance_profile),
+            daemon=True
+        ).start()
+    
+    def _measure_detection_cost_thread(self, detection, performance):
+        """Поток замера: несколько прогонов детектора на последнем кадре"""
+        try:
+            # Каскады этого потока - не мешают отслеживанию
+            analyzer = self.detector_pool.thread_analyzer()
+            # Меряем стоимость самих каскадов, даже если кадр темный
+            analyzer.quality_filter = False
+            detection.apply(analyzer)
+            analyzer.detection_scale = min(performance.detection_scale, detection.detection_scale)
+            hz = min(performance.detection_hz, detection.detection_hz)
+            
+            gray = self.last_gray
+            if gray is None:
+                # Камера еще не работала - меряем на шуме размера кадра профиля
+                width, height = performance.capture_size
+                gray = np.random.randint(0, 256, (height, width), dtype=np.uint8)
+            
+            analyzer.analyze(gray)  # Прогрев
+            runs = 3
+            started = time.perf_counter()
+            for _ in range(runs):
+                analyzer.analyze(gray)
+            ms = (time.perf_counter() - started) * 1000 / runs
+            
+            # Если детекция не успевает, реальная частота ограничена CPU
+            hz = min(hz, 1000 / ms) if ms > 0 else hz
+            cpu_percent = ms * hz / 10  # Доля одного ядра
+            latency = detection.absence_seconds + 1.0 / hz + ms / 1000
+            eyes = ", нужны глаза" if detection.require_eyes else ""
+            text = (f"Нагрузка: ~{cpu_percent:.0f}% ядра ({ms:.0f} мс × {hz:.1f} Гц), "
+                    f"реакция ~{latency:.1f} с{eyes}")
+        except Exception as e:
+            text = f"Нагрузка: не удалось измерить ({e})"
+        
+        self.detection_cost_signal.emit(text)
+    
+    def set_performance_profile(self, key):
+        """Смена профиля; работающее отслеживание подхватит его на следующем кадре"""
+        profile = PERFORMANCE_PROFILES[key]
+        if profile is self.performance_profile:
+            return
+        self.performance_profile = profile
+        self.profile_label.setText(profile.describe())
+        self.status_bar.showMessage(f"Профиль производительности: {profile.title}", 3000)
+        self.measure_detection_cost()
     
     def show_help(self):
         """Показать общую справку"""
@@ -976,9 +6177,19 @@ class EyeTrackerApp(QMainWindow):
     
     def on_camera_type_changed(self, index):
         """Обработка изменения типа камеры"""
-        self.use_ivcam = (index == 1)  # 0 = ПК, 1 = iVCam
+        self.use_ivcam = (index == 1)  # 0 = ПК, 1 = iVCam, 2 = ПК + iVCam
+        self.fusion_mode = (index == 2)
+        self.fusion_frame.setVisible(self.fusion_mode)
         
-        if self.use_ivcam:
+        if self.fusion_mode:
+            self.pc_camera_frame.setVisible(True)
+            self.ivcam_frame.setVisible(True)
+            self.camera_status_label.setText("🔀 Камера: ПК + iVCam (не активны)")
+            self.status_bar.showMessage("Совмещенный режим: анализируются обе камеры.")
+            
+            # Проверяем iVCam
+            self.check_ivcam()
+        elif self.use_ivcam:
             self.pc_camera_frame.setVisible(False)
             self.ivcam_frame.setVisible(True)
             self.camera_status_label.setText("📱 Камера: iVCam (не подключен)")
@@ -995,6 +6206,12 @@ class EyeTrackerApp(QMainWindow):
         # Останавливаем текущую камеру
         self.ivcam_manager.release()
     
+    def on_fusion_budget_changed(self, value):
+        """Смена бюджета CPU совмещенного режима (применяется сразу)"""
+        self.fusion_cpu_budget = value
+        if self.fusion is not None:
+            self.fusion.cpu_budget = value
+    
     def update_camera_status_display(self, text, color):
         """Обновление статуса камеры"""
         self.camera_status_label.setText(text)
@@ -1102,8 +6319,7 @@ class EyeTrackerApp(QMainWindow):
                         f"iVCam успешно подключен! Камера #{info['camera_index']}", 5000
                     ))
                     
-                    # Закрываем соединение после теста
-                    time.sleep(3)
+                    # Отдаем камеру пулу - она останется открытой для старта сессии
                     self.ivcam_manager.release()
                     
                     return
@@ -1172,7 +6388,7 @@ class EyeTrackerApp(QMainWindow):
         max_cameras = 10
         
         for i in range(max_cameras):
-            cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
+            cap = self.camera_pool.open_probe(i)
             if cap.isOpened():
                 width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
                 height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
@@ -1239,9 +6455,10 @@ class EyeTrackerApp(QMainWindow):
                     # Если нет номера в тексте, берем индекс
                     camera_index = self.camera_combo.currentIndex()
             
-            cap = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
+            # Камера из пула остается открытой для последующего старта сессии
+            cap = self.camera_pool.acquire(camera_index)
             
-            if cap.isOpened():
+            if cap is not None:
                 ret, frame = cap.read()
                 cap.release()
                 
@@ -1270,7 +6487,9 @@ class EyeTrackerApp(QMainWindow):
                 return
             
             # Проверка камеры
-            if self.use_ivcam:
+            self.process_capture = (self.capture_process_checkbox.isChecked()
+                                    and not self.use_ivcam and not self.fusion_mode)
+            if self.use_ivcam or self.fusion_mode:
                 # Получаем выбранную камеру iVCam
                 selected_index = self.ivcam_combo.currentIndex()
                 camera_index = None
@@ -1300,7 +6519,8 @@ class EyeTrackerApp(QMainWindow):
                     f"📱 iVCam подключен (камера #{info['camera_index']})",
                     "green"
                 )
-            else:
+            
+            if not self.use_ivcam:
                 # Проверяем встроенную камеру
                 text = self.camera_combo.currentText()
                 camera_index = 0
@@ -1312,28 +6532,68 @@ class EyeTrackerApp(QMainWindow):
                     else:
                         camera_index = self.camera_combo.currentIndex()
                 
-                cap = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
-                if not cap.isOpened():
-                    QMessageBox.warning(self, "Ошибка", "Не удалось открыть встроенную камеру")
-                    return
-                cap.release()
+                self.pc_camera_index = camera_index
+                if self.pc_camera is not None:
+                    self.pc_camera.release()
+                    self.pc_camera = None
                 
-                self.update_camera_status_signal.emit(
-                    f"💻 Камера ПК #{camera_index} активна",
-                    "green"
-                )
+                if self.process_capture:
+                    # Камеру откроет дочерний процесс - в этом процессе ее не держим
+                    self.camera_pool.close_all()
+                    self.update_camera_status_signal.emit(
+                        f"💻 Камера ПК #{camera_index} (анализ в отдельном процессе)",
+                        "green"
+                    )
+                else:
+                    # Дескриптор передается потоку отслеживания без повторного открытия
+                    self.pc_camera = self.camera_pool.acquire(camera_index)
+                    if self.pc_camera is None:
+                        self.ivcam_manager.release()
+                        QMessageBox.warning(self, "Ошибка", "Не удалось открыть встроенную камеру")
+                        return
+                    
+                    if self.fusion_mode:
+                        self.update_camera_status_signal.emit(
+                            f"🔀 Камера ПК #{camera_index} + iVCam активны",
+                            "green"
+                        )
+                    else:
+                        self.update_camera_status_signal.emit(
+                            f"💻 Камера ПК #{camera_index} активна",
+                            "green"
+                        )
             
             self.timer_seconds = minutes * 60
-            self.is_tracking = True
-            self.timer_running = True
-            self.timer_paused = False
+            # Новый токен отмены: потоки прошлой сессии счетчики уже не тронут
+            token = self.session.begin()
+            self.resume_event.set()
             
             # Инициализация статистики
-            self.session_start_time = time.time()
-            self.focus_time = 0
-            self.distraction_count = 0
+            self.session_start_time = self.clock.time()
             self.total_session_time = 0
-            self.last_face_time = time.time()
+            self.blink_estimator = BlinkEstimator()
+            self.last_face_time = self.clock.time()
+            # Объекты статистики - новые: поток прошлой сессии держит свои
+            self.face_tracker = FaceTracker()
+            self.person_stats = {}
+            self.session_id = uuid.uuid4().hex
+            self.focus_timeline = []
+            self.record_frames = self.record_checkbox.isChecked()
+            self.input_aware = self.input_aware_checkbox.isChecked() and self.input_monitor.available
+            self.owner_only = self.owner_only_checkbox.isChecked() and self.owner_verifier.enrolled
+            try:
+                self.journal = SessionJournal(
+                    os.path.join(SESSIONS_DIR, f"{self.session_id}{SessionJournal.SUFFIX}"),
+                    self.session_start_time, {
+                        'session_start': self.session_start_time,
+                        'planned': self.timer_seconds,
+                        'camera': "ivcam" if self.use_ivcam else "pc",
+                        'profile': self.performance_profile.key,
+                        'owner_only': self.owner_only,
+                    }, self.journal_snapshot, self.clock)
+            except OSError as e:
+                print(f"⚠️ Журнал сессии недоступен: {e}")
+                self.journal = None
             
             # Обновляем интерфейс
             self.start_btn.setEnabled(False)
@@ -1343,8 +6603,17 @@ class EyeTrackerApp(QMainWindow):
             self.status_bar.showMessage(f"Таймер запущен на {minutes} минут")
             
             # Запускаем потоки
-            self.timer_thread = threading.Thread(target=self.run_timer, daemon=True)
-            self.tracking_thread = threading.Thread(target=self.track_eyes, daemon=True)
+            self.resource_sampler = ResourceSampler()
+            self.resource_sampler.start()
+            if self.profiling_checkbox.isChecked():
+                self.profiler = SamplingProfiler()
+                self.profiler.start()
+                print("🔬 Профилирование сессии включено")
+            
+            self.timer_thread = threading.Thread(target=self.run_timer, args=(token,),
+                                                 name="run_timer", daemon=True)
+            self.tracking_thread = threading.Thread(target=self.track_eyes, args=(token,),
+                                                    name="track_eyes", daemon=True)
             
             self.timer_thread.start()
             self.tracking_thread.start()
@@ -1359,23 +6628,35 @@ class EyeTrackerApp(QMainWindow):
     def pause_timer(self):
         """Пауза таймера"""
         if self.timer_paused:
-            # Возобновляем
-            self.timer_paused = False
+            # Возобновляем - поток отслеживания просыпается сразу
+            self.session.set_paused(False)
+            self.resume_event.set()
+            if self.journal is not None:
+                self.journal.append('resume')
             self.pause_btn.setText("⏸️ Пауза")
             self.status_bar.showMessage("Таймер возобновлен")
             self.status_label.setText("▶️ Отслеживание возобновлено")
         else:
-            # Ставим на паузу
-            self.timer_paused = True
+            # Ставим на паузу - камера остается открытой в режиме поддержки
+            self.session.set_paused(True)
+            self.resume_event.clear()
+            if self.journal is not None:
+                self.journal.append('pause')
             self.pause_btn.setText("▶️ Продолжить")
             self.status_bar.showMessage("Таймер на паузе")
             self.status_label.setText("⏸️ Отслеживание на паузе")
     
-    def stop_timer(self):
-        """Остановка таймера"""
-        self.is_tracking = False
-        self.timer_running = False
-        self.timer_paused = False
+    def stop_timer(self, deadline=None):
+        """Остановка таймера
+        
+        Потоки сессии получают отмену и ждутся не дольше SHUTDOWN_TIMEOUT
+        (или до deadline); камера iVCam освобождается уже после них.
+        """
+        self.session.end()
+        self.resume_event.set()
+        if deadline is None:
+            deadline = time.time() + self.SHUTDOWN_TIMEOUT
+        self.join_session_threads(deadline)
         
         # Останавливаем iVCam
         self.ivcam_manager.release()
@@ -1393,37 +6674,216 @@ class EyeTrackerApp(QMainWindow):
         self.alarm_status_label.setText("🔇 Сигнал: Выключен")
         self.alarm_status_label.setStyleSheet("color: #27ae60;")
         
-        # Останавливаем звук
-        self.alarm_playing = False
+        # Потоки сессии уже завершены - последний замер затрат
+        if self.resource_sampler is not None:
+            self.resource_sampler.stop()
+            self.last_resources = self.resource_sampler.summary()
         
         # Обновляем статистику
         if self.session_start_time:
-            session_duration = time.time() - self.session_start_time
+            session_duration = self.clock.time() - self.session_start_time
+            self.total_session_time = session_duration
             focus_percentage = (self.focus_time / session_duration * 100) if session_duration > 0 else 0
             self.stats_label.setText(
                 f"Сессия: {int(session_duration/60)} минут\n"
                 f"Фокус: {focus_percentage:.1f}%\n"
                 f"Отвлечений: {self.distraction_count}"
+                + self.format_blink_stats()
+                + self.format_resource_stats()
+                + self.format_person_stats()
             )
+            
+            if self.session_id:
+                self.finish_session(session_duration, focus_percentage)
+        self.resource_sampler = None
+        if self.journal is not None:
+            # Сессия без сводки (например, воспроизведение записи)
+            self.journal.remove()
+            self.journal = None
         
         self.status_bar.showMessage("Таймер остановлен", 3000)
     
-    def run_timer(self):
+    def join_session_threads(self, deadline):
+        """Дождаться потоков таймера и отслеживания (не дольше deadline)"""
+        for thread in (self.tracking_thread, self.timer_thread):
+            if thread is None or thread is threading.current_thread():
+                continue
+            thread.join(max(0.0, deadline - time.time()))
+            if thread.is_alive():
+                # Поток отменен: счетчики и статистику новой сессии он не
+                # тронет, а камеры освободит только свои - просто не ждем его
+                print(f"⚠️ Поток {thread.name} не завершился за отведенное время")
+    
+    def build_session_summary(self, session_duration, focus_percentage):
+        """Сводка сессии для истории и выгрузки"""
+        return {
+            'session_id': self.session_id,
+            'start': datetime.fromtimestamp(self.session_start_time).isoformat(timespec='seconds'),
+            'duration': round(session_duration, 1),
+            'focus_time': round(self.focus_time, 1),
+            'focus_percentage': round(focus_percentage, 1),
+            'distraction_count': self.distraction_count,
+            'unknown_time': round(self.unknown_time, 1),
+            'analyzed_frames': self.session.analyzed_frames,
+            'input_active_time': round(self.session.input_active_time, 1),
+            'owner_only': self.owner_only,
+            'blinks': self.blink_estimator.blinks,
+            'drowsy_events': self.blink_estimator.long_closures,
+            'camera': "ivcam" if self.use_ivcam else "pc",
+            'profile': self.performance_profile.key,
+            'timeline': [(round(t - self.session_start_time, 2), state) for t, state in self.focus_timeline],
+            'people': [p.to_dict() for p in self.person_stats.values()],
+            'resources': self.last_resources if self.resource_sampler is not None else None,
+        }
+    
+    def finish_session(self, session_duration, focus_percentage):
+        """Сохранение сводки сессии и постановка ее в очередь на выгрузку"""
+        summary = self.build_session_summary(session_duration, focus_percentage)
+        self.session_id = None
+        if self.profiler is not None:
+            self.profiler.stop()
+        journal, self.journal = self.journal, None
+        if journal is not None:
+            journal.close()
+        
+        try:
+            os.makedirs(SESSIONS_DIR, exist_ok=True)
+            if self.profiler is not None:
+                # Профиль лежит рядом со сводкой: <id>.folded
+                profile_path = os.path.join(SESSIONS_DIR, f"{summary['session_id']}.folded")
+                self.profiler.write_collapsed(profile_path)
+                summary['profiler'] = {
+                    'file': os.path.basename(profile_path),
+                    'samples': self.profiler.samples,
+                    'interval': self.profiler.interval,
+                }
+                print(f"🔬 Профиль сессии сохранен: {profile_path}")
+            frames_path = os.path.join(SESSIONS_DIR, f"{summary['session_id']}.frames")
+            if os.path.exists(frames_path):
+                summary['frames'] = os.path.basename(frames_path)
+            write_json_atomic(os.path.join(SESSIONS_DIR, f"{summary['session_id']}.json"), summary)
+            # Сводка на диске - журнал больше не нужен (иначе его закроет recover)
+            if journal is not None:
+                journal.remove()
+        except OSError as e:
+            print(f"✗ Не удалось сохранить статистику сессии: {e}")
+        finally:
+            self.profiler = None
+        
+        if self.stats_uploader is not None:
+            self.stats_uploader.enqueue("session_summary", summary)
+        
+        # Итоги обновляются только этой сессией
+        try:
+            if self.rollups.add_session(summary):
+                self.rollups.save()
+        except (OSError, ValueError) as e:
+            print(f"✗ Не удалось обновить итоги фокуса: {e}")
+    
+    def journal_snapshot(self):
+        """Счетчики сессии для контрольной точки журнала (в потоке журнала)"""
+        return {
+            'focus_time': round(self.focus_time, 2),
+            'unknown_time': round(self.unknown_time, 2),
+            'distraction_count': self.distraction_count,
+            'analyzed_frames': self.session.analyzed_frames,
+            'input_active_time': round(self.session.input_active_time, 2),
+            'paused': self.timer_paused,
+        }
+    
+    def recover_sessions(self):
+        """Сводки сессий, прерванных падением или отключением питания"""
+        for summary in SessionJournal.recover():
+            print(f"🩹 Восстановлена прерванная сессия {summary['start']}: "
+                  f"фокус {summary['focus_time'] / 60:.1f} мин из {summary['duration'] / 60:.1f}, "
+                  f"отвлечений {summary['distraction_count']}")
+            if self.stats_uploader is not None:
+                self.stats_uploader.enqueue("session_summary", summary)
+    
+    def sync_rollups(self):
+        """Досчет итогов по сводкам, которых в них еще нет (в фоне)"""
+        try:
+            added = self.rollups.sync()
+            if added:
+                self.rollups.save()
+                print(f"📅 Итоги фокуса дополнены сессиями: {added}")
+        except OSError as e:
+            print(f"✗ Не удалось обновить итоги фокуса: {e}")
+    
+    def show_history(self):
+        """Окно истории фокуса по готовым итогам"""
+        dialog = QDialog(self)
+        dialog.setWindowTitle("📅 История фокуса")
+        dialog.resize(640, 520)
+        layout = QVBoxLayout(dialog)
+        
+        level_combo = QComboBox()
+        level_combo.addItem("По часам (последние 48 часов)", ('hour', 48))
+        level_combo.addItem("По дням (последние 30 дней)", ('day', 30))
+        level_combo.addItem("По неделям (последние 26 недель)", ('week', 26))
+        level_combo.setCurrentIndex(1)
+        layout.addWidget(level_combo)
+        
+        table = QTableWidget(0, 6)
+        table.setHorizontalHeaderLabels(["Период", "Фокус", "Сессий", "Отвлечений", "Лучшая серия", ""])
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(table)
+        
+        total_label = QLabel()
+        layout.addWidget(total_label)
+        
+        def minutes(seconds):
+            if seconds >= 3600:
+                return f"{int(seconds // 3600)} ч {int(seconds % 3600 // 60):02d} мин"
+            return f"{int(seconds // 60)} мин"
+        
+        def render():
+            level, count = level_combo.currentData()
+            rows = list(reversed(self.rollups.series(level, count)))
+            peak = max([bucket['focus_seconds'] for _, bucket in rows] + [1])
+            table.setRowCount(len(rows))
+            for row, (key, bucket) in enumerate(rows):
+                share = bucket['focus_seconds'] / bucket['session_seconds'] * 100 if bucket['session_seconds'] else 0
+                bar = "█" * int(round(20 * bucket['focus_seconds'] / peak))
+                focus = f"{minutes(bucket['focus_seconds'])} ({share:.0f}%)" if bucket['session_seconds'] else "—"
+                streak = minutes(bucket['longest_streak']) if bucket['longest_streak'] else "—"
+                values = [key, focus, str(bucket['sessions']), str(bucket['distractions']), streak, bar]
+                for column, value in enumerate(values):
+                    table.setItem(row, column, QTableWidgetItem(value))
+            table.resizeColumnsToContents()
+            focus = sum(bucket['focus_seconds'] for _, bucket in rows)
+            sessions = sum(bucket['sessions'] for _, bucket in rows)
+            total_label.setText(f"Всего за период: фокус {minutes(focus)}, сессий {sessions}")
+        
+        level_combo.currentIndexChanged.connect(lambda _: render())
+        render()
+        dialog.exec_()
+    
+    def run_timer(self, token):
         """Выполнение таймера в отдельном потоке"""
         try:
-            start_time = time.time()
+            start_time = self.clock.time()
             end_time = start_time + self.timer_seconds
-            last_update = time.time()
+            last_update = self.clock.time()
+            last_check = start_time
             
-            while self.timer_running and time.time() < end_time:
+            while not token.cancelled and self.clock.time() < end_time:
+                # На паузе таймер стоит - отодвигаем время окончания
+                check_time = self.clock.time()
+                if self.timer_paused:
+                    end_time += check_time - last_check
+                last_check = check_time
+                
                 if not self.timer_paused:
-                    current_time = time.time()
+                    current_time = self.clock.time()
                     remaining = int(end_time - current_time)
                     minutes = remaining // 60
                     seconds = remaining % 60
                     
                     # Обновляем каждую секунду или чаще
-                    if current_time - last_update >= 0.1:  # Обновляем каждые 100 мс
+                    if current_time - last_update >= 0.1 * self.clock.speed:  # Обновляем каждые 100 мс
                         # Обновляем таймер
                         self.update_timer_signal.emit(f"{minutes:02d}:{seconds:02d}")
                         
@@ -1433,9 +6893,9 @@ class EyeTrackerApp(QMainWindow):
                         
                         last_update = current_time
                 
-                time.sleep(0.05)  # Чаще проверяем состояние
+                self.clock.sleep(0.05 * self.clock.speed)  # Чаще проверяем состояние
             
-            if self.timer_running:
+            if not token.cancelled:
                 self.timer_finished_signal.emit()
                 
         except Exception as e:
@@ -1451,9 +6911,11 @@ class EyeTrackerApp(QMainWindow):
         
         # Воспроизводим звук завершения
         self.play_completion_sound()
+        if not self.interactive:
+            return
         
         # Показываем статистику
-        session_duration = time.time() - self.session_start_time if self.session_start_time else 0
+        session_duration = self.total_session_time
         focus_percentage = (self.focus_time / session_duration * 100) if session_duration > 0 else 0
         
         QMessageBox.information(self, "Время вышло!",
@@ -1464,44 +6926,202 @@ class EyeTrackerApp(QMainWindow):
                               f"• Отвлечений: {self.distraction_count}\n\n"
                               f"Можно отдохнуть 5-10 минут.")
     
-    def track_eyes(self):
-        """Отслеживание глаз в отдельном потоке"""
+    def track_eyes(self, token):
+        """Отслеживание глаз в отдельном потоке (до отмены token)"""
         cap = None
+        capture = None
+        mjpeg = None
+        replay = None
+        recorder = None
+        # Журнал этой сессии (после отмены поток в новый журнал не пишет)
+        journal = self.journal
+        # Статистика, конвейер и камера iVCam этой сессии: поток, не успевший
+        # завершиться к концу ожидания в stop_timer, трогает только их, а не
+        # объекты следующей сессии
+        face_tracker = self.face_tracker
+        blink_estimator = self.blink_estimator
+        person_stats = self.person_stats
+        focus_timeline = self.focus_timeline
+        ivcam_cap = self.ivcam_manager.cap
+        fusion = None
         
         try:
             if self.use_ivcam:
                 # Используем iVCam
                 print("Начато отслеживание через iVCam...")
+            elif self.process_capture:
+                # Захват и анализ в дочернем процессе
+                capture = CaptureProcess(self.pc_camera_index)
+                if not capture.start(self.capture_settings(self.performance_profile, self.detection_profile)):
+                    self.update_status_signal.emit("error", capture.error or "Не удалось открыть камеру ПК")
+                    return
+                print("Начато отслеживание через камеру ПК (отдельный процесс)...")
             else:
-                # Используем встроенную камеру
-                text = self.camera_combo.currentText()
-                camera_index = 0
-                
-                if text != "Автоопределение":
-                    match = re.search(r'Камера #(\d+)', text)
-                    if match:
-                        camera_index = int(match.group(1))
-                    else:
-                        camera_index = self.camera_combo.currentIndex()
-                
-                cap = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
+                # Используем встроенную камеру, уже открытую в start_timer
+                cap, self.pc_camera = self.pc_camera, None
                 
-                if not cap.isOpened():
+                if cap is None or not cap.isOpened():
                     self.update_status_signal.emit("error", "Не удалось открыть камеру ПК")
                     return
                 
-                # Устанавливаем разрешение
-                cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+                # Разрешение устанавливается из профиля производительности
                 print("Начато отслеживание через камеру ПК...")
+                
+                # Повтор записи: время и кадры берутся из файла
+                source = getattr(getattr(cap, 'device', None), 'cap', None)
+                if isinstance(source, ReplayVideoSource):
+                    replay = source
+            
+            if self.fusion_mode:
+                fusion = self.start_fusion(cap)
+                print("Начато совмещенное отслеживание (ПК + iVCam)...")
+            elif capture is None and replay is None and os.environ.get("ANTIPROCRASTINATOR_MJPEG", "1") != "0":
+                # Сжатые кадры: серый в уменьшенном масштабе, цвет только для превью
+                device = ivcam_cap if self.use_ivcam else cap
+                if device is not None:
+                    mjpeg = MjpegReader(device, mirror=not self.use_ivcam)
+                    if mjpeg.enable():
+                        print("✓ Камера отдает MJPEG - декодирование в уменьшенном масштабе")
+                    else:
+                        mjpeg = None
+            
+            if self.record_frames and self.session_id:
+                if fusion is not None or capture is not None:
+                    print("⚠️ Запись кадров недоступна в совмещенном режиме и при анализе в отдельном процессе")
+                else:
+                    recorder = FrameRecorder(os.path.join(SESSIONS_DIR, f"{self.session_id}.frames"), {
+                        'session_id': self.session_id,
+                        'start': self.session_start_time,
+                        'speed': self.clock.speed,
+                        'camera': "ivcam" if self.use_ivcam else "pc",
+                        'profile': self.performance_profile.key,
+                        'detection': self.detection_profile.to_dict(),
+                        'owner_only': self.owner_only,
+                    })
+                    print(f"🎞️ Запись кадров: {recorder.path}")
             
-            frame_counter = 0
-            no_face_frames = 0
-            last_face_time = time.time()
+            absent_since = None
+            distraction_counted = False
+            # Первый кадр после паузы (отмечается в записи)
+            resumed = False
+            seen_face = None
+            seen_eyes_hidden = False
+            face_lost_at = self.clock.time()
+            applied_profile = None
+            applied_detection = None
+            applied_hz = None
+            result = None
+            last_tick = 0
+            last_detection = 0
+            last_preview = 0
+            capture_paused = False
             
-            while self.is_tracking and not self.timer_paused:
+            while not token.cancelled:
+                if fusion is not None:
+                    # Источники совмещенного режима сами держат камеры на паузе
+                    fusion.set_paused(self.timer_paused)
+                if capture is not None and self.timer_paused != capture_paused:
+                    capture.set_paused(self.timer_paused)
+                    capture_paused = self.timer_paused
+                
+                if self.timer_paused:
+                    # Пауза: раз в секунду забираем кадр без анализа, чтобы
+                    # устройство не засыпало, и ждем продолжения
+                    if fusion is not None or capture is not None:
+                        pass
+                    elif self.use_ivcam:
+                        self.ivcam_manager.keep_alive()
+                    else:
+                        cap.grab()
+                    self.resume_event.wait(self.PAUSE_KEEPALIVE_INTERVAL)
+                    # Время паузы не считается ни фокусом, ни отсутствием, а
+                    # отсутствие после нее - новый эпизод со своим сигналом
+                    absent_since = None
+                    distraction_counted = False
+                    last_detection = 0
+                    last_tick = 0
+                    resumed = True
+                    continue
+                
+                profile = self.performance_profile
+                detection = self.detection_profile
+                if profile is not applied_profile or detection is not applied_detection:
+                    # Применяем профили на лету, не переоткрывая камеру
+                    if profile is not applied_profile:
+                        width, height = profile.capture_size
+                        if self.use_ivcam or fusion is not None:
+                            self.ivcam_manager.set_resolution(width, height)
+                        if cap is not None:
+                            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+                            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+                        if mjpeg is not None:
+                            mjpeg.update_reduction()
+                    # Профиль детектора ограничивает масштаб и частоту анализа
+                    detection_hz = min(profile.detection_hz, detection.detection_hz)
+                    analyzers = [self.face_analyzer]
+                    if fusion is not None:
+                        analyzers = [w.analyzer for w in fusion.workers]
+                        fusion.set_max_rate(detection_hz)
+                    for analyzer in analyzers:
+                        detection.apply(analyzer)
+                        analyzer.detection_scale = min(profile.detection_scale, detection.detection_scale)
+                    if mjpeg is not None:
+                        # Кадр уже уменьшен при декодировании
+                        self.face_analyzer.detection_scale = min(
+                            1.0, self.face_analyzer.detection_scale * mjpeg.reduction)
+                    if capture is not None:
+                        capture.apply_settings(self.capture_settings(profile, detection))
+                    applied_profile = profile
+                    applied_detection = detection
+                    applied_hz = detection_hz
+                
+                # Пока пользователь печатает или двигает мышь, он почти наверняка
+                # на месте - камера лишь изредка подтверждает присутствие. После
+                # отсутствия и в паузах ввода - снова полная частота
+                analysis_hz = detection_hz
+                input_active = (self.input_aware and absent_since is None
+                                and self.input_monitor.active())
+                if input_active:
+                    analysis_hz = min(detection_hz, self.INPUT_VERIFY_HZ)
+                if analysis_hz != applied_hz:
+                    if fusion is not None:
+                        fusion.set_max_rate(analysis_hz)
+                    if capture is not None:
+                        capture.apply_settings(self.capture_settings(profile, detection, analysis_hz))
+                    applied_hz = analysis_hz
+                
+                # Ждем следующего такта (анализ или только обновление превью)
+                delay = last_tick + 1.0 / max(detection_hz, profile.preview_fps) - self.clock.time()
+                if delay > 0:
+                    self.clock.sleep(delay)
+                last_tick = self.clock.time()
+                
                 # Получаем кадр
-                if self.use_ivcam:
+                if fusion is not None:
+                    # Кадр основной камеры и уже объединенный результат
+                    frame, fused = fusion.fuse(time.time())
+                    if frame is None:
+                        time.sleep(0.05)
+                        continue
+                    frame = frame.copy()
+                elif capture is not None:
+                    # Кадр (уже отраженный) и результат из общей памяти
+                    frame, fresh = capture.poll()
+                    if frame is None:
+                        if not capture.alive():
+                            self.update_status_signal.emit("error", capture.error or "Процесс захвата завершился")
+                            break
+                        time.sleep(0.01)
+                        continue
+                elif mjpeg is not None:
+                    # Сжатый кадр - декодируется ниже, по необходимости
+                    frame = mjpeg.read()
+                    if frame is None:
+                        if not self.use_ivcam:
+                            break
+                        time.sleep(0.05)
+                        continue
+                elif self.use_ivcam:
                     frame = self.ivcam_manager.get_frame()
                     if frame is None:
                         time.sleep(0.05)
@@ -1511,80 +7131,185 @@ class EyeTrackerApp(QMainWindow):
                     if not ret:
                         break
                 
-                frame_counter += 1
-                if frame_counter % 2 != 0:  # Обрабатываем каждый второй кадр
-                    continue
-                
                 # Зеркальное отражение (только для фронтальной камеры)
-                if not self.use_ivcam:
+                if not self.use_ivcam and fusion is None and capture is None and mjpeg is None:
                     frame = cv2.flip(frame, 1)
                 
-                # Преобразуем в оттенки серого
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                if replay is not None and replay.resumed:
+                    # В исходной сессии перед этим кадром была пауза
+                    absent_since = None
+                    last_detection = 0
                 
-                face_detected = False
-                eyes_detected = False
+                now = self.clock.time()
+                if capture is not None:
+                    # Частоту анализа держит дочерний процесс
+                    due = fresh is not None
+                elif replay is not None:
+                    # В записи только проанализированные кадры
+                    due = True
+                else:
+                    due = now - last_detection >= 1.0 / analysis_hz
+                if not due:
+                    # Кадр только для превью - с рамками последнего анализа
+                    if result is not None and now - last_preview >= 1.0 / profile.preview_fps:
+                        if mjpeg is not None:
+                            frame = frame.color()
+                        self.update_camera_preview(frame, result)
+                        last_preview = now
+                    continue
                 
-                # Детекция лиц
-                if self.face_cascade is not None:
-                    faces = self.face_cascade.detectMultiScale(
-                        gray,
-                        scaleFactor=1.1,
-                        minNeighbors=5,
-                        minSize=(50, 50)
-                    )
+                # Разрыв больше секунды реального времени за фокус не считаем
+                frame_dt = min(now - last_detection, self.clock.speed) if last_detection else 0
+                last_detection = now
+                self.session.count_analysis(token, frame_dt if input_active else 0.0)
+                gray = None
+                
+                if fusion is not None:
+                    # Детекция уже выполнена потоками источников
+                    result = fused if fused is not None else DetectionResult(now)
+                elif capture is not None:
+                    result = fresh
+                else:
+                    # Преобразуем в оттенки серого
+                    if mjpeg is not None:
+                        gray = frame.gray()
+                    else:
+                        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    self.last_gray = gray
                     
-                    if len(faces) > 0:
-                        face_detected = True
-                        no_face_frames = 0
-                        last_face_time = time.time()
-                        
-                        # Обновляем статистику фокуса
-                        self.focus_time += 0.05  # Примерно время между кадрами
-                        
-                        # Детекция глаз
-                        for (x, y, w, h) in faces:
-                            roi_gray = gray[y:y+h, x:x+w]
-                            if self.eye_cascade is not None:
-                                eyes = self.eye_cascade.detectMultiScale(roi_gray)
-                                if len(eyes) >= 1:  # Хотя бы один глаз
-                                    eyes_detected = True
-                                    break
+                    # Детекция всех лиц и глаз в кадре
+                    if replay is not None:
+                        self.face_analyzer.detection_scale = replay.scale
+                    result = self.face_analyzer.analyze(gray, now)
+                    if replay is not None:
+                        replay.verify(result)
+                    # Кадр после остановки в сессию уже не попадет - не пишем и его
+                    if recorder is not None and not token.cancelled:
+                        try:
+                            recorder.append(now, gray, result, self.face_analyzer.detection_scale, resumed)
+                        except OSError as e:
+                            print(f"✗ Запись кадров остановлена: {e}")
+                            recorder.close(now)
+                            recorder = None
+                resumed = False
+                owners = None
+                if not result.unknown:
+                    result.tracks = face_tracker.update(result.faces, result.eyes, now)
+                    self.update_person_stats(person_stats, result.tracks, now)
+                    if self.owner_only and fusion is None:
+                        owners = self.filter_owner(result, frame, gray)
+                
+                face_detected = result.face_detected
+                eyes_detected = result.eyes_detected
+                # В кадре только посторонние
+                stranger = owners is not None and not owners
+                
+                # Моргания и долгие закрытия глаз - по уже найденным рамкам
+                if gray is not None and not result.unknown:
+                    if owners:
+                        main = max(owners, key=lambda track: track.box[2] * track.box[3])
+                        blink_estimator.update(gray, main.box, main.eyes, now)
+                    elif result.faces and owners is None:
+                        main = max(range(len(result.faces)), key=lambda i: result.faces[i][2] * result.faces[i][3])
+                        blink_estimator.update(gray, result.faces[main], result.eyes[main], now)
                     else:
-                        no_face_frames += 1
+                        blink_estimator.update(gray, None, None, now)
+                drowsy = blink_estimator.drowsy
+                
+                # В строгом режиме лицо без видимых глаз не считается присутствием,
+                # долго закрытые глаза - тоже отвлечение
+                present = face_detected and (eyes_detected or not detection.require_eyes) and not drowsy
+                
+                if result.unknown:
+                    # Непригодный кадр не считается ни фокусом, ни отсутствием:
+                    # сдвигаем начало отсутствия, чтобы не было ложной тревоги
+                    self.session.add_unknown(token, frame_dt)
+                    if absent_since is not None:
+                        absent_since += frame_dt
+                elif present:
+                    absent_since = None
+                    distraction_counted = False
+                    
+                    # Обновляем статистику фокуса
+                    self.session.add_focus(token, frame_dt)
+                elif absent_since is None:
+                    absent_since = now
+                
+                # Хронология состояний фокуса (только моменты смены)
+                if result.unknown:
+                    focus_state = "unknown"
+                elif drowsy:
+                    focus_state = "drowsy"
+                elif face_detected:
+                    focus_state = "focused" if eyes_detected else "eyes_hidden"
+                else:
+                    focus_state = "away"
+                if not focus_timeline or focus_timeline[-1][1] != focus_state:
+                    focus_timeline.append((now, focus_state))
+                    if journal is not None:
+                        journal.append('state', now, state=focus_state)
+                
+                # События шины - только на смене состояния
+                if not result.unknown:
+                    if seen_face is not None and face_detected != seen_face:
+                        if face_detected:
+                            self.event_bus.publish(FaceReturned(now, now - face_lost_at))
+                        else:
+                            face_lost_at = now
+                            self.event_bus.publish(FaceLost(now))
+                    eyes_hidden = face_detected and not eyes_detected
+                    if eyes_hidden and not seen_eyes_hidden:
+                        self.event_bus.publish(EyesHidden(now))
+                    seen_face = face_detected
+                    seen_eyes_hidden = eyes_hidden
                 
                 # Определяем статус
-                if face_detected:
+                if result.unknown:
+                    status = f"Плохое изображение ({result.quality.describe()})"
+                    status_color = "orange"
+                elif present:
                     if eyes_detected:
                         status = "Смотрим на экран"
                         status_color = "green"
-                        if self.alarm_playing:
-                            self.alarm_playing = False
                     else:
                         status = "Глаза не видны"
                         status_color = "orange"
+                    if self.alarm_playing:
+                        self.session.stop_alarm()
                 else:
-                    if no_face_frames > 15:  # Если лицо не найдено 15 кадров подряд
-                        status = "Отвернулись от экрана"
+                    # Если пользователь отсутствует дольше порога из профиля
+                    if now - absent_since > detection.absence_seconds:
+                        if drowsy:
+                            status = "Глаза закрыты - не засыпайте!"
+                        else:
+                            status = "Глаза не видны" if face_detected else "Отвернулись от экрана"
                         status_color = "red"
                         
-                        # Проверяем, прошло ли достаточно времени с последнего отвлечения
-                        if time.time() - last_face_time > 3:  # 3 секунды
-                            self.distraction_count += 1
-                            last_face_time = time.time()
-                            
-                        if not self.alarm_playing and self.enable_sound_checkbox.isChecked():
-                            self.alarm_playing = True
-                            self.play_alarm()
+                        # Одно отвлечение на каждый эпизод отсутствия
+                        # Сигнал включает подписчик интерфейса
+                        if not distraction_counted:
+                            distraction_counted = True
+                            count = self.session.add_distraction(token)
+                            if count is not None:
+                                reason = "drowsy" if drowsy else ("eyes_hidden" if face_detected else "away")
+                                self.event_bus.publish(Distraction(now, count, reason))
+                                if journal is not None:
+                                    journal.append('distraction', now, count=count, reason=reason)
+                    elif stranger:
+                        status = "В кадре не вы"
+                        status_color = "orange"
                     else:
-                        status = "Лицо не обнаружено"
-                        status_color = "red"
+                        status = "Глаза не видны" if face_detected else "Лицо не обнаружено"
+                        status_color = "orange" if face_detected else "red"
                 
                 # Отправляем статус в GUI
-                self.update_face_status_signal.emit(
-                    "😀 Лицо: Обнаружено" if face_detected else "😐 Лицо: Не обнаружено",
-                    "green" if face_detected else "red"
-                )
+                if result.unknown:
+                    self.update_face_status_signal.emit("❔ Лицо: Нет данных", "orange")
+                else:
+                    self.update_face_status_signal.emit(
+                        "😀 Лицо: Обнаружено" if face_detected else "😐 Лицо: Не обнаружено",
+                        "green" if face_detected else "red"
+                    )
                 
                 self.update_status_signal.emit(
                     f"👁️ {status}",
@@ -1593,44 +7318,237 @@ class EyeTrackerApp(QMainWindow):
                 
                 # Обновляем статистику в реальном времени
                 if self.session_start_time:
-                    session_duration = time.time() - self.session_start_time
+                    session_duration = now - self.session_start_time
                     focus_percentage = (self.focus_time / session_duration * 100) if session_duration > 0 else 0
-                    QTimer.singleShot(0, lambda: self.stats_label.setText(
+                    stats_text = (
                         f"Сессия: {int(session_duration/60)} мин\n"
                         f"Фокус: {focus_percentage:.1f}%\n"
                         f"Отвлечений: {self.distraction_count}"
-                    ))
+                    ) + self.format_blink_stats() + self.format_resource_stats() + self.format_person_stats()
+                    self.event_bus.publish(SessionTick(now, session_duration, self.focus_time,
+                                                       self.distraction_count, stats_text))
                 
                 # Обновляем предпросмотр камеры
-                self.update_camera_preview(frame, face_detected, eyes_detected)
-                
-                time.sleep(0.05)  # Небольшая задержка
+                if now - last_preview >= 1.0 / profile.preview_fps:
+                    if mjpeg is not None:
+                        frame = frame.color()
+                    self.update_camera_preview(frame, result)
+                    last_preview = now
                 
         except Exception as e:
             print(f"Ошибка в отслеживании глаз: {e}")
         finally:
+            if recorder is not None:
+                try:
+                    recorder.close(self.clock.time())
+                    print(f"🎞️ Записано кадров: {recorder.count}")
+                except OSError as e:
+                    print(f"✗ Не удалось закрыть запись кадров: {e}")
+            if mjpeg is not None:
+                # Камера общая - возвращаем обычный режим для теста и превью
+                mjpeg.disable()
+            if capture is not None:
+                capture.stop()
+            if fusion is not None:
+                fusion.stop()
+                if self.fusion is fusion:
+                    self.fusion = None
             if cap:
                 cap.release()
-            if self.use_ivcam:
-                self.ivcam_manager.release()
+            if ivcam_cap is not None:
+                self.ivcam_manager.release(ivcam_cap)
+    
+    def capture_settings(self, profile, detection, detection_hz=None):
+        """Настройки захвата и детектора для дочернего процесса"""
+        if detection_hz is None:
+            detection_hz = min(profile.detection_hz, detection.detection_hz)
+        return {
+            'capture_size': profile.capture_size,
+            'scale_factor': detection.scale_factor,
+            'min_neighbors': detection.min_neighbors,
+            'min_size': tuple(detection.min_size),
+            'detection_scale': min(profile.detection_scale, detection.detection_scale),
+            'detection_hz': detection_hz,
+            'preview_fps': profile.preview_fps,
+        }
+    
+    def start_fusion(self, cap):
+        """Запуск потоков обеих камер для совмещенного режима"""
+        def read_pc():
+            ret, frame = cap.read()
+            return frame if ret else None
+        
+        # У каждого потока свои экземпляры каскадов; владелец опознается
+        # в кадре каждой камеры до голосования
+        hz = self.performance_profile.detection_hz
+        verifier = self.owner_verifier if self.owner_only else None
+        workers = [
+            SourceWorker("pc", read_pc, self.detector_pool.new_analyzer(), hz, mirror=True,
+                         owner_verifier=verifier),
+            SourceWorker("ivcam", self.ivcam_manager.get_frame, self.detector_pool.new_analyzer(), hz,
+                         owner_verifier=verifier),
+        ]
+        self.fusion = FusionController(workers, self.fusion_cpu_budget)
+        self.fusion.start()
+        return self.fusion
+    
+    def filter_owner(self, result, frame, gray):
+        """Присутствие только по трекам владельца; возвращает видимые треки
+        владельца или None, если лиц в кадре нет
+        
+        Новый трек проверяется по образцу на первых кадрах, дальше решение
+        берется из трека. В режиме объединения не вызывается: владельца
+        отбирает каждый источник до голосования (SourceWorker.filter_owner).
+        """
+        visible = [track for track in result.tracks if track.visible]
+        if not visible:
+            return None
+        for track in visible:
+            if track.owner is None:
+                if gray is None:
+                    gray = frame.gray() if isinstance(frame, JpegFrame) else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                self.owner_verifier.verify(track, gray)
+        owners = [track for track in visible if track.owner]
+        result.fused_face = bool(owners)
+        result.fused_eyes = any(track.eyes for track in owners)
+        return owners
+    
+    def enroll_owner(self):
+        """Запись образца лица владельца с камеры ПК"""
+        if self.is_tracking:
+            QMessageBox.information(self, "Образец лица", "Остановите сессию, чтобы записать образец лица")
+            return
+        
+        text = self.camera_combo.currentText()
+        camera_index = 0
+        if text != "Автоопределение":
+            match = re.search(r'Камера #(\d+)', text)
+            if match:
+                camera_index = int(match.group(1))
+            else:
+                camera_index = self.camera_combo.currentIndex()
+        
+        cap = self.camera_pool.acquire(camera_index)
+        if cap is None:
+            QMessageBox.warning(self, "Ошибка", "Не удалось открыть камеру")
+            return
+        
+        # Несколько секунд кадров с единственным лицом в кадре
+        collected = []
+        deadline = time.time() + 5
+        try:
+            while len(collected) < 15 and time.time() < deadline:
+                self.status_bar.showMessage(f"🔐 Смотрите в камеру... образцов: {len(collected)}")
+                QApplication.processEvents()
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                gray = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2GRAY)
+                faces = self.face_analyzer.detect_faces(gray)
+                if len(faces) == 1:
+                    collected.append((gray, faces[0]))
+                time.sleep(0.2)
+        finally:
+            cap.release()
+        
+        verifier = OwnerVerifier()
+        try:
+            verifier.enroll(collected)
+            verifier.save()
+        except (ValueError, OSError) as e:
+            self.status_bar.clearMessage()
+            QMessageBox.warning(self, "Образец лица", f"Образец не записан: {e}\n"
+                                                       f"В кадре должно быть только ваше лицо")
+            return
+        
+        self.owner_verifier = verifier
+        self.owner_only_checkbox.setEnabled(True)
+        self.owner_only_checkbox.setChecked(True)
+        self.status_bar.showMessage(f"🔐 Образец лица записан ({len(collected)} кадров)", 5000)
+    
+    def update_person_stats(self, person_stats, tracks, timestamp):
+        """Обновление статистики фокуса по каждому человеку (person_stats - сессии)"""
+        for track in tracks:
+            stats = person_stats.get(track.track_id)
+            if stats is None:
+                stats = PersonStats(track.track_id, timestamp)
+                person_stats[track.track_id] = stats
+            stats.update(track, timestamp)
+    
+    def format_blink_stats(self):
+        """Текст статистики морганий (когда оценка уже откалибрована)"""
+        blinks = self.blink_estimator
+        if blinks.baseline is None:
+            return ""
+        text = f"\nМоргания: {blinks.blink_rate():.0f}/мин"
+        if blinks.long_closures:
+            text += f", сонливость: {blinks.long_closures}"
+        return text
+    
+    def format_resource_stats(self):
+        """Текст затрат процесса на сессию (по последнему замеру)"""
+        sampler = self.resource_sampler
+        if sampler is None:
+            return ""
+        return sampler.describe()
+    
+    def format_person_stats(self, min_seen=5):
+        """Текст статистики по людям (если в кадре больше одного человека)"""
+        people = [p for p in self.person_stats.values() if p.seen_time >= min_seen]
+        if len(people) < 2:
+            return ""
+        
+        text = "\n\nПо людям:"
+        for p in sorted(people, key=lambda p: p.track_id):
+            text += (f"\n#{p.track_id}: фокус {p.focus_time/60:.1f} мин, "
+                     f"отвлечений {p.distraction_count}")
+        return text
     
-    def update_camera_preview(self, frame, face_detected, eyes_detected):
+    def toggle_preview_server(self, enabled):
+        """Запуск и остановка трансляции превью"""
+        if not enabled:
+            if self.preview_server is not None:
+                self.preview_server.stop()
+                print(f"📺 Трансляция превью остановлена ({self.preview_server.describe()})")
+                self.preview_server = None
+            return
+        
+        port = int(os.environ.get("ANTIPROCRASTINATOR_PREVIEW_PORT", PreviewServer.DEFAULT_PORT))
+        try:
+            server = PreviewServer(port=port)
+        except OSError as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось открыть порт {port}:\n{e}")
+            self.preview_checkbox.setChecked(False)
+            return
+        server.start()
+        self.preview_server = server
+        print(f"📺 Трансляция превью: {server.address}/")
+        self.status_bar.showMessage(f"📺 Трансляция превью: {server.address}/", 5000)
+    
+    def stream_focus_event(self, event):
+        """Событие шины - зрителям трансляции (в потоке шины)"""
+        server = self.preview_server
+        if server is not None:
+            server.publish_event(event)
+    
+    def update_camera_preview(self, frame, result):
         """Обновление предпросмотра камеры"""
         try:
-            # Рисуем рамки для отладки
-            if face_detected and self.face_cascade is not None:
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = self.face_cascade.detectMultiScale(gray, 1.1, 5)
-                for (x, y, w, h) in faces:
-                    color = (0, 255, 0) if eyes_detected else (0, 165, 255)  # Зеленый если глаза, оранжевый если нет
-                    cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
-                    
-                    # Детекция глаз внутри лица
-                    roi_gray = gray[y:y+h, x:x+w]
-                    if self.eye_cascade is not None:
-                        eyes = self.eye_cascade.detectMultiScale(roi_gray)
-                        for (ex, ey, ew, eh) in eyes:
-                            cv2.rectangle(frame, (x+ex, y+ey), (x+ex+ew, y+ey+eh), (255, 0, 0), 1)
+            face_detected = result.face_detected
+            eyes_detected = result.eyes_detected
+            
+            # Рисуем рамки уже найденных лиц и глаз (без повторной детекции)
+            for track in result.tracks:
+                if not track.visible:
+                    continue
+                x, y, w, h = track.box
+                color = (0, 255, 0) if track.eyes else (0, 165, 255)  # Зеленый если глаза, оранжевый если нет
+                cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
+                cv2.putText(frame, f"#{track.track_id}", (x, max(15, y - 5)),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+                
+                for (ex, ey, ew, eh) in track.eyes:
+                    cv2.rectangle(frame, (ex, ey), (ex+ew, ey+eh), (255, 0, 0), 1)
             
             # Добавляем текст статуса
             status_text = "✅ В фокусе" if (face_detected and eyes_detected) else "❌ Отвлеклись"
@@ -1640,11 +7558,16 @@ class EyeTrackerApp(QMainWindow):
             
             # Добавляем время
             if self.session_start_time:
-                elapsed = int(time.time() - self.session_start_time)
+                elapsed = int(self.clock.time() - self.session_start_time)
                 time_text = f"Время: {elapsed//60:02d}:{elapsed%60:02d}"
                 cv2.putText(frame, time_text, (10, 60), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
             
+            # Тот же аннотированный кадр - зрителям трансляции
+            server = self.preview_server
+            if server is not None:
+                server.offer(frame)
+            
             # Конвертируем для Qt
             rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             h, w, ch = rgb_image.shape
@@ -1669,6 +7592,21 @@ class EyeTrackerApp(QMainWindow):
         self.face_status_label.setText(text)
         self.face_status_label.setStyleSheet(f"color: {color};")
     
+    def on_focus_event(self, event):
+        """Реакция интерфейса на события шины (в потоке GUI)"""
+        if isinstance(event, SessionTick):
+            if self.is_tracking:
+                self.stats_label.setText(event.text)
+        elif isinstance(event, Distraction):
+            if self.enable_sound_checkbox.isChecked() and self.session.start_alarm():
+                self.play_alarm()
+    
+    def upload_focus_event(self, event):
+        """Подписчик выгрузки: события фокуса уходят на сервер сбора"""
+        payload = event.to_dict()
+        payload['session_id'] = self.session_id
+        self.stats_uploader.enqueue("focus_event", payload)
+    
     def play_alarm(self):
         """Воспроизведение звукового сигнала"""
         if not self.enable_sound_checkbox.isChecked():
@@ -1698,19 +7636,23 @@ class EyeTrackerApp(QMainWindow):
     
     def repeat_alarm(self):
         """Повторение звукового сигнала (winsound)"""
+        token = self.session.token
         while self.alarm_playing and self.is_tracking and not self.timer_paused:
             try:
                 winsound.Beep(1000, 300)
-                time.sleep(1)
+                if token.wait(1):
+                    break
             except:
                 break
     
     def repeat_alarm_pygame(self):
         """Повторение звукового сигнала (pygame)"""
+        token = self.session.token
         while self.alarm_playing and self.is_tracking and not self.timer_paused:
             try:
                 pygame.mixer.Sound.play(pygame.mixer.Sound(buffer=bytes([128]*8000)))
-                time.sleep(1)
+                if token.wait(1):
+                    break
             except:
                 break
     
@@ -1737,7 +7679,16 @@ class EyeTrackerApp(QMainWindow):
                                    QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            self.stop_timer()
+            # Общий срок на остановку всех фоновых потоков
+            deadline = time.time() + self.SHUTDOWN_TIMEOUT
+            self.stop_timer(deadline)
+            self.input_monitor.close()
+            if self.preview_server is not None:
+                self.preview_server.stop(timeout=max(0.1, deadline - time.time()))
+            self.event_bus.stop(timeout=max(0.1, deadline - time.time()))
+            if self.stats_uploader is not None:
+                self.stats_uploader.stop(timeout=max(0.1, deadline - time.time()))
+            self.camera_pool.close_all()
             event.accept()
         else:
             event.ignore()
@@ -1745,6 +7696,15 @@ class EyeTrackerApp(QMainWindow):
 
 def main():
     """Главная функция"""
+    if len(sys.argv) > 1 and sys.argv[1] == "--tune":
+        sys.exit(run_tuner_cli(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "--soak":
+        sys.exit(run_soak_cli(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "--daemon":
+        sys.exit(run_daemon_cli(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "--replay":
+        sys.exit(run_replay_cli(sys.argv[2:]))
+    
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
     